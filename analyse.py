@@ -0,0 +1,233 @@
+"""统一的命令行入口：python analyse.py {code, oo, usecase, all} ...
+
+code / oo / usecase 子命令与单独运行 analyse_code.py、analyse_oo.py、
+analyse_usecase.py 相同。all 在一个进程中完成三种分析：
+
+- 只遍历一次 src 目录，每个文件只读取、解析一次，同一份 ParsedSource
+  同时用于行数 / 圈复杂度统计与 OO 方法提取（两种结果仍分别缓存）
+- 类图、用例图各解析一次，三份结果在同一次运行中写出
+
+radon、ElementTree、NumPy 等依赖只在对应的子命令运行时才导入。
+超出单文件预算的文件只统计行数，不提供方法数据。
+"""
+import os
+import time
+import argparse
+from contextlib import nullcontext
+from functools import partial
+
+from metrics_cache import add_cache_arguments, cache_from_args
+from output_writers import FORMATS, RecordWriter
+from profiling import Profiler, add_profile_arguments, write_stats
+from budgets import add_budget_arguments, budget_from_args
+from discovery import SourceDiscovery, add_discovery_arguments, discovery_from_args
+from metrics_store import add_store_arguments, store_writer
+
+
+def analyze_source_file(filepath, cache=None, stats=None, budget=None, with_methods=True):
+    """读取并解析一次文件，返回 (代码指标记录, 方法数据)
+
+    方法数据与 analyse_oo.extract_source_methods 相同；with_methods 为 False、
+    语法错误或超出预算时为 None。
+    """
+    import analyse_code
+    import analyse_oo
+
+    extraction = analyse_oo.MethodExtraction(cache, stats) if with_methods else None
+    record = analyse_code.analyze_code_file(filepath, cache, stats, budget, extraction)
+    if extraction is None or record["SkipReason"] is not None:
+        return record, None
+    return record, extraction.methods
+
+
+def _safe_analyze_source(filepath, cache=None, budget=None, with_methods=True):
+    """与 analyse_code._safe_analyze 相同，结果为 (代码指标记录, 方法数据)"""
+    stats = {}
+    start = time.perf_counter()
+    try:
+        result, error = analyze_source_file(filepath, cache, stats, budget, with_methods), None
+    except Exception as e:
+        result, error = None, f"{type(e).__name__}: {e}"
+    stats["total"] = time.perf_counter() - start
+    return filepath, result, error, stats
+
+
+def run_all(src_dir="src", class_model="temp2.xml", usecase_model="user1.xml",
+            code_output="metrics_code.json", oo_output="metrics_oo.json", usecase_output="metrics_usecase.json",
+            fmt="json", jobs=1, cache=None, profiler=None, budget=None, discovery=None, open_store=None):
+    """单遍完成代码指标、CK / LK 指标与用例点分析
+
+    open_store(分析类型, 来源) 返回指标库的 RunWriter（或 None），在每种分析开始写出时才调用：
+    RunWriter 在关闭前一直持有写事务，同一个指标库不能同时打开多个。
+    """
+    import analyse_code
+    import analyse_oo
+    import analyse_usecase
+    from compact_model import CompactModel
+
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    if discovery is None:
+        discovery = SourceDiscovery()
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    if open_store is None:
+        open_store = lambda kind, source: None
+
+    classes = index = None
+    if class_model and os.path.exists(class_model):
+        print("正在解析类图 ...")
+        with profiler.phase("parse_xmi"):
+            classes = analyse_oo.parse_xmi(class_model)
+        profiler.count("classes", len(classes))
+        index = analyse_oo.ClassIndex(classes)
+    elif class_model:
+        print(f"⚠️ 类图 {class_model} 不存在，跳过 CK / LK 指标")
+
+    if os.path.exists(src_dir):
+        with profiler.phase("discover"):
+            filepaths = list(discovery.files(src_dir))
+        profiler.count("dirs_scanned", discovery.dirs_scanned)
+        profiler.count("dirs_pruned", discovery.dirs_pruned)
+    else:
+        print(f"⚠️ {src_dir} 文件夹不存在！")
+        filepaths = []
+
+    print("分析 Python 源代码 ...")
+    failures = []
+    store = open_store("code", src_dir)
+    worker = partial(_safe_analyze_source, with_methods=classes is not None)
+    with profiler.phase("analyze"), store or nullcontext(), RecordWriter(code_output, fmt) as writer:
+        for filepath, result, error, stats in analyse_code.iter_results(filepaths, jobs, cache, budget, worker):
+            profiler.record_file(filepath, stats)
+            if error is not None:
+                profiler.count("failures")
+                failures.append((filepath, error))
+                print(f"⚠️ 分析失败：{filepath} - {error}")
+                continue
+            record, methods = result
+            if record["SkipReason"] is not None:
+                profiler.count(f"skipped_{record['SkipReason']}")
+                if record["SkipReason"] != "syntax_error":
+                    print(f"⚠️ 超出预算（{record['SkipReason']}），只统计行数：{filepath}")
+            writer.write(record)
+            if store is not None:
+                store.write(record)
+            if methods is not None:
+                matched = analyse_oo.apply_module_methods(methods, index, analyse_oo.module_name(filepath, src_dir))
+                profiler.count("code_classes", len(methods))
+                profiler.count("matched_classes", matched)
+    if store is not None:
+        print(f"已写入指标库，运行 ID {store.run_id}")
+    print(f"代码指标：共分析 {writer.count} 个文件，结果保存在 {code_output}")
+    if failures:
+        print(f"⚠️ 共 {len(failures)} 个文件分析失败")
+    if cache is not None:
+        with profiler.phase("cache_prune"):
+            cache.prune()
+
+    if classes is not None:
+        analyse_oo.report_ambiguous(index, classes)
+        with profiler.phase("compact_model"):
+            model = CompactModel(classes)
+        analyse_oo.write_metrics(model, oo_output, fmt, profiler, open_store("oo", class_model))
+
+    if usecase_model and os.path.exists(usecase_model):
+        metrics = analyse_usecase.analyze(usecase_model, profiler)
+        analyse_usecase.write_metrics(metrics, usecase_output, fmt, open_store("usecase", usecase_model))
+        print(f"用例点：UCP = {metrics['UCP']}，结果保存在 {usecase_output}")
+    elif usecase_model:
+        print(f"⚠️ 用例图 {usecase_model} 不存在，跳过用例点分析")
+
+    if profiler.enabled:
+        print(profiler.format_report())
+        print(f"统计结果保存在 {write_stats(profiler, code_output)}")
+
+
+# ---------- 子命令 ----------
+
+def run_code(args):
+    import analyse_code
+    profiler = Profiler(enabled=args.profile, top_n=args.profile_top)
+    analyse_code.main(args.output, args.jobs, cache_from_args(args), args.format, profiler, budget_from_args(args),
+                      discovery_from_args(args), store_writer(args, "code", source=args.src), args.src)
+
+
+def run_oo(args):
+    import analyse_oo
+    profiler = Profiler(enabled=args.profile, top_n=args.profile_top)
+    analyse_oo.main(args.input, args.output, cache_from_args(args), args.format, profiler, discovery_from_args(args),
+                    store_writer(args, "oo", source=args.input), args.src)
+
+
+def run_usecase(args):
+    import analyse_usecase
+    profiler = Profiler(enabled=args.profile, top_n=args.profile_top)
+    if args.batch:
+        analyse_usecase.main_batch(args.batch, args.output, args.format, args.jobs, profiler,
+                                   store_writer(args, "usecase", source=", ".join(args.batch)))
+    else:
+        analyse_usecase.main(args.input, args.output, args.format, profiler,
+                             store_writer(args, "usecase", source=args.input))
+
+
+def run_everything(args):
+    profiler = Profiler(enabled=args.profile, top_n=args.profile_top)
+    run_all(args.src, args.class_model, args.usecase_model, args.code_output, args.oo_output, args.usecase_output,
+            args.format, args.jobs, cache_from_args(args), profiler, budget_from_args(args),
+            discovery_from_args(args), lambda kind, source: store_writer(args, kind, source=source))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="代码指标、CK / LK 指标与用例点分析")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    code = commands.add_parser("code", help="代码行数与圈复杂度")
+    code.add_argument("--src", default="src", help="源代码目录")
+    code.add_argument("--output", default="metrics_code.json", help="输出结果的 JSON 文件路径")
+    code.add_argument("--jobs", type=int, default=1, help="并行进程数（1 为串行，0 为使用全部 CPU 核心）")
+    code.add_argument("--format", default="json", choices=FORMATS, help="输出格式")
+    for add in (add_cache_arguments, add_profile_arguments, add_budget_arguments, add_discovery_arguments,
+                add_store_arguments):
+        add(code)
+    code.set_defaults(func=run_code)
+
+    oo = commands.add_parser("oo", help="类图的 CK / LK / MOOD 指标")
+    oo.add_argument("--input", default="temp2.xml", help="输入XMI文件路径")
+    oo.add_argument("--src", default="src", help="实现代码目录")
+    oo.add_argument("--output", default="metrics_oo.json", help="输出JSON路径")
+    oo.add_argument("--format", default="json", choices=FORMATS, help="输出格式")
+    for add in (add_cache_arguments, add_profile_arguments, add_discovery_arguments, add_store_arguments):
+        add(oo)
+    oo.set_defaults(func=run_oo)
+
+    usecase = commands.add_parser("usecase", help="用例图的用例点")
+    usecase.add_argument("--input", default="user1.xml", help="输入XMI文件路径")
+    usecase.add_argument("--output", default="metrics_usecase.json", help="输出JSON路径")
+    usecase.add_argument("--format", default="json", choices=FORMATS, help="输出格式")
+    usecase.add_argument("--batch", nargs="+", default=None,
+                         help="批量模式：目录、glob（如 'models/**/*.xml'）或文件，给出时忽略 --input")
+    usecase.add_argument("--jobs", type=int, default=1, help="批量模式的并行进程数（0 为使用全部 CPU 核心）")
+    add_profile_arguments(usecase)
+    add_store_arguments(usecase)
+    usecase.set_defaults(func=run_usecase)
+
+    everything = commands.add_parser("all", help="单遍完成以上三种分析")
+    everything.add_argument("--src", default="src", help="源代码目录")
+    everything.add_argument("--class-model", default="temp2.xml", help="类图XMI路径（空字符串为跳过）")
+    everything.add_argument("--usecase-model", default="user1.xml", help="用例图XMI路径（空字符串为跳过）")
+    everything.add_argument("--code-output", default="metrics_code.json", help="代码指标输出路径")
+    everything.add_argument("--oo-output", default="metrics_oo.json", help="CK / LK 指标输出路径")
+    everything.add_argument("--usecase-output", default="metrics_usecase.json", help="用例点输出路径")
+    everything.add_argument("--jobs", type=int, default=1, help="并行进程数（1 为串行，0 为使用全部 CPU 核心）")
+    everything.add_argument("--format", default="json", choices=FORMATS, help="输出格式")
+    for add in (add_cache_arguments, add_profile_arguments, add_budget_arguments, add_discovery_arguments,
+                add_store_arguments):
+        add(everything)
+    everything.set_defaults(func=run_everything)
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    args.func(args)
@@ -1,25 +1,156 @@
 import os
+import time
 import argparse
-import json
-from radon.complexity import cc_visit
+from contextlib import nullcontext
+from functools import partial
+import radon
+from metrics_cache import content_hash, add_cache_arguments, cache_from_args
+from source_ast import parse_source, decode_source
+from output_writers import FORMATS, RecordWriter
+from profiling import Profiler, add_profile_arguments, write_stats
+from budgets import NO_BUDGET, BudgetExceeded, init_worker, add_budget_arguments, budget_from_args
+from discovery import SourceDiscovery, add_discovery_arguments, discovery_from_args
+from metrics_store import add_store_arguments, store_writer
+from process_pool import imap_ordered
 
-def analyze_code_file(filepath):
-    """分析单个代码文件"""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        code = f.read()
+# 分析逻辑变化时递增，使旧缓存失效
+ANALYZER_VERSION = f"2-radon{radon.__version__}"
 
-    lines = code.split('\n')
-    blank_lines = sum(1 for line in lines if line.strip() == "")
-    comment_lines = sum(1 for line in lines if line.strip().startswith("#"))
-    total_lines = len(lines)
-    code_lines = total_lines - blank_lines - comment_lines
+def analyze_code_file(filepath, cache=None, stats=None, budget=None, extraction=None):
+    """分析单个代码文件；stats 不为 None 时填入读取字节数与各步骤耗时
 
+    超出 budget 的文件降级为只统计行数，记录的 SkipReason 说明原因。
+    extraction 见 analyze_code_data。
+    """
+    budget = budget or NO_BUDGET
+    size = os.path.getsize(filepath)
+    if stats is not None:
+        stats["bytes"] = size
+    if budget.too_large(size):
+        # 逐行读取，不把整个文件读入内存
+        with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+            return line_only_record(filepath, _iter_file_lines(f), "size")
+
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    return analyze_code_data(data, filepath, cache, stats, budget, extraction)
+
+def analyze_code_data(data, filepath, cache=None, stats=None, budget=None, extraction=None):
+    """分析已读入的文件内容（bytes），例如 history 模式中直接读取的 git blob
+
+    extraction 用于在同一次解析中完成其他分析（如 analyse_oo.MethodExtraction）：
+    extraction.needs_parse(data) 为真时，即使代码指标命中缓存也会解析，
+    并在同一时间预算内以 ParsedSource 调用 extraction(parsed)。
+    """
+    budget = budget or NO_BUDGET
+    if budget.too_large(len(data)):
+        text = data.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+        return line_only_record(filepath, _iter_lines(text), "size")
+    if extraction is not None and not extraction.needs_parse(data):
+        extraction = None
+    use_cache = cache is not None and cache.enabled
+    cached = None
+    if use_cache:
+        key = cache.key("code", ANALYZER_VERSION, content_hash(data))
+        cached = cache.get(key)
+        if cached is not None and extraction is None:
+            if stats is not None:
+                stats["cached"] = True
+            return {"File": filepath, **cached}
+
+    code = decode_source(data)
+    reason = None
     try:
-        functions = cc_visit(code)
-        cc_scores = [f.complexity for f in functions]
-    except Exception:
-        functions = []
-        cc_scores = []
+        with budget.time_limit():
+            parsed = _timed_parse(code, stats)
+            if cached is None:
+                result = analyze_parsed_source(parsed, filepath, stats)
+            else:
+                result = {"File": filepath, **cached}
+            if extraction is not None:
+                extraction(parsed)
+    except BudgetExceeded as e:
+        reason = e.reason
+    except MemoryError:
+        reason = "memory"
+    if reason is not None:
+        # 在 except 块之外降级：异常的 traceback 不再引用解析到一半的语法树
+        return line_only_record(filepath, _iter_lines(code), reason)
+
+    # 超出时间或内存预算的结果与机器负载有关，不写入缓存
+    if use_cache and cached is None:
+        cache.put(key, {k: v for k, v in result.items() if k != "File"})
+    return result
+
+def _timed_parse(code, stats=None):
+    start = time.perf_counter()
+    parsed = parse_source(code)
+    if stats is not None:
+        stats["parse"] = time.perf_counter() - start
+    return parsed
+
+def _iter_lines(text):
+    """与 text.split('\\n') 结果相同，但逐行产出，不额外复制整个文本"""
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+def _iter_file_lines(f):
+    """逐行读取文本文件，行的切分方式与 _iter_lines 一致"""
+    line = ""
+    for line in f:
+        yield line.rstrip('\n')
+    if line == "" or line.endswith('\n'):
+        yield ""
+
+def count_lines(lines):
+    """统计总行数、空行、注释行与代码行，lines 可以是任意可迭代对象"""
+    total_lines = blank_lines = comment_lines = 0
+    for line in lines:
+        total_lines += 1
+        stripped = line.strip()
+        if stripped == "":
+            blank_lines += 1
+        elif stripped.startswith("#"):
+            comment_lines += 1
+    return {
+        "TotalLines": total_lines,
+        "BlankLines": blank_lines,
+        "CommentLines": comment_lines,
+        "CodeLines": total_lines - blank_lines - comment_lines,
+    }
+
+def line_only_record(filepath, lines, reason):
+    """降级结果：只有行数统计，复杂度字段为空"""
+    return {
+        "File": filepath,
+        **count_lines(lines),
+        "LogicalLines": None,
+        "CyclomaticComplexity": {
+            "Total": None,
+            "Max": None,
+            "Avg": None,
+            "FunctionCount": None
+        },
+        "SkipReason": reason
+    }
+
+def analyze_parsed_source(parsed, filepath, stats=None):
+    """基于一次解析结果计算行数与圈复杂度"""
+    if parsed.error is not None:
+        # 语法错误时无法计算复杂度，明确标记而不是记为 0
+        return line_only_record(filepath, parsed.lines, "syntax_error")
+
+    start = time.perf_counter()
+    functions = parsed.blocks
+    if stats is not None:
+        stats["complexity"] = time.perf_counter() - start
+    cc_scores = [f.complexity for f in functions]
 
     cc_total = sum(cc_scores)
     cc_max = max(cc_scores) if cc_scores else 0
@@ -27,43 +158,149 @@ def analyze_code_file(filepath):
 
     return {
         "File": filepath,
-        "TotalLines": total_lines,
-        "BlankLines": blank_lines,
-        "CommentLines": comment_lines,
-        "CodeLines": code_lines,
+        **count_lines(parsed.lines),
         "LogicalLines": len(functions),
         "CyclomaticComplexity": {
             "Total": cc_total,
             "Max": cc_max,
             "Avg": cc_avg,
             "FunctionCount": len(functions)
-        }
+        },
+        "SkipReason": None
     }
 
-def main(output_path="metrics_code.json"):
-    """分析 src 文件夹下所有 Python 文件"""
-    src_dir = "src"
-    all_results = []
+def _safe_analyze(filepath, cache=None, budget=None):
+    """分析单个文件，异常按文件返回而不中断整个运行（可在工作进程中执行）
+
+    返回 (文件路径, 结果, 错误, 统计)，统计随结果一起传回主进程。
+    """
+    stats = {}
+    start = time.perf_counter()
+    try:
+        result, error = analyze_code_file(filepath, cache, stats, budget), None
+    except Exception as e:
+        result, error = None, f"{type(e).__name__}: {e}"
+    stats["total"] = time.perf_counter() - start
+    return filepath, result, error, stats
+
+def collect_py_files(src_dir, discovery=None):
+    """按 os.walk 的顺序收集所有 Python 文件路径，跳过被排除的目录"""
+    if discovery is None:
+        discovery = SourceDiscovery()
+    return list(discovery.files(src_dir))
+
+def iter_results(filepaths, jobs=1, cache=None, budget=None, worker=None):
+    """逐个产出 (文件路径, 结果, 错误, 统计)，顺序与 filepaths 一致
+
+    jobs > 1 时使用进程池并行分析；结果按输入顺序返回，因此输出与串行运行完全一致。
+    使工作进程退出的文件（见 process_pool）作为该文件的分析失败返回，不中断运行。
+    jobs 为 1 时在当前进程中串行分析（时间预算在主线程中直接生效）；只有预算必须在
+    工作进程中才能生效时（内存预算，或在非主线程中运行且设置了时间预算）才改用单个工作进程。
+    worker(文件路径, cache=, budget=) 默认为 _safe_analyze，须为可在工作进程中调用的模块级函数。
+    """
+    budget = budget or NO_BUDGET
+    worker = worker or _safe_analyze
+    if not filepaths:
+        return
+    if not budget.isolated and (jobs <= 1 or len(filepaths) <= 1):
+        for filepath in filepaths:
+            yield worker(filepath, cache=cache, budget=budget)
+        return
+
+    jobs = max(1, jobs)
+    # 小批量分发，既减少进程间通信开销，又能尽早流式返回结果
+    chunksize = max(1, min(64, len(filepaths) // (jobs * 4)))
+    yield from imap_ordered(partial(worker, cache=cache, budget=budget), filepaths, jobs, _crashed, chunksize,
+                            init_worker, (budget,))
+
+def _crashed(filepath, error):
+    return filepath, None, error, {}
+
+def iter_analysis(src_dir="src", jobs=1, cache=None, failures=None, profiler=None, budget=None, discovery=None,
+                  progress=None):
+    """逐个产出分析结果，失败的文件记录到 failures 中
+
+    progress(已完成数, 文件总数, 文件路径) 在每个文件（包括失败的文件）处理完后调用。
+    """
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+
+    if discovery is None:
+        discovery = SourceDiscovery()
+    with profiler.phase("discover"):
+        filepaths = collect_py_files(src_dir, discovery)
+    profiler.count("dirs_scanned", discovery.dirs_scanned)
+    profiler.count("dirs_pruned", discovery.dirs_pruned)
+
+    with profiler.phase("analyze"):
+        for done, (filepath, result, error, stats) in enumerate(iter_results(filepaths, jobs, cache, budget), 1):
+            profiler.record_file(filepath, stats)
+            if progress is not None:
+                progress(done, len(filepaths), filepath)
+            if error is not None:
+                profiler.count("failures")
+                if failures is not None:
+                    failures.append((filepath, error))
+                print(f"⚠️ 分析失败：{filepath} - {error}")
+                continue
+            if result["SkipReason"] is not None:
+                profiler.count(f"skipped_{result['SkipReason']}")
+                if result["SkipReason"] != "syntax_error":
+                    print(f"⚠️ 超出预算（{result['SkipReason']}），只统计行数：{filepath}")
+            yield result
+
+    if cache is not None:
+        with profiler.phase("cache_prune"):
+            cache.prune()
+
+def analyze(src_dir="src", jobs=1, cache=None, profiler=None, budget=None, discovery=None):
+    """分析目录下所有 Python 文件，返回 (结果列表, [(文件路径, 错误信息)])"""
+    failures = []
+    all_results = list(iter_analysis(src_dir, jobs, cache, failures, profiler, budget, discovery))
+    return all_results, failures
+
+def main(output_path="metrics_code.json", jobs=1, cache=None, fmt="json", profiler=None, budget=None,
+         discovery=None, store=None, src_dir="src"):
+    """分析 src 文件夹下所有 Python 文件；store 为指标库的 RunWriter 时同时写入指标库"""
 
     if not os.path.exists(src_dir):
         print("⚠️ src 文件夹不存在！")
+        if store is not None:
+            store.discard()
         return
 
-    for root, _, files in os.walk(src_dir):
-        for file in files:
-            if file.endswith(".py"):
-                filepath = os.path.join(root, file)
-                result = analyze_code_file(filepath)
-                all_results.append(result)
+    # 每个文件分析完即写出，不在内存中累积全部结果
+    failures = []
+    with store or nullcontext(), RecordWriter(output_path, fmt) as writer:
+        for result in iter_analysis(src_dir, jobs, cache, failures, profiler, budget, discovery):
+            writer.write(result)
+            if store is not None:
+                store.write(result)
+    if store is not None:
+        print(f"已写入指标库，运行 ID {store.run_id}")
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(all_results, f, indent=2, ensure_ascii=False)
+    print(f"分析完成，共分析 {writer.count} 个文件，结果保存在 {output_path}")
+    if failures:
+        print(f"⚠️ 共 {len(failures)} 个文件分析失败")
 
-    print(f"分析完成，共分析 {len(all_results)} 个文件，结果保存在 {output_path}")
+    if profiler is not None and profiler.enabled:
+        print(profiler.format_report())
+        print(f"统计结果保存在 {write_stats(profiler, output_path)}")
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("--output", default="metrics_code.json", help="输出结果的 JSON 文件路径")
+    parser.add_argument("--jobs", type=int, default=1, help="并行进程数（1 为串行，0 为使用全部 CPU 核心）")
+    parser.add_argument("--format", default="json", choices=FORMATS, help="输出格式")
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
+    add_budget_arguments(parser)
+    add_discovery_arguments(parser)
+    add_store_arguments(parser)
     args = parser.parse_args()
 
-    main(args.output)
+    profiler = Profiler(enabled=args.profile, top_n=args.profile_top)
+    main(args.output, args.jobs, cache_from_args(args), args.format, profiler, budget_from_args(args),
+         discovery_from_args(args), store_writer(args, "code", source="src"))
@@ -1,79 +1,145 @@
 import os
+import sys
 import argparse
-import json
 import xml.etree.ElementTree as ET
 import ast
+import time
+from contextlib import nullcontext
+from metrics_cache import content_hash, add_cache_arguments, cache_from_args
+from source_ast import ParsedSource, parse_source, decode_source, USE_RADON
+from output_writers import FORMATS, RecordWriter
+from profiling import Profiler, add_profile_arguments, write_stats
+from discovery import SourceDiscovery, add_discovery_arguments, discovery_from_args
+from metrics_store import add_store_arguments, store_writer
+from coupling import CouplingMatrix
+from cohesion import cohesion_metrics
+from compact_model import CompactModel
 
 # 可选复杂度库（如果需要更准 WMC）
-try:
-    from radon.complexity import cc_visit
-    USE_RADON = True
-except ImportError:
-    USE_RADON = False
+if USE_RADON:
+    import radon
+
+# 方法数据的缓存版本，分析逻辑变化时递增
+ANALYZER_VERSION = f"4-radon{radon.__version__}" if USE_RADON else "4-noradon"
 
 class ClassInfo:
+    __slots__ = ('id', 'name', 'qualified_name', 'attributes', 'methods', 'parent', 'children',
+                 'implements', 'associations', 'code_methods')
+
     def __init__(self, id_, name):
         self.id = id_
         self.name = name
+        self.qualified_name = name  # 包名.外部类名.类名（类图中无包时与 name 相同）
         self.attributes = []
         self.methods = []
         self.parent = None
         self.children = []
         self.implements = []
         self.associations = set()
-        self.code_methods = {}  # 方法名 -> {'calls': set(), 'fields': set(), 'complexity': int}
+        self.code_methods = {}  # 方法名 -> {'calls', 'fields', 'refs', 'complexity', 'deps', 'remote'}
 
     def __repr__(self):
         return f"{self.name}(attr={len(self.attributes)}, meth={len(self.methods)})"
 
 # ---------- 解析 XMI ----------
 
+XMI_NS = '{http://schema.omg.org/spec/XMI/2.1}'
+XMI_ID = XMI_NS + 'id'
+XMI_TYPE = XMI_NS + 'type'
+XMI_IDREF = XMI_NS + 'idref'
+
 def parse_xmi(xmi_file):
-    tree = ET.parse(xmi_file)
-    root = tree.getroot()
-    ns = {'uml': 'http://www.eclipse.org/uml2/2.1.0/UML', 'xmi': 'http://schema.omg.org/spec/XMI/2.1'}
+    """单遍流式解析类图
 
+    使用 iterparse 边读边建立 ClassInfo，元素处理完即清空，峰值内存只与类的
+    数量相关。泛化与关联在遍历时只记录 ID，遍历结束后再通过 classes 索引解析。
+    泛化的子类取其所在的 Class 元素（不在类内部时退回 xmi:idref）。
+    """
     classes = {}
-    id_to_name = {}
-
-    for elem in root.findall(".//packagedElement[@xmi:type='uml:Class']", ns):
-        cid = elem.attrib['{http://schema.omg.org/spec/XMI/2.1}id']
-        name = elem.attrib.get('name', f"Unnamed_{cid}")
-        cls = ClassInfo(cid, name)
-
-        for attr in elem.findall('ownedAttribute'):
-            cls.attributes.append(attr.attrib.get('name', ''))
-
-        for op in elem.findall('ownedOperation'):
-            cls.methods.append(op.attrib.get('name', ''))
-
-        classes[cid] = cls
-        id_to_name[cid] = name
-
-    for gen in root.findall(".//generalization"):
-        parent_id = gen.attrib.get('general')
-        child_id = gen.get('xmi:idref') or gen.get('xmi:id')
+    generalizations = []  # (子类 ID, 父类 ID)
+    associations = []     # 每个关联的各端 type 列表
+
+    # 栈中每项为 (元素, 类型标记, 附加数据)：类 -> ClassInfo，关联 -> 端类型列表
+    stack = []
+    root = None
+
+    for event, elem in ET.iterparse(xmi_file, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            tag = elem.tag
+            parent_kind, parent_data = (stack[-1][1], stack[-1][2]) if stack else (None, None)
+            kind, data = None, None
+
+            if tag == 'packagedElement':
+                xmi_type = elem.get(XMI_TYPE)
+                if xmi_type == 'uml:Class':
+                    cid = sys.intern(elem.get(XMI_ID))
+                    kind, data = 'class', ClassInfo(cid, elem.get('name', f"Unnamed_{cid}"))
+                    scope = [d if k == 'package' else d.name for _, k, d in stack if k in ('package', 'class')]
+                    data.qualified_name = '.'.join(scope + [data.name])
+                    classes[cid] = data
+                elif xmi_type == 'uml:Package':
+                    kind, data = 'package', elem.get('name', '')
+                elif xmi_type == 'uml:Association':
+                    kind, data = 'assoc', []
+                    associations.append(data)
+            elif parent_kind == 'class' and tag == 'ownedAttribute':
+                parent_data.attributes.append(elem.get('name', ''))
+            elif parent_kind == 'class' and tag == 'ownedOperation':
+                parent_data.methods.append(elem.get('name', ''))
+            elif parent_kind == 'assoc' and tag == 'ownedEnd':
+                end_type = elem.get('type')
+                parent_data.append(sys.intern(end_type) if end_type else end_type)
+            elif tag == 'generalization':
+                owner = next((d for _, k, d in reversed(stack) if k == 'class'), None)
+                child_id = owner.id if owner else elem.get(XMI_IDREF)
+                general = elem.get('general')
+                generalizations.append((child_id, sys.intern(general) if general else general))
+
+            stack.append((elem, kind, data))
+        else:
+            stack.pop()
+            elem.clear()
+            # 顶层元素处理完后释放根节点上的引用
+            if len(stack) == 1:
+                root.clear()
+
+    for child_id, parent_id in generalizations:
         if child_id in classes:
             classes[child_id].parent = parent_id
             if parent_id in classes:
                 classes[parent_id].children.append(child_id)
 
-    for assoc in root.findall(".//packagedElement[@xmi:type='uml:Association']", ns):
-        for end in assoc.findall('ownedEnd'):
-            class_id = end.attrib.get('type')
+    for end_types in associations:
+        for class_id in end_types:
             if class_id in classes:
-                other_ends = [e.attrib['type'] for e in assoc.findall('ownedEnd') if e.attrib['type'] != class_id]
-                for oid in other_ends:
-                    classes[class_id].associations.add(oid)
+                for oid in end_types:
+                    if oid is not None and oid != class_id:
+                        classes[class_id].associations.add(oid)
 
     return classes
 
 # ---------- Python 源码分析器 ----------
 
+def _dotted_name(node):
+    """a.b.c 形式的属性链 -> 'a.b.c'，根不是名称或为 self 时返回 None"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name) or node.id == 'self':
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
 class MethodAnalyzer(ast.NodeVisitor):
+    """self 调用与字段，以及方法中引用的名称（refs，可能指向其他类）"""
+
     def __init__(self):
         self.calls = set()
         self.fields = set()
+        self.refs = set()
 
     def visit_Call(self, node):
         if isinstance(node.func, ast.Attribute) and isinstance(node.func.value, ast.Name):
@@ -84,141 +150,478 @@ class MethodAnalyzer(ast.NodeVisitor):
     def visit_Attribute(self, node):
         if isinstance(node.value, ast.Name) and node.value.id == 'self':
             self.fields.add(node.attr)
+        else:
+            dotted = _dotted_name(node)
+            if dotted:
+                self.refs.add(dotted)
         self.generic_visit(node)
 
-def analyze_python_sources(src_folder, classes):
-    for root, _, files in os.walk(src_folder):
-        for file in files:
-            if not file.endswith(".py"):
-                continue
-            with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
-                try:
-                    source = f.read()
-                    tree = ast.parse(source)
-                    analyze_module(tree, source, classes)
-                except Exception as e:
-                    print(f"⚠️ 解析失败：{file} - {e}")
-
-def analyze_module(tree, source, classes):
-    class_nodes = [n for n in tree.body if isinstance(n, ast.ClassDef)]
-    for cnode in class_nodes:
-        class_name = cnode.name
-        target = next((c for c in classes.values() if c.name == class_name), None)
-        if not target:
-            continue
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id != 'self':
+            self.refs.add(node.id)
+
+class ClassIndex:
+    """类图的符号索引：ID、限定名、简单名 -> ClassInfo
+
+    代码中的类按 "模块.限定名" → "包.限定名" → "限定名" → 简单名（仅顶层类）
+    的顺序查找，每一步都是字典查找。某一步命中多个类时视为歧义，不做匹配，
+    记录在 ambiguous 中。
+    """
+
+    def __init__(self, classes):
+        self.by_id = classes
+        self.by_qualified = {}
+        self.by_name = {}
+        for cls in classes.values():
+            self.by_qualified.setdefault(cls.qualified_name, []).append(cls)
+            self.by_name.setdefault(cls.name, []).append(cls)
+        self.ambiguous = {}  # 代码中的类 -> 候选类 ID 列表
+
+    def lookup(self, qualname, module=None):
+        found = self._find(qualname, module)
+        return self._unique(found, qualname, module) if found else None
+
+    def resolve(self, name, module=None):
+        """解析代码中引用的名称，不唯一时返回 None（不记录为歧义）"""
+        found = self._find(name, module)
+        return found[0] if found and len(found) == 1 else None
+
+    def _find(self, qualname, module):
+        candidates = []
+        if module:
+            parts = module.split('.')
+            candidates = ['.'.join(parts[:i] + [qualname]) for i in range(len(parts), 0, -1)]
+        candidates.append(qualname)
+
+        for key in candidates:
+            found = self.by_qualified.get(key)
+            if found:
+                return found
+
+        # 简单名只用于顶层类，避免嵌套类（如 Meta）误匹配
+        if '.' not in qualname:
+            return self.by_name.get(qualname)
+        return None
+
+    def _unique(self, found, qualname, module):
+        if len(found) == 1:
+            return found[0]
+        label = f"{module}.{qualname}" if module else qualname
+        self.ambiguous[label] = [c.id for c in found]
+        return None
+
+def module_name(filepath, src_folder):
+    """src/pkg/mod.py -> pkg.mod，__init__.py 取包名"""
+    rel = os.path.splitext(os.path.relpath(filepath, src_folder))[0]
+    parts = [p for p in rel.split(os.sep) if p not in ('', '.')]
+    if parts and parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+def analyze_python_sources(src_folder, classes, cache=None, profiler=None, discovery=None, progress=None):
+    """提取 src_folder 中各类的方法数据并入类图；progress(已完成数, 文件总数, 文件路径) 在每个文件后调用"""
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    if discovery is None:
+        discovery = SourceDiscovery()
+    index = ClassIndex(classes)
+    filepaths = list(discovery.files(src_folder)) if progress is not None else discovery.files(src_folder)
+    for done, filepath in enumerate(filepaths, 1):
+        stats = {}
+        start = time.perf_counter()
+        try:
+            methods_by_class = extract_module_methods(filepath, cache, stats)
+            matched = apply_module_methods(methods_by_class, index, module_name(filepath, src_folder))
+            profiler.count("code_classes", len(methods_by_class))
+            profiler.count("matched_classes", matched)
+        except Exception as e:
+            profiler.count("failures")
+            print(f"⚠️ 解析失败：{os.path.basename(filepath)} - {e}")
+        stats["total"] = time.perf_counter() - start
+        profiler.record_file(filepath, stats)
+        if progress is not None:
+            progress(done, len(filepaths), filepath)
+    profiler.count("dirs_scanned", discovery.dirs_scanned)
+    profiler.count("dirs_pruned", discovery.dirs_pruned)
+    report_ambiguous(index, classes)
+
+def report_ambiguous(index, classes):
+    for label, candidate_ids in index.ambiguous.items():
+        names = ', '.join(classes[cid].qualified_name for cid in candidate_ids)
+        print(f"⚠️ 类名不唯一，未匹配：{label}（候选：{names}）")
+
+def extract_module_methods(filepath, cache=None, stats=None):
+    """提取文件中各类的方法数据，内容未变化时直接读取缓存"""
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    if stats is not None:
+        stats["bytes"] = len(data)
+    return extract_source_methods(data, cache, stats)
+
+def extract_source_methods(data, cache=None, stats=None):
+    """从已读入的文件内容（bytes）提取各类的方法数据"""
+    extraction = MethodExtraction(cache, stats)
+    if extraction.needs_parse(data):
+        extraction(_checked_parse(decode_source(data), stats))
+    elif stats is not None:
+        stats["cached"] = True
+    return extraction.methods
+
+class MethodExtraction:
+    """提取方法数据并读写缓存，可交给 analyse_code.analyze_code_data 复用其解析结果
+
+    解析失败或未解析时 methods 为 None。
+    """
+    def __init__(self, cache=None, stats=None):
+        self.cache = cache if cache is not None and cache.enabled else None
+        self.stats = stats
+        self.key = None
+        self.methods = None
+
+    def needs_parse(self, data):
+        """缓存中已有方法数据时不需要解析"""
+        if self.cache is None:
+            return True
+        self.key = self.cache.key("oo", ANALYZER_VERSION, content_hash(data))
+        cached = self.cache.get(self.key)
+        if cached is None:
+            return True
+        self.methods = _methods_from_json(cached)
+        return False
+
+    def __call__(self, parsed):
+        if parsed.error is not None:
+            return
+        method_stats = {}
+        self.methods = collect_class_methods(parsed, method_stats)
+        if self.stats is not None:
+            self.stats["complexity"] = self.stats.get("complexity", 0.0) + method_stats["complexity"]
+        if self.key is not None:
+            self.cache.put(self.key, _methods_to_json(self.methods))
+
+def _checked_parse(source, stats=None):
+    start = time.perf_counter()
+    parsed = parse_source(source)
+    if stats is not None:
+        stats["parse"] = time.perf_counter() - start
+    if parsed.error is not None:
+        raise parsed.error
+    return parsed
+
+def _methods_to_json(methods_by_class):
+    return {
+        class_name: {
+            name: {'calls': sorted(m['calls']), 'fields': sorted(m['fields']), 'refs': sorted(m['refs']),
+                   'complexity': m['complexity']}
+            for name, m in methods.items()
+        }
+        for class_name, methods in methods_by_class.items()
+    }
+
+def _methods_from_json(data):
+    return {
+        class_name: {
+            name: {'calls': set(m['calls']), 'fields': set(m['fields']), 'refs': set(m['refs']),
+                   'complexity': m['complexity']}
+            for name, m in methods.items()
+        }
+        for class_name, methods in data.items()
+    }
+
+def analyze_module(tree, source, classes, module=None):
+    index = classes if isinstance(classes, ClassIndex) else ClassIndex(classes)
+    apply_module_methods(collect_class_methods(ParsedSource(source, tree)), index, module)
+
+def _iter_class_defs(body, prefix=''):
+    """按限定名（Outer.Inner）遍历模块顶层类及其嵌套类"""
+    for node in body:
+        if isinstance(node, ast.ClassDef):
+            qualname = prefix + node.name
+            yield qualname, node
+            yield from _iter_class_defs(node.body, qualname + '.')
+
+def collect_class_methods(parsed, stats=None):
+    """类限定名 -> {方法名 -> {'calls', 'fields', 'refs', 'complexity'}}，与类图无关，可缓存
+
+    方法复杂度直接取自整份模块的 radon 分析结果，不再对每个方法 unparse 后重新解析。
+    """
+    start = time.perf_counter()
+    methods_by_class = {}
+    for qualname, cnode in _iter_class_defs(parsed.tree.body):
+        methods = methods_by_class.setdefault(qualname, {})
         for func in cnode.body:
             if isinstance(func, ast.FunctionDef):
                 analyzer = MethodAnalyzer()
                 analyzer.visit(func)
                 complexity = 1
                 if USE_RADON:
-                    try:
-                        blocks = cc_visit(ast.unparse(func))
-                        complexity = sum(b.complexity for b in blocks)
-                    except:
-                        pass
-                target.code_methods[func.name] = {
+                    complexity = parsed.function_complexity(func) or complexity
+                methods[func.name] = {
                     'calls': analyzer.calls,
                     'fields': analyzer.fields,
+                    'refs': analyzer.refs,
                     'complexity': complexity
                 }
+    if stats is not None:
+        stats["complexity"] = time.perf_counter() - start
+    return methods_by_class
+
+def apply_module_methods(methods_by_class, index, module=None):
+    """把方法数据并入匹配到的类，返回匹配成功的类数"""
+    matched = 0
+    memo = {}
+    for qualname, methods in methods_by_class.items():
+        target = index.lookup(qualname, module)
+        if not target:
+            continue
+        target.code_methods.update(resolve_method_refs(methods, index, module, memo))
+        matched += 1
+    return matched
+
+def _resolve_ref(ref, index, module, memo):
+    """引用 -> (类 ID, 方法名)：引用本身是类时方法名为 None，Cls.method 形式时为方法名"""
+    if ref not in memo:
+        target = index.resolve(ref, module)
+        if target is not None:
+            memo[ref] = (target.id, None)
+        elif '.' in ref:
+            head, name = ref.rsplit('.', 1)
+            owner = _resolve_ref(head, index, module, memo)
+            memo[ref] = (owner[0], name) if owner and owner[1] is None else None
+        else:
+            memo[ref] = None
+    return memo[ref]
+
+def resolve_method_refs(methods, index, module=None, memo=None):
+    """把方法中引用的名称解析为类 ID，返回附带 deps / remote 的方法数据副本
+
+    deps 为引用到的类 ID，remote 为调用的其他类方法 (类 ID, 方法名)。解析结果
+    依赖类图与所在模块，因此不写入缓存，也不修改传入的（可能被共享的）方法数据。
+    """
+    if memo is None:
+        memo = {}
+    resolved = {}
+    for name, m in methods.items():
+        deps, remote = set(), set()
+        for ref in m.get('refs', ()):
+            found = _resolve_ref(ref, index, module, memo)
+            if found is not None:
+                deps.add(found[0])
+                if found[1] is not None:
+                    remote.add(found)
+        resolved[name] = {**m, 'deps': deps, 'remote': remote}
+    return resolved
 
 # ---------- 指标计算器 ----------
 
-def get_dit(cls, classes):
-    depth = 0
-    while cls.parent:
-        parent = classes.get(cls.parent)
-        if not parent:
-            break
-        depth += 1
-        cls = parent
-    return depth
-
-def compute_metrics(classes):
-    result = []
-    total_classes = len(classes)
-    max_couplings = total_classes * (total_classes - 1)
-
+class InheritanceGraph:
+    """按模型一次性构建的继承关系
+
+    从根类开始按拓扑序（父类先于子类）逐层推导 DIT 以及继承的属性/方法名集合，之后每个类的查询都是 O(1)。继承环会被检测并记录在
+    cycles 中；环上的继承边被忽略，环上的类按根类处理。
+    """
+
+    def __init__(self, classes):
+        self.depth = {}
+        self.inherited_attributes = {}
+        self.inherited_methods = {}
+        self.cycles = []
+
+        parent_of = {cid: (cls.parent if cls.parent in classes else None) for cid, cls in classes.items()}
+        children_of = {cid: [] for cid in classes}
+        for cid, pid in parent_of.items():
+            if pid is not None:
+                children_of[pid].append(cid)
+
+        empty = frozenset()
+        roots = [cid for cid, pid in parent_of.items() if pid is None]
+        self._propagate(classes, roots, children_of, empty)
+
+        # 未被访问到的类都位于继承环上或其下游
+        seen = set(self.depth)
+        for start in classes:
+            if start in seen:
+                continue
+            path, pos = [], {}
+            cur = start
+            while cur is not None and cur not in seen and cur not in pos:
+                pos[cur] = len(path)
+                path.append(cur)
+                cur = parent_of[cur]
+            if cur in pos:
+                cycle = path[pos[cur]:]
+                self.cycles.append(cycle)
+                cycle_set = set(cycle)
+                for cid in cycle:
+                    children_of[cid] = [c for c in children_of[cid] if c not in cycle_set]
+                self._propagate(classes, cycle, children_of, empty)
+            seen.update(path)
+            seen.update(self.depth)
+
+    def _propagate(self, classes, roots, children_of, empty):
+        for cid in roots:
+            self.depth[cid] = 0
+            self.inherited_attributes[cid] = empty
+            self.inherited_methods[cid] = empty
+        queue = list(roots)
+        for cid in queue:
+            cls = classes[cid]
+            attrs = self.inherited_attributes[cid]
+            if cls.attributes:
+                attrs = attrs | set(cls.attributes)
+            methods = self.inherited_methods[cid]
+            if cls.methods:
+                methods = methods | set(cls.methods)
+            for child in children_of[cid]:
+                if child in self.depth:
+                    continue
+                self.depth[child] = self.depth[cid] + 1
+                self.inherited_attributes[child] = attrs
+                self.inherited_methods[child] = methods
+                queue.append(child)
+
+def compute_metrics(classes, inheritance=None, coupling=None):
+    return list(iter_metrics(classes, inheritance, coupling))
+
+def iter_metrics(classes, inheritance=None, coupling=None):
+    """逐个类产出指标记录"""
+    if inheritance is None:
+        inheritance = InheritanceGraph(classes)
+    for cycle in inheritance.cycles:
+        names = ' -> '.join(classes[cid].name for cid in cycle)
+        print(f"⚠️ 检测到继承环，已忽略环上的继承关系：{names}")
+
+    if coupling is None:
+        coupling = CouplingMatrix(classes)
     for cls in classes.values():
-        # CK 度量
-        wmc = sum([m['complexity'] for m in cls.code_methods.values()]) if cls.code_methods else len(cls.methods)
-        lcom = 0
-        if cls.code_methods:
-            shared_fields = set()
-            for m in cls.code_methods.values():
-                shared_fields.update(m['fields'])
-            lcom = max(0, len(cls.code_methods) - len(shared_fields))
-
-        ck = {
-            'WMC': wmc,
-            'DIT': get_dit(cls, classes),
-            'NOC': len(cls.children),
-            'CBO': len(cls.associations),
-            'RFC': len(set().union(*(m['calls'] for m in cls.code_methods.values()))) + len(cls.code_methods),
-            'LCOM': lcom
-        }
-
-        # LK 度量
-        lk = {
-            'NOA': len(cls.attributes),
-            'NOM': len(cls.methods),
-            'SIZE': len(cls.attributes) + len(cls.methods)
-        }
-
-        # MOOD 度量
-        private_methods = [m for m in cls.methods if m.startswith('_')]
-        private_attributes = [a for a in cls.attributes if a.startswith('_')]
-
-        inherited_attrs = []
-        inherited_methods = []
-        if cls.parent and cls.parent in classes:
-            parent = classes[cls.parent]
-            inherited_attrs = parent.attributes
-            inherited_methods = parent.methods
-
-        mood = {
-            'MHF': round(len(private_methods) / len(cls.methods), 2) if cls.methods else 0.0,
-            'AHF': round(len(private_attributes) / len(cls.attributes), 2) if cls.attributes else 0.0,
-            'MIF': round(len(inherited_methods) / len(cls.methods), 2) if cls.methods else 0.0,
-            'AIF': round(len(inherited_attrs) / len(cls.attributes), 2) if cls.attributes else 0.0,
-            'CF': round(len(cls.associations) / max_couplings, 2) if max_couplings else 0.0
-        }
-
-        result.append({
-            'NAME': cls.name,
-            'CK': ck,
-            'LK': lk,
-            'MOOD': mood
-        })
-
-    return result
-
-
-def main(input_path="temp2.xml", output_path="metrics_oo.json"):
-    xmi_path = input_path
-    # 假设代码实现都在 src 文件夹中
-    source_path = os.path.join("src")
+        yield class_metrics(cls, inheritance, coupling)
+
+def class_metrics(cls, inheritance, coupling):
+    """单个类的指标记录；耦合相关的指标取自整个模型的耦合矩阵"""
+    # CK 度量
+    wmc = sum([m['complexity'] for m in cls.code_methods.values()]) if cls.code_methods else len(cls.methods)
+    cohesion = cohesion_metrics(cls.code_methods)
+    coupled = coupling.metrics(cls.id)
+    ck = {
+        'WMC': wmc,
+        'DIT': inheritance.depth[cls.id],
+        'NOC': len(cls.children),
+        'CBO': coupled['CBO'],
+        'RFC': coupled['RFC'],
+        'LCOM': cohesion['LCOM']
+    }
+
+    # LK 度量
+    lk = {
+        'NOA': len(cls.attributes),
+        'NOM': len(cls.methods),
+        'SIZE': len(cls.attributes) + len(cls.methods)
+    }
+
+    # MOOD 度量
+    private_methods = [m for m in cls.methods if m.startswith('_')]
+    private_attributes = [a for a in cls.attributes if a.startswith('_')]
+
+    # 沿整条继承链继承且未被重写的属性/方法名；MIF / AIF 为继承的占可用（定义 + 继承）的比例
+    inherited_attrs = inheritance.inherited_attributes[cls.id].difference(cls.attributes)
+    inherited_methods = inheritance.inherited_methods[cls.id].difference(cls.methods)
+    available_methods = len(set(cls.methods)) + len(inherited_methods)
+    available_attrs = len(set(cls.attributes)) + len(inherited_attrs)
+
+    mood = {
+        'MHF': round(len(private_methods) / len(cls.methods), 2) if cls.methods else 0.0,
+        'AHF': round(len(private_attributes) / len(cls.attributes), 2) if cls.attributes else 0.0,
+        'MIF': round(len(inherited_methods) / available_methods, 2) if available_methods else 0.0,
+        'AIF': round(len(inherited_attrs) / available_attrs, 2) if available_attrs else 0.0,
+        'CF': coupled['CF']
+    }
+
+    return {
+        'NAME': cls.name,
+        'QUALIFIED_NAME': cls.qualified_name,
+        'CK': ck,
+        'LK': lk,
+        'MOOD': mood,
+        'COUPLING': {'FAN_IN': coupled['FAN_IN'], 'FAN_OUT': coupled['FAN_OUT']},
+        'COHESION': {k: cohesion[k] for k in ('LCOM1', 'LCOM4', 'TCC', 'LCC')}
+    }
+
+
+def load_model(input_path, src_dir="src", cache=None, profiler=None, discovery=None, progress=None):
+    """解析类图并把 src_dir 中的实现代码关联到类上，返回只读的 CompactModel"""
+    if profiler is None:
+        profiler = Profiler(enabled=False)
 
     print("正在解析类图 ...")
-    classes = parse_xmi(xmi_path)
+    with profiler.phase("parse_xmi"):
+        classes = parse_xmi(input_path)
+    profiler.count("bytes_read", os.path.getsize(input_path))
+    profiler.count("classes", len(classes))
 
     print("分析 Python 实现代码 ...")
-    analyze_python_sources(source_path, classes)
+    with profiler.phase("analyze_python_sources"):
+        analyze_python_sources(src_dir, classes, cache, profiler, discovery, progress)
+    if cache is not None:
+        with profiler.phase("cache_prune"):
+            cache.prune()
+    with profiler.phase("compact_model"):
+        return CompactModel(classes)
+
+def analyze(input_path, src_dir="src", cache=None, profiler=None, discovery=None):
+    """解析类图并结合 src_dir 中的实现代码计算指标，返回指标列表"""
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    classes = load_model(input_path, src_dir, cache, profiler, discovery)
 
     print("计算 CK / LK 指标 ...")
-    metrics = compute_metrics(classes)
-
-    print("保存到 JSON 文件 ...")
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(metrics, f, indent=2, ensure_ascii=False)
-
-    print(f"\n 完成！共分析 {len(classes)} 个类，指标保存在 {output_path}")
+    with profiler.phase("compute_metrics"):
+        return compute_metrics(classes)
+
+def write_metrics(classes, output_path, fmt="json", profiler=None, store=None):
+    """计算各类的指标并逐条写出；store 为指标库的 RunWriter 时同时写入指标库"""
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    print("计算 CK / LK 指标并保存 ...")
+    with profiler.phase("compute_metrics"), store or nullcontext(), RecordWriter(output_path, fmt) as writer:
+        coupling = CouplingMatrix(classes)
+        for record in iter_metrics(classes, coupling=coupling):
+            writer.write(record)
+            if store is not None:
+                store.write(record)
+    if store is not None:
+        print(f"已写入指标库，运行 ID {store.run_id}")
+
+    print(f"\n 完成！共分析 {writer.count} 个类，指标保存在 {output_path}")
+    print(f"类之间共 {coupling.relations} 条依赖，系统耦合因子 CF = {coupling.system_cf}")
+
+def main(input_path="temp2.xml", output_path="metrics_oo.json", cache=None, fmt="json", profiler=None,
+         discovery=None, store=None, src_dir="src"):
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    # 假设代码实现都在 src 文件夹中
+    try:
+        classes = load_model(input_path, src_dir, cache, profiler, discovery)
+    except BaseException:
+        if store is not None:
+            store.discard()
+        raise
+    write_metrics(classes, output_path, fmt, profiler, store)
+
+    if profiler.enabled:
+        print(profiler.format_report())
+        print(f"统计结果保存在 {write_stats(profiler, output_path)}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", default="temp2.xml", help="输入XMI文件路径")
     parser.add_argument("--output", default="metrics_oo.json", help="输出JSON路径")
+    parser.add_argument("--format", default="json", choices=FORMATS, help="输出格式")
+    add_cache_arguments(parser)
+    add_profile_arguments(parser)
+    add_discovery_arguments(parser)
+    add_store_arguments(parser)
     args = parser.parse_args()
 
-    main(args.input, args.output)
+    profiler = Profiler(enabled=args.profile, top_n=args.profile_top)
+    main(args.input, args.output, cache_from_args(args), args.format, profiler, discovery_from_args(args),
+         store_writer(args, "oo", source=args.input))
@@ -1,50 +1,152 @@
 import xml.etree.ElementTree as ET
 import argparse
 import json
+import os
+import glob
+import time
+import statistics
+from contextlib import nullcontext
+from output_writers import FORMATS, RecordWriter, write_records
+from profiling import Profiler, add_profile_arguments, write_stats
+from metrics_store import add_store_arguments, store_writer
+from discovery import SourceDiscovery
+from process_pool import imap_ordered
+
+# 批量模式下目录中视为用例图的文件
+MODEL_PATTERNS = ("*.xml", "*.xmi")
+
+XMI_NS = '{http://schema.omg.org/spec/XMI/2.1}'
+XMI_ID = XMI_NS + 'id'
+XMI_TYPE = XMI_NS + 'type'
+
+# 复杂度分级 (上限, 权重)：参与者按关联的用例数，用例按关联的参与者数与
+# include / extend 数之和划分为简单、一般、复杂三级
+ACTOR_LEVELS = ((1, 1), (3, 2), (None, 3))
+USECASE_LEVELS = ((1, 5), (3, 10), (None, 15))
+
+
+class UseCaseModel:
+    """用例图解析结果：参与者、用例以及去重后的参与者—用例边"""
+
+    def __init__(self):
+        self.actors = {}          # ID -> 名称
+        self.usecases = {}        # ID -> 名称
+        self.edges = []           # (参与者 ID, 用例 ID)，按首次出现的顺序
+        self.unresolved = 0       # 两端不是一个参与者与一个用例的关联
+        self.actor_degree = {}    # 参与者 ID -> 关联的用例数
+        self.usecase_degree = {}  # 用例 ID -> 关联的参与者数
+        self.relations = {}       # 用例 ID -> include / extend 数
+
+    def __repr__(self):
+        return (f"UseCaseModel(actors={len(self.actors)}, usecases={len(self.usecases)}, "
+                f"edges={len(self.edges)}, unresolved={self.unresolved})")
+
+
+def _xmi_attr(elem, attr, name):
+    # 兼容未声明命名空间、以字面 xmi: 前缀写出的属性
+    return elem.get(attr) or elem.get(f'xmi:{name}')
+
 
 def parse_usecase_xmi(filename):
-    tree = ET.parse(filename)
-    root = tree.getroot()
-
-    actors = {}
-    usecases = {}
-    associations = []
-
-    for elem in root.findall(".//packagedElement"):
-        # 处理带命名空间的属性：xmi:type, xmi:id
-        xmi_type = elem.attrib.get('{http://schema.omg.org/spec/XMI/2.1}type') or elem.attrib.get('xmi:type')
-        xmi_id = elem.attrib.get('{http://schema.omg.org/spec/XMI/2.1}id') or elem.attrib.get('xmi:id')
-        name = elem.attrib.get('name', '')
-
-        if xmi_type == 'uml:Actor':
-            actors[xmi_id] = name
-        elif xmi_type == 'uml:UseCase':
-            usecases[xmi_id] = name
-        elif xmi_type == 'uml:Association':
-            ends = elem.findall('ownedEnd')
-            for end in ends:
-                actor_or_usecase_id = end.attrib.get('type')
-                associations.append(actor_or_usecase_id)
-
-    return actors, usecases, associations
-
-def compute_usecase_metrics(actors, usecases, associations):
-    # Use Case Weights (simplified): assume all use cases are average (weight 10)
-    usecase_weight = 10
-    uucw = len(usecases) * usecase_weight
-
-    # Actor Weights (simplified): assume all actors are average (weight 2)
-    actor_weight = 2
-    uaw = len(actors) * actor_weight
+    """单遍流式解析用例图
+
+    与类图相同使用 iterparse，元素处理完即清空，峰值内存只与参与者、用例和
+    关联的数量相关。关联在遍历时只记录各端引用（ownedEnd 的 type，或指向其他
+    元素中属性的 memberEnd），遍历结束后通过 ID 索引解析为参与者—用例边。
+    """
+    model = UseCaseModel()
+    properties = {}    # 属性 ID -> type，用于解析 memberEnd
+    associations = []  # 每个关联的 (ownedEnd type 列表, ownedEnd ID 集合, memberEnd ID 列表)
+    relations = []     # include / extend 所在的用例 ID
+
+    stack = []
+    root = None
+
+    for event, elem in ET.iterparse(filename, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            tag = elem.tag
+            parent_kind, parent_data = (stack[-1][1], stack[-1][2]) if stack else (None, None)
+            kind, data = None, None
+
+            if tag == 'packagedElement':
+                xmi_type = _xmi_attr(elem, XMI_TYPE, 'type')
+                xmi_id = _xmi_attr(elem, XMI_ID, 'id')
+                if xmi_type == 'uml:Actor':
+                    model.actors[xmi_id] = elem.get('name', '')
+                elif xmi_type == 'uml:UseCase':
+                    kind, data = 'usecase', xmi_id
+                    model.usecases[xmi_id] = elem.get('name', '')
+                elif xmi_type == 'uml:Association':
+                    kind, data = 'assoc', ([], set(), (elem.get('memberEnd') or '').split())
+                    associations.append(data)
+            elif tag in ('ownedEnd', 'ownedAttribute'):
+                end_id, end_type = _xmi_attr(elem, XMI_ID, 'id'), elem.get('type')
+                properties[end_id] = end_type
+                if parent_kind == 'assoc' and tag == 'ownedEnd':
+                    parent_data[0].append(end_type)
+                    parent_data[1].add(end_id)
+            elif parent_kind == 'usecase' and tag in ('include', 'extend'):
+                relations.append(parent_data)
+
+            stack.append((elem, kind, data))
+        else:
+            stack.pop()
+            elem.clear()
+            # 顶层元素处理完后释放根节点上的引用
+            if len(stack) == 1:
+                root.clear()
+
+    model.actor_degree = dict.fromkeys(model.actors, 0)
+    model.usecase_degree = dict.fromkeys(model.usecases, 0)
+    model.relations = dict.fromkeys(model.usecases, 0)
+    for usecase_id in relations:
+        model.relations[usecase_id] += 1
+
+    seen = set()
+    for end_types, owned_ids, member_ends in associations:
+        # memberEnd 中不是 ownedEnd 的端由其他元素（如参与者的 ownedAttribute）持有
+        end_types = end_types + [properties.get(end_id) for end_id in member_ends if end_id not in owned_ids]
+        actor_ids = [t for t in end_types if t in model.actors]
+        usecase_ids = [t for t in end_types if t in model.usecases]
+        if len(end_types) != 2 or len(actor_ids) != 1 or len(usecase_ids) != 1:
+            model.unresolved += 1
+            continue
+        edge = (actor_ids[0], usecase_ids[0])
+        if edge not in seen:
+            seen.add(edge)
+            model.edges.append(edge)
+            model.actor_degree[edge[0]] += 1
+            model.usecase_degree[edge[1]] += 1
+
+    return model
+
+
+def _weight(score, levels):
+    for limit, weight in levels:
+        if limit is None or score <= limit:
+            return weight
+
+
+def compute_usecase_metrics(model):
+    # 参与者权重：按关联的用例数分为简单 (1)、一般 (2)、复杂 (3)
+    uaw = sum(_weight(degree, ACTOR_LEVELS) for degree in model.actor_degree.values())
+
+    # 用例权重：按关联的参与者数与 include / extend 数分为简单 (5)、一般 (10)、复杂 (15)
+    uucw = sum(_weight(degree + model.relations[uid], USECASE_LEVELS)
+               for uid, degree in model.usecase_degree.items())
+
+    actor_count, usecase_count, edge_count = len(model.actors), len(model.usecases), len(model.edges)
 
     # ======== 使用结构性指标估算 TCF 和 EF ========
     # TCF = 0.6 + (0.4 * scale), scale ∈ [0, 1]
-    tcf_score = (len(usecases) / 20) + (len(associations) / 30)
+    tcf_score = (usecase_count / 20) + (edge_count / 30)
     tcf_score = min(tcf_score, 1.0)
     tcf_value = round(0.6 + (0.4 * tcf_score), 2)
 
     # EF = 1.4 - (0.6 * scale), scale ∈ [0, 1]
-    ef_score = (len(actors) / 10) + (len(usecases) / 20)
+    ef_score = (actor_count / 10) + (usecase_count / 20)
     ef_score = min(ef_score, 1.0)
     ef_value = round(1.4 - (0.6 * ef_score), 2)
 
@@ -55,9 +157,10 @@ def compute_usecase_metrics(actors, usecases, associations):
     ucp = uucp * tcf_value * ef_value
 
     return {
-        "ActorCount": len(actors),
-        "UseCaseCount": len(usecases),
-        "AssociationCount": len(associations),
+        "ActorCount": actor_count,
+        "UseCaseCount": usecase_count,
+        "AssociationCount": edge_count,
+        "UnresolvedAssociations": model.unresolved,
         "UAW": uaw,
         "UUCW": uucw,
         "UUCP": uucp,
@@ -67,18 +170,207 @@ def compute_usecase_metrics(actors, usecases, associations):
     }
 
 
-def main(input_path="user1.xml", output_path="metrics_usecase.json"):
-    actors, usecases, associations = parse_usecase_xmi(input_path)
-    metrics = compute_usecase_metrics(actors, usecases, associations)
+def analyze(input_path, profiler=None):
+    """解析用例图并返回用例点指标"""
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    with profiler.phase("parse_usecase_xmi"):
+        model = parse_usecase_xmi(input_path)
+    profiler.count("bytes_read", os.path.getsize(input_path))
+    profiler.count("actors", len(model.actors))
+    profiler.count("usecases", len(model.usecases))
+    profiler.count("edges", len(model.edges))
+    with profiler.phase("compute_usecase_metrics"):
+        return compute_usecase_metrics(model)
+
+
+def write_metrics(metrics, output_path, fmt="json", store=None):
+    """写出单个模型的指标（JSON 格式为单个对象）；store 为指标库的 RunWriter 时同时写入指标库"""
+    with store or nullcontext():
+        if fmt == "json":
+            with open(output_path, "w", encoding="utf-8") as f:
+                json.dump(metrics, f, indent=2, ensure_ascii=False)
+        else:
+            write_records([metrics], output_path, fmt)
+        if store is not None:
+            store.write(metrics)
+    if store is not None:
+        print(f"已写入指标库，运行 ID {store.run_id}")
+
+
+def main(input_path="user1.xml", output_path="metrics_usecase.json", fmt="json", profiler=None, store=None):
+    try:
+        metrics = analyze(input_path, profiler)
+    except BaseException:
+        if store is not None:
+            store.discard()
+        raise
 
     print(json.dumps(metrics, indent=2, ensure_ascii=False))
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(metrics, f, indent=2, ensure_ascii=False)
+    write_metrics(metrics, output_path, fmt, store)
+
+    if profiler is not None and profiler.enabled:
+        print(profiler.format_report())
+        print(f"统计结果保存在 {write_stats(profiler, output_path)}")
+
+# ---------- 批量模式 ----------
+
+def collect_models(patterns):
+    """把目录、glob 与文件路径展开为去重后的用例图列表
+
+    目录按遍历顺序查找 *.xml / *.xmi（跳过 .git 等目录），glob 的结果按名称排序。
+    """
+    paths, seen = [], set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            found = SourceDiscovery(include=MODEL_PATTERNS).files(pattern)
+        elif any(c in pattern for c in "*?["):
+            found = sorted(glob.glob(pattern, recursive=True))
+        else:
+            found = [pattern]
+        for path in found:
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def analyze_model(path):
+    """分析单个用例图（可在工作进程中执行），返回 (路径, 指标, 错误, 统计)
+
+    格式错误的文件只返回错误信息，不中断整个批次。
+    """
+    stats = {}
+    start = time.perf_counter()
+    try:
+        stats["bytes"] = os.path.getsize(path)
+        model = parse_usecase_xmi(path)
+        stats["parse"] = time.perf_counter() - start
+        metrics, error = {"Model": path, **compute_usecase_metrics(model)}, None
+    except Exception as e:
+        metrics, error = None, f"{type(e).__name__}: {e}"
+    stats["total"] = time.perf_counter() - start
+    return path, metrics, error, stats
+
+
+def iter_batch(paths, jobs=1):
+    """按输入顺序逐个产出 analyze_model 的结果，jobs > 1 时使用进程池并行解析
+
+    使工作进程退出的模型（如超大文件耗尽内存）作为该模型的解析失败返回，见 process_pool。
+    """
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield analyze_model(path)
+        return
+    chunksize = max(1, min(16, len(paths) // (jobs * 4)))
+    yield from imap_ordered(analyze_model, paths, jobs, _crashed, chunksize)
+
+
+def _crashed(path, error):
+    return path, None, error, {}
+
+
+def portfolio_summary(records, failures):
+    """整个批次的汇总：各计数与用例点的合计、UCP 分布以及失败的文件"""
+    totals = {field: sum(r[field] for r in records)
+              for field in ("ActorCount", "UseCaseCount", "AssociationCount", "UnresolvedAssociations",
+                            "UAW", "UUCW", "UUCP")}
+    totals["UCP"] = round(sum(r["UCP"] for r in records), 2)
+    ucps = [r["UCP"] for r in records]
+    return {
+        "ModelCount": len(records),
+        "FailedCount": len(failures),
+        "Totals": totals,
+        "UCP": {
+            "Mean": round(statistics.mean(ucps), 2) if ucps else 0.0,
+            "Median": round(statistics.median(ucps), 2) if ucps else 0.0,
+            "Min": min(ucps, default=0.0),
+            "Max": max(ucps, default=0.0),
+        },
+        "TCFMean": round(statistics.mean(r["TCF"] for r in records), 2) if records else 0.0,
+        "EFMean": round(statistics.mean(r["EF"] for r in records), 2) if records else 0.0,
+        "Failures": [{"Model": path, "Error": error} for path, error in failures],
+    }
+
+
+def iter_batch_records(patterns, jobs=1, failures=None, profiler=None):
+    """逐个产出每个模型的指标记录，解析失败的文件记录到 failures 中"""
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    with profiler.phase("discover"):
+        paths = collect_models(patterns)
+    with profiler.phase("analyze"):
+        for path, metrics, error, stats in iter_batch(paths, jobs):
+            profiler.record_file(path, stats)
+            if error is not None:
+                profiler.count("failures")
+                if failures is not None:
+                    failures.append((path, error))
+                print(f"⚠️ 解析失败：{path} - {error}")
+                continue
+            yield metrics
+
+
+def analyze_batch(patterns, jobs=1, profiler=None):
+    """批量分析用例图，返回 (每个模型的指标列表, 汇总)"""
+    failures = []
+    records = list(iter_batch_records(patterns, jobs, failures, profiler))
+    return records, portfolio_summary(records, failures)
+
+
+def portfolio_path(output_path):
+    """汇总结果与主输出并列存放：metrics_usecase.json -> metrics_usecase.portfolio.json"""
+    return f"{os.path.splitext(output_path)[0]}.portfolio.json"
+
+
+def main_batch(patterns, output_path="metrics_usecase.json", fmt="json", jobs=1, profiler=None, store=None):
+    """批量模式：每个模型一条记录写入 output_path，汇总写入 .portfolio.json"""
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+
+    records, failures = [], []
+    with store or nullcontext(), RecordWriter(output_path, fmt) as writer:
+        for metrics in iter_batch_records(patterns, jobs, failures, profiler):
+            records.append(metrics)
+            writer.write(metrics)
+            if store is not None:
+                store.write(metrics)
+    if store is not None:
+        print(f"已写入指标库，运行 ID {store.run_id}")
+
+    if not records and not failures:
+        print("⚠️ 没有找到用例图文件！")
+    summary = portfolio_summary(records, failures)
+    with open(portfolio_path(output_path), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+
+    print(f"分析完成，共 {len(records)} 个用例图，结果保存在 {output_path}")
+    print(f"合计 UCP {summary['Totals']['UCP']}，平均 {summary['UCP']['Mean']}，中位数 {summary['UCP']['Median']}；"
+          f"汇总保存在 {portfolio_path(output_path)}")
+    if failures:
+        print(f"⚠️ 共 {len(failures)} 个文件解析失败")
+
+    if profiler.enabled:
+        print(profiler.format_report())
+        print(f"统计结果保存在 {write_stats(profiler, output_path)}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", default="user1.xml", help="输入XMI文件路径")
     parser.add_argument("--output", default="metrics_usecase.json", help="输出JSON路径")
+    parser.add_argument("--format", default="json", choices=FORMATS, help="输出格式")
+    parser.add_argument("--batch", nargs="+", default=None,
+                        help="批量模式：目录、glob（如 'models/**/*.xml'）或文件，给出时忽略 --input")
+    parser.add_argument("--jobs", type=int, default=1, help="批量模式的并行进程数（0 为使用全部 CPU 核心）")
+    add_profile_arguments(parser)
+    add_store_arguments(parser)
     args = parser.parse_args()
-    
-    main(args.input, args.output)
\ No newline at end of file
+
+    profiler = Profiler(enabled=args.profile, top_n=args.profile_top)
+    if args.batch:
+        main_batch(args.batch, args.output, args.format, args.jobs, profiler,
+                   store_writer(args, "usecase", source=", ".join(args.batch)))
+    else:
+        main(args.input, args.output, args.format, profiler, store_writer(args, "usecase", source=args.input))
\ No newline at end of file
@@ -0,0 +1,331 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from queue import Empty
+
+# 规模档位：Python 文件数、每文件类数、每类方法数、类图类数、继承深度、用例数
+TIERS = {
+    "small": {"files": 20, "classes_per_file": 3, "methods": 5, "depth": 3, "actors": 5, "usecases": 30},
+    "medium": {"files": 200, "classes_per_file": 5, "methods": 8, "depth": 5, "actors": 20, "usecases": 300},
+    "large": {"files": 1000, "classes_per_file": 10, "methods": 10, "depth": 8, "actors": 50, "usecases": 3000},
+}
+
+BENCHMARKS = ("analyze_code_file", "analyse_code", "parse_xmi", "analyze_python_sources",
+              "compute_metrics", "parse_usecase_xmi")
+
+# 等待子进程结果时检查其是否仍在运行的间隔；单次运行的默认超时
+POLL_SECONDS = 1.0
+DEFAULT_TIMEOUT = 1800
+
+XMI_HEADER = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<uml:Model xmi:version="2.1" xmlns:xmi="http://schema.omg.org/spec/XMI/2.1" '
+              'xmlns:uml="http://www.eclipse.org/uml2/2.1.0/UML" xmi:id="_model" name="{name}">\n')
+XMI_FOOTER = '</uml:Model>\n'
+
+
+# ---------- 合成数据生成 ----------
+
+def _nested_block(rng, level, nesting, indent, fields, calls):
+    """递归生成分支嵌套的语句块，每一层随机选择 if / for / while / try"""
+    if level == nesting:
+        return [f"{indent}self.{rng.choice(fields)} = x", f"{indent}return self.{rng.choice(calls)}(x)"]
+    inner = _nested_block(rng, level + 1, nesting, indent + "    ", fields, calls)
+    kind = rng.choice(["if", "for", "while", "try"])
+    if kind == "if":
+        return [f"{indent}if x > {level} and self.{rng.choice(fields)}:"] + inner
+    if kind == "for":
+        return [f"{indent}for i{level} in range(x):"] + inner
+    if kind == "while":
+        return [f"{indent}while x > {level}:", f"{indent}    x -= 1"] + inner
+    return [f"{indent}try:"] + inner + [f"{indent}except ValueError:", f"{indent}    return None"]
+
+
+def _method_source(rng, name, nesting, fields, calls):
+    """生成一个方法，复杂度由嵌套层数 nesting 控制"""
+    lines = [f"    def {name}(self, x):", "        # 自动生成的方法"]
+    lines.extend(_nested_block(rng, 0, nesting, "        ", fields, calls))
+    if nesting:
+        lines.append("        return x")
+    return lines
+
+
+def class_names(tier):
+    total = tier["files"] * tier["classes_per_file"]
+    return [f"Class{i:06d}" for i in range(total)]
+
+
+def generate_python_tree(root, tier, seed=0, nesting=3):
+    """生成合成 Python 源码树：N 个文件，每个文件 M 个类，目录按 10 个文件一组嵌套"""
+    rng = random.Random(seed)
+    names = class_names(tier)
+    total_bytes = 0
+    per_file = tier["classes_per_file"]
+    for file_idx in range(tier["files"]):
+        pkg = os.path.join(root, f"pkg{file_idx // 100:03d}", f"sub{file_idx // 10:04d}")
+        os.makedirs(pkg, exist_ok=True)
+        lines = ['"""自动生成的基准测试模块"""', "import os", ""]
+        for name in names[file_idx * per_file:(file_idx + 1) * per_file]:
+            fields = [f"field{k}" for k in range(4)]
+            methods = [f"method{k}" for k in range(tier["methods"])]
+            lines.append(f"class {name}:")
+            lines.append("    def __init__(self):")
+            for field in fields:
+                lines.append(f"        self.{field} = 0")
+            lines.append("")
+            for method in methods:
+                lines.extend(_method_source(rng, method, rng.randint(0, nesting), fields, methods))
+                lines.append("")
+            lines.append("")
+        code = "\n".join(lines)
+        with open(os.path.join(pkg, f"module{file_idx:05d}.py"), "w", encoding="utf-8") as f:
+            f.write(code)
+        total_bytes += len(code.encode("utf-8"))
+    return total_bytes
+
+
+def generate_class_xmi(path, tier, seed=0, association_density=0.5):
+    """生成合成类图：类名与合成源码一致，继承深度受 depth 限制，按密度添加关联"""
+    rng = random.Random(seed)
+    names = class_names(tier)
+    depth_of = {}
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(XMI_HEADER.format(name="Synthetic"))
+        for i, name in enumerate(names):
+            f.write(f'  <packagedElement xmi:type="uml:Class" xmi:id="_c{i}" name="{name}">\n')
+            depth_of[i] = 0
+            if i > 0 and rng.random() < 0.6:
+                parent = rng.randrange(max(0, i - 50), i)
+                if depth_of[parent] < tier["depth"]:
+                    depth_of[i] = depth_of[parent] + 1
+                    f.write(f'    <generalization xmi:id="_g{i}" general="_c{parent}"/>\n')
+            for k in range(4):
+                visibility = "private" if k % 2 else "public"
+                f.write(f'    <ownedAttribute xmi:id="_a{i}_{k}" name="field{k}" visibility="{visibility}"/>\n')
+            for k in range(tier["methods"]):
+                f.write(f'    <ownedOperation xmi:id="_o{i}_{k}" name="method{k}" visibility="public"/>\n')
+            f.write('  </packagedElement>\n')
+        for j in range(int(len(names) * association_density)):
+            a, b = rng.randrange(len(names)), rng.randrange(len(names))
+            f.write(f'  <packagedElement xmi:type="uml:Association" xmi:id="_as{j}" name="association{j}">\n'
+                    f'    <ownedEnd xmi:id="_as{j}_a" type="_c{a}" association="_as{j}"/>\n'
+                    f'    <ownedEnd xmi:id="_as{j}_b" type="_c{b}" association="_as{j}"/>\n'
+                    '  </packagedElement>\n')
+        f.write(XMI_FOOTER)
+
+
+def generate_usecase_xmi(path, tier, seed=0, association_density=1.5):
+    """生成合成用例图：参与者、用例以及参与者与用例之间的关联"""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(XMI_HEADER.format(name="SyntheticUseCases"))
+        for i in range(tier["actors"]):
+            f.write(f'  <packagedElement xmi:type="uml:Actor" xmi:id="_a{i}" name="Actor{i}"/>\n')
+        for i in range(tier["usecases"]):
+            f.write(f'  <packagedElement xmi:type="uml:UseCase" xmi:id="_u{i}" name="UseCase{i}"/>\n')
+        for j in range(int(tier["usecases"] * association_density)):
+            a, u = rng.randrange(tier["actors"]), rng.randrange(tier["usecases"])
+            f.write(f'  <packagedElement xmi:type="uml:Association" xmi:id="_as{j}" name="Association_{j}">\n'
+                    f'    <ownedEnd xmi:id="_as{j}_s" name="src" type="_a{a}" association="_as{j}"/>\n'
+                    f'    <ownedEnd xmi:id="_as{j}_d" name="dst" type="_u{u}" association="_as{j}"/>\n'
+                    '  </packagedElement>\n')
+        f.write(XMI_FOOTER)
+
+
+def prepare_inputs(workdir, tier_name, seed=0, nesting=3):
+    """生成某一档位的全部输入（同参数的输入可在 workdir 中复用），返回路径信息"""
+    tier = TIERS[tier_name]
+    base = os.path.join(workdir, f"{tier_name}_s{seed}_n{nesting}")
+    src = os.path.join(base, "src")
+    if not os.path.isdir(src):
+        generate_python_tree(src, tier, seed, nesting)
+        generate_class_xmi(os.path.join(base, "classes.xml"), tier, seed)
+        generate_usecase_xmi(os.path.join(base, "usecases.xml"), tier, seed)
+    return {"src": src, "class_xmi": os.path.join(base, "classes.xml"),
+            "usecase_xmi": os.path.join(base, "usecases.xml"), "tier": tier}
+
+
+# ---------- 计时 ----------
+
+def _peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _run_benchmark(name, inputs):
+    """在当前进程中执行一次基准，返回 (耗时秒数, 处理数量, 单位)"""
+    import analyse_code
+    import analyse_oo
+    import analyse_usecase
+
+    if name == "analyze_code_file":
+        files = analyse_code.collect_py_files(inputs["src"])
+        start = time.perf_counter()
+        for filepath in files:
+            analyse_code.analyze_code_file(filepath)
+        return time.perf_counter() - start, len(files), "files"
+    if name == "analyse_code":
+        start = time.perf_counter()
+        results, _ = analyse_code.analyze(inputs["src"], jobs=inputs.get("jobs", 1))
+        return time.perf_counter() - start, len(results), "files"
+    if name == "parse_xmi":
+        start = time.perf_counter()
+        classes = analyse_oo.parse_xmi(inputs["class_xmi"])
+        return time.perf_counter() - start, len(classes), "classes"
+    if name == "analyze_python_sources":
+        classes = analyse_oo.parse_xmi(inputs["class_xmi"])
+        start = time.perf_counter()
+        analyse_oo.analyze_python_sources(inputs["src"], classes)
+        return time.perf_counter() - start, len(classes), "classes"
+    if name == "compute_metrics":
+        classes = analyse_oo.parse_xmi(inputs["class_xmi"])
+        analyse_oo.analyze_python_sources(inputs["src"], classes)
+        start = time.perf_counter()
+        analyse_oo.compute_metrics(classes)
+        return time.perf_counter() - start, len(classes), "classes"
+    if name == "parse_usecase_xmi":
+        start = time.perf_counter()
+        model = analyse_usecase.parse_usecase_xmi(inputs["usecase_xmi"])
+        return time.perf_counter() - start, len(model.actors) + len(model.usecases), "elements"
+    raise ValueError(f"未知的基准：{name}")
+
+
+def _child(name, inputs, queue):
+    try:
+        seconds, count, unit = _run_benchmark(name, inputs)
+        queue.put({"seconds": seconds, "count": count, "unit": unit, "peak_rss_mb": _peak_rss_mb()})
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def _wait_result(proc, queue, timeout=None):
+    """等待子进程的结果；子进程异常退出（OOM、段错误等）或超时时返回错误而不是一直阻塞"""
+    deadline = time.monotonic() + timeout if timeout else None
+    while True:
+        try:
+            return queue.get(timeout=POLL_SECONDS)
+        except Empty:
+            pass
+        if not proc.is_alive():
+            # 退出前写入的结果可能仍在管道中，再取一次
+            try:
+                return queue.get(timeout=POLL_SECONDS)
+            except Empty:
+                return {"error": f"子进程异常退出，退出码 {proc.exitcode}"}
+        if deadline is not None and time.monotonic() > deadline:
+            proc.terminate()
+            return {"error": f"超时（{timeout} 秒）"}
+
+
+def measure(name, inputs, repeat=3, timeout=DEFAULT_TIMEOUT):
+    """每次在独立子进程中运行，取最短耗时；峰值内存取各次的最大值"""
+    ctx = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_child, args=(name, inputs, queue))
+        proc.start()
+        result = _wait_result(proc, queue, timeout)
+        proc.join()
+        if "error" in result:
+            return result
+        runs.append(result)
+
+    best = min(runs, key=lambda r: r["seconds"])
+    return {
+        "seconds": round(best["seconds"], 4),
+        "count": best["count"],
+        "throughput": round(best["count"] / best["seconds"], 1) if best["seconds"] else None,
+        "unit": f"{best['unit']}/s",
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+    }
+
+
+def run_suite(tiers, benchmarks, workdir, repeat=3, seed=0, jobs=1, nesting=3, timeout=DEFAULT_TIMEOUT):
+    results = {}
+    for tier_name in tiers:
+        print(f"生成 {tier_name} 档位输入 ...")
+        inputs = prepare_inputs(workdir, tier_name, seed, nesting)
+        inputs = {k: v for k, v in inputs.items() if k != "tier"}
+        inputs["jobs"] = jobs
+        for name in benchmarks:
+            result = measure(name, inputs, repeat, timeout)
+            results[f"{tier_name}/{name}"] = result
+            if "error" in result:
+                print(f"  ⚠️ {name}: {result['error']}")
+            else:
+                print(f"  {name:<24} {result['seconds']:>9.4f}s  {result['throughput']:>10} {result['unit']:<14}"
+                      f" 峰值内存 {result['peak_rss_mb']} MB")
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    """与基线比较，耗时或峰值内存超过基线 (1 + threshold) 倍的记为回退"""
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base or "error" in current or "error" in base:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if base.get(metric) and current[metric] > base[metric] * (1 + threshold):
+                regressions.append((key, metric, base[metric], current[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分析器性能基准")
+    parser.add_argument("--tiers", nargs="+", default=["small", "medium"], choices=list(TIERS), help="规模档位")
+    parser.add_argument("--bench", nargs="+", default=list(BENCHMARKS), choices=BENCHMARKS, help="要运行的基准")
+    parser.add_argument("--repeat", type=int, default=3, help="每个基准重复次数（取最短耗时）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--nesting", type=int, default=3, help="合成方法的最大分支嵌套层数")
+    parser.add_argument("--jobs", type=int, default=1, help="analyse_code 基准使用的并行进程数")
+    parser.add_argument("--workdir", default=None, help="合成输入目录（默认使用临时目录）")
+    parser.add_argument("--output", default="benchmark_results.json", help="结果 JSON 路径")
+    parser.add_argument("--compare", default=None, help="基线 JSON 路径，给出时检查性能回退")
+    parser.add_argument("--threshold", type=float, default=0.2, help="回退判定阈值（比例）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="单次运行的超时秒数（0 为不限制）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="metrics_bench_") as tmp:
+        workdir = args.workdir or tmp
+        results = run_suite(args.tiers, args.bench, workdir, args.repeat, args.seed, args.jobs, args.nesting,
+                            args.timeout)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "nesting": args.nesting,
+            "jobs": args.jobs,
+            "repeat": args.repeat,
+            "tiers": {name: TIERS[name] for name in args.tiers},
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"基准结果保存在 {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for key, metric, old, new in regressions:
+            print(f"❌ 性能回退：{key} {metric} {old} -> {new}")
+        if regressions:
+            sys.exit(1)
+        print("✅ 未发现性能回退")
+
+
+if __name__ == "__main__":
+    main()
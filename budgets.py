@@ -0,0 +1,121 @@
+import os
+import sys
+import signal
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows 上没有 resource，内存预算不生效
+    resource = None
+
+# 默认预算：超过 5 MB 的文件（生成代码、打包的第三方库等）只统计行数；
+# 单个文件分析超过 60 秒即放弃复杂度计算。内存预算默认关闭。
+DEFAULT_MAX_FILE_MB = 5
+DEFAULT_FILE_TIMEOUT = 60
+
+
+class BudgetExceeded(BaseException):
+    """单个文件超出预算，reason 取值：size / time / memory
+
+    与 KeyboardInterrupt 一样继承 BaseException：超时信号可能在任意位置抛出，
+    不能被分析代码中的 except Exception 当作普通错误吞掉。
+    """
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class FileBudget:
+    """单个文件的大小、时间与内存预算（0 或 None 表示不限制）
+
+    - 大小在读取文件前检查，超出时不读入整个文件
+    - 时间通过 SIGALRM 中断分析，在主线程中直接生效；信号只能在主线程中设置，
+      在其他线程（如 dashboard 的后台任务）中需要独立的工作进程。时间检查发生在
+      Python 字节码之间，ast.parse 本身的耗时由大小预算约束
+    - 内存通过 RLIMIT_AS 限制工作进程的地址空间，超出时得到 MemoryError，
+      总是需要独立的工作进程
+    """
+
+    def __init__(self, max_bytes=None, timeout=None, max_memory=None):
+        self.max_bytes = max_bytes or None
+        self.timeout = timeout or None
+        self.max_memory = max_memory or None
+
+    @property
+    def isolated(self):
+        """在当前线程中分析时，是否需要改在工作进程中执行才能让预算生效"""
+        if self.max_memory and resource is not None:
+            return True
+        return bool(self.timeout) and _has_alarm() and threading.current_thread() is not threading.main_thread()
+
+    def too_large(self, size):
+        return self.max_bytes is not None and size > self.max_bytes
+
+    @contextmanager
+    def time_limit(self):
+        # 信号处理函数只能在主线程中设置（如 dashboard 的后台线程中不生效）
+        if not self.timeout or not _has_alarm() or threading.current_thread() is not threading.main_thread():
+            yield
+            return
+
+        def on_timeout(signum, frame):
+            raise BudgetExceeded("time")
+
+        previous = signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, self.timeout)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    def __repr__(self):
+        return f"FileBudget(max_bytes={self.max_bytes}, timeout={self.timeout}, max_memory={self.max_memory})"
+
+
+NO_BUDGET = FileBudget()
+
+
+def _has_alarm():
+    return hasattr(signal, "setitimer")
+
+
+def _current_memory():
+    """当前进程的地址空间大小（字节）；没有 /proc 时（如 macOS）以峰值常驻内存近似"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024  # macOS 上单位为字节，Linux 上为 KB
+
+
+def init_worker(budget):
+    """工作进程初始化：在当前地址空间之上再允许 max_memory 字节"""
+    if budget is None or not budget.max_memory or resource is None:
+        return
+    limit = _current_memory() + budget.max_memory
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ValueError, OSError) as e:
+        print(f"⚠️ 无法设置内存预算，工作进程不限制内存：{e}")
+
+
+def add_budget_arguments(parser):
+    parser.add_argument("--max-file-mb", type=float, default=DEFAULT_MAX_FILE_MB,
+                        help="超过该大小的文件只统计行数（0 为不限制）")
+    parser.add_argument("--file-timeout", type=float, default=DEFAULT_FILE_TIMEOUT,
+                        help="单个文件分析的超时秒数，超时后只统计行数（0 为不限制）")
+    parser.add_argument("--max-file-memory-mb", type=float, default=0,
+                        help="分析单个文件时工作进程可额外使用的内存（0 为不限制）")
+
+
+def budget_from_args(args):
+    return FileBudget(max_bytes=int(args.max_file_mb * 1024 * 1024),
+                      timeout=args.file_timeout,
+                      max_memory=int(args.max_file_memory_mb * 1024 * 1024))
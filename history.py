@@ -0,0 +1,355 @@
+"""Git 历史模式：沿提交序列增量计算代码指标与 CK 指标
+
+对修订范围内的每个提交（沿第一父提交），用 git diff-tree 找出与上一个提交
+相比变化的文件，只重新分析这些文件；文件内容通过 git cat-file --batch 直接
+从对象库读取，不检出工作区。未变化文件的结果沿用上一个提交；当前树中的
+blob 以及最近不再使用的 BLOB_CACHE_SIZE 个 blob 的结果保留在内存中（如文件
+被改回旧内容时直接复用），更早的结果可从与普通运行共用的 .metrics_cache 读取。
+
+输出为按提交展开的时间序列：每个提交一组代码指标记录（Changed 标记本次
+提交是否修改了该文件），给出类图时另有一组 CK / LK 指标记录。
+"""
+import os
+import io
+import argparse
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import analyse_code
+import analyse_oo
+from metrics_cache import add_cache_arguments, cache_from_args
+from output_writers import FORMATS, RecordWriter
+from profiling import Profiler, add_profile_arguments, write_stats
+from budgets import NO_BUDGET, init_worker, add_budget_arguments, budget_from_args
+from discovery import SourceDiscovery, add_discovery_arguments, discovery_from_args
+from metrics_store import MetricsStore
+
+# 符号链接与子模块不作为源文件
+SKIPPED_MODES = ("120000", "160000")
+# 不在当前树中、仍保留在内存中的 blob 结果数，使内存占用不随历史长度增长
+BLOB_CACHE_SIZE = 4096
+
+
+class GitError(Exception):
+    pass
+
+
+class GitRepo:
+    """对本地仓库执行只读的 git 命令"""
+
+    def __init__(self, path="."):
+        self.path = path
+        self._batch = None
+
+    def run(self, *args):
+        try:
+            proc = subprocess.run(["git", "-C", self.path, *args], capture_output=True)
+        except FileNotFoundError:
+            raise GitError("未找到 git 命令")
+        if proc.returncode != 0:
+            raise GitError(proc.stderr.decode("utf-8", errors="replace").strip())
+        return proc.stdout
+
+    def commits(self, rev_range="HEAD", max_count=None):
+        """按时间正序返回 [(提交 ID, 提交时间)]，只沿第一父提交
+
+        给出 max_count 时取范围内最新的 max_count 个提交。
+        """
+        args = ["log", "--first-parent", "--reverse", "--format=%H %cI"]
+        if max_count:
+            args.append(f"--max-count={max_count}")
+        out = self.run(*args, rev_range, "--").decode("utf-8")
+        return [tuple(line.split(" ", 1)) for line in out.splitlines() if line]
+
+    def ls_tree(self, commit, subdir=""):
+        """提交中 subdir 下的所有文件：{路径: blob ID}"""
+        args = ["ls-tree", "-r", "-z", "--full-tree", commit]
+        if subdir:
+            args += ["--", subdir]
+        files = {}
+        for entry in self.run(*args).split(b"\0"):
+            if not entry:
+                continue
+            meta, path = entry.split(b"\t", 1)
+            mode, kind, sha = meta.decode().split()
+            if kind == "blob" and mode not in SKIPPED_MODES:
+                files[path.decode("utf-8", errors="surrogateescape")] = sha
+        return files
+
+    def diff_tree(self, old, new, subdir=""):
+        """两个提交之间变化的文件：[(状态, 新模式, 路径, 新 blob ID)]，状态为 A / M / D / T"""
+        args = ["diff-tree", "-r", "-z", "--no-renames", "--no-commit-id", old, new]
+        if subdir:
+            args += ["--", subdir]
+        fields = self.run(*args).split(b"\0")
+        changes = []
+        # -z 输出中 ":旧模式 新模式 旧ID 新ID 状态" 与路径交替出现
+        for meta, path in zip(fields[0::2], fields[1::2]):
+            if not meta.startswith(b":"):
+                continue
+            _, new_mode, _, sha, status = meta[1:].decode().split()
+            changes.append((status, new_mode, path.decode("utf-8", errors="surrogateescape"), sha))
+        return changes
+
+    def read_object(self, name):
+        """通过常驻的 git cat-file --batch 读取对象，返回 (对象 ID, 内容)，不存在时返回 (None, None)
+
+        name 可以是 blob ID，也可以是 "提交:路径"。
+        """
+        if self._batch is None:
+            self._batch = subprocess.Popen(["git", "-C", self.path, "cat-file", "--batch"],
+                                           stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._batch.stdin.write(name.encode("utf-8") + b"\n")
+        self._batch.stdin.flush()
+        header = self._batch.stdout.readline().decode("utf-8", errors="replace").split()
+        if len(header) < 3:
+            return None, None
+        data = self._batch.stdout.read(int(header[2]))
+        self._batch.stdout.read(1)  # 内容后的换行
+        return header[0], data
+
+    def close(self):
+        if self._batch is not None:
+            self._batch.stdin.close()
+            self._batch.wait()
+            self._batch = None
+
+
+class Snapshot:
+    """单个提交的分析结果"""
+
+    def __init__(self, commit, date, files, changed, removed, classes=None):
+        self.commit = commit
+        self.date = date
+        self.files = files      # [代码指标记录]，按路径排序
+        self.changed = changed  # 本次提交新增或修改的路径
+        self.removed = removed  # 本次提交删除的路径
+        self.classes = classes  # [CK / LK 指标记录]，未给出类图时为 None
+
+
+def _analyze_blob(item, cache=None, budget=None, with_methods=False):
+    """分析一个 blob（可在工作进程中执行），返回 (路径, 代码指标, 方法数据, 错误)"""
+    path, data = item
+    # 方法数据与代码指标共用一次解析，并受同一份预算约束
+    extraction = analyse_oo.MethodExtraction(cache) if with_methods else None
+    try:
+        record = analyse_code.analyze_code_data(data, path, cache, None, budget, extraction)
+    except Exception as e:
+        return path, None, None, f"{type(e).__name__}: {e}"
+    methods = None
+    if extraction is not None and record["SkipReason"] is None:
+        methods = extraction.methods
+    return path, record, methods, None
+
+
+def _evict_blobs(blobs, live, keep=BLOB_CACHE_SIZE):
+    """淘汰最久未使用、且不在当前树中的 blob，直到其余的不超过 keep 个"""
+    while len(blobs) > len(live) + keep:
+        sha, entry = blobs.popitem(last=False)
+        if sha in live:
+            blobs[sha] = entry
+
+
+def iter_snapshots(repo, rev_range="HEAD", src_dir="", model=None, model_in_repo=False, cache=None,
+                   budget=None, discovery=None, jobs=1, max_count=None, profiler=None):
+    """逐个提交产出 Snapshot
+
+    src_dir：仓库内要分析的子目录（'/' 分隔，空字符串为整个仓库）
+    model：类图路径；model_in_repo 为 True 时按提交从仓库中读取（路径相对于仓库根目录），
+    否则读取磁盘上的文件，所有提交共用同一个类图。
+    """
+    budget = budget or NO_BUDGET
+    if discovery is None:
+        discovery = SourceDiscovery()
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    src_dir = src_dir.strip("/")
+    prefix = src_dir + "/" if src_dir else ""
+
+    def accepted(path):
+        return path.startswith(prefix) and discovery.accepts(path[len(prefix):])
+
+    with profiler.phase("git_log"):
+        commits = repo.commits(rev_range, max_count)
+
+    # blob ID -> (不含 File 的代码指标, 方法数据)，按最近使用排序；当前树中的 blob 不会被淘汰
+    blobs = OrderedDict()
+    files = {}  # 路径 -> blob ID
+    classes = index = None
+    model_id = None
+    class_records = None
+    if model and not model_in_repo:
+        with open(model, "rb") as f:
+            model_data = f.read()
+        model_id = "disk"
+        classes = analyse_oo.parse_xmi(io.BytesIO(model_data))
+        index = analyse_oo.ClassIndex(classes)
+
+    executor = None
+    if jobs > 1 or budget.isolated:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(budget,))
+    analyze_blob = partial(_analyze_blob, cache=cache, budget=budget, with_methods=model is not None)
+
+    try:
+        previous = None
+        for commit, date in commits:
+            changed, removed = set(), set()
+            with profiler.phase("git_diff"):
+                if previous is None:
+                    files = {path: sha for path, sha in repo.ls_tree(commit, src_dir).items() if accepted(path)}
+                    changed = set(files)
+                else:
+                    for status, mode, path, sha in repo.diff_tree(previous, commit, src_dir):
+                        if not accepted(path):
+                            continue
+                        if status == "D" or mode in SKIPPED_MODES:
+                            if files.pop(path, None) is not None:
+                                removed.add(path)
+                        else:
+                            files[path] = sha
+                            changed.add(path)
+            previous = commit
+            profiler.count("commits")
+
+            # 只读取并分析此前没有见过的 blob
+            pending = {}
+            for path in sorted(changed):
+                if files[path] in blobs:
+                    blobs.move_to_end(files[path])
+                elif files[path] not in pending:
+                    pending[files[path]] = path
+            items = []
+            with profiler.phase("read_blobs"):
+                for sha, path in pending.items():
+                    _, data = repo.read_object(sha)
+                    profiler.count("bytes_read", len(data))
+                    items.append((path, data))
+            profiler.count("files_analyzed", len(items))
+            profiler.count("blobs_reused", len(changed) - len(items))
+
+            with profiler.phase("analyze"):
+                results = executor.map(analyze_blob, items) if executor else map(analyze_blob, items)
+                for (path, record, methods, error), sha in zip(results, pending):
+                    if error is not None:
+                        profiler.count("failures")
+                        print(f"⚠️ 分析失败：{commit[:10]} {path} - {error}")
+                        record = None
+                    else:
+                        record = {k: v for k, v in record.items() if k != "File"}
+                    blobs[sha] = (record, methods or {})
+            _evict_blobs(blobs, set(files.values()), BLOB_CACHE_SIZE)
+
+            code_records = [{"File": path, **blobs[sha][0]} for path, sha in sorted(files.items())
+                            if blobs[sha][0] is not None]
+
+            if model:
+                model_changed = False
+                if model_in_repo:
+                    with profiler.phase("read_blobs"):
+                        sha, data = repo.read_object(f"{commit}:{model}")
+                    if sha is None:
+                        print(f"⚠️ 提交 {commit[:10]} 中没有类图：{model}")
+                        classes = index = None
+                        model_changed = model_id is not None
+                    elif sha != model_id:
+                        with profiler.phase("parse_xmi"):
+                            classes = analyse_oo.parse_xmi(io.BytesIO(data))
+                        index = analyse_oo.ClassIndex(classes)
+                        model_changed = True
+                    model_id = sha
+
+                if classes is None:
+                    class_records = []
+                elif model_changed or changed or removed or class_records is None:
+                    # 类图或代码有变化时才重新计算，否则沿用上一个提交的结果
+                    with profiler.phase("compute_metrics"):
+                        for cls in classes.values():
+                            cls.code_methods = {}
+                        for path, sha in sorted(files.items()):
+                            module = analyse_oo.module_name(os.path.join(*path.split("/")), src_dir or ".")
+                            analyse_oo.apply_module_methods(blobs[sha][1], index, module)
+                        class_records = analyse_oo.compute_metrics(classes)
+
+            yield Snapshot(commit, date, code_records, changed, removed, class_records if model else None)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        repo.close()
+
+
+def main(repo_path=".", rev_range="HEAD", src_dir="", output_path="history_code.json", model=None,
+         model_in_repo=False, oo_output_path="history_oo.json", fmt="json", cache=None, budget=None,
+         discovery=None, jobs=1, max_count=None, profiler=None, store_path=None, store_label=None):
+    """store_path 给出时，每个提交另作为一次运行写入指标库（运行时间取提交时间）"""
+    if profiler is None:
+        profiler = Profiler(enabled=False)
+    repo = GitRepo(repo_path)
+
+    commits = 0
+    store = MetricsStore(store_path) if store_path else None
+    oo_writer = RecordWriter(oo_output_path, fmt) if model else None
+    try:
+        with RecordWriter(output_path, fmt) as writer:
+            for snapshot in iter_snapshots(repo, rev_range, src_dir, model, model_in_repo, cache, budget,
+                                           discovery, jobs, max_count, profiler):
+                commits += 1
+                for record in snapshot.files:
+                    writer.write({"Commit": snapshot.commit, "Date": snapshot.date, **record,
+                                  "Changed": record["File"] in snapshot.changed})
+                if oo_writer is not None:
+                    for record in snapshot.classes:
+                        oo_writer.write({"Commit": snapshot.commit, "Date": snapshot.date, **record})
+                if store is not None:
+                    source = src_dir or repo_path
+                    store.ingest("code", snapshot.files, store_label, source, snapshot.commit, snapshot.date)
+                    if snapshot.classes is not None:
+                        store.ingest("oo", snapshot.classes, store_label, model, snapshot.commit, snapshot.date)
+                print(f"{snapshot.commit[:10]} {snapshot.date}  文件 {len(snapshot.files)}，"
+                      f"变化 {len(snapshot.changed)}，删除 {len(snapshot.removed)}")
+    except GitError as e:
+        print(f"⚠️ git 命令失败：{e}")
+        return
+    finally:
+        if oo_writer is not None:
+            oo_writer.close()
+        if store is not None:
+            store.close()
+    if cache is not None:
+        cache.prune()
+
+    print(f"分析完成，共 {commits} 个提交，代码指标保存在 {output_path}")
+    if model:
+        print(f"CK / LK 指标保存在 {oo_output_path}")
+    if profiler.enabled:
+        print(profiler.format_report())
+        print(f"统计结果保存在 {write_stats(profiler, output_path)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="沿 git 历史增量计算代码指标与 CK 指标")
+    parser.add_argument("--repo", default=".", help="本地 git 仓库路径")
+    parser.add_argument("--range", default="HEAD", help="修订范围（如 v1.0..main，默认为 HEAD 的全部历史）")
+    parser.add_argument("--max-count", type=int, default=None, help="只分析范围内最新的 N 个提交")
+    parser.add_argument("--src", default="", help="仓库内要分析的子目录（默认为整个仓库）")
+    parser.add_argument("--model", default=None, help="类图 XMI 路径，给出时同时输出 CK / LK 指标")
+    parser.add_argument("--model-in-repo", action="store_true", help="类图路径相对于仓库根目录，并按提交读取")
+    parser.add_argument("--output", default="history_code.json", help="代码指标输出路径")
+    parser.add_argument("--oo-output", default="history_oo.json", help="CK / LK 指标输出路径")
+    parser.add_argument("--format", default="json", choices=FORMATS, help="输出格式")
+    parser.add_argument("--jobs", type=int, default=1, help="并行进程数（1 为串行，0 为使用全部 CPU 核心）")
+    parser.add_argument("--store", default=None, help="同时写入 SQLite 指标库，每个提交为一次运行")
+    parser.add_argument("--store-label", default=None, help="写入指标库的运行标签")
+    add_cache_arguments(parser)
+    add_budget_arguments(parser)
+    add_discovery_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    profiler = Profiler(enabled=args.profile, top_n=args.profile_top)
+    main(args.repo, args.range, args.src, args.output, args.model, args.model_in_repo, args.oo_output,
+         args.format, cache_from_args(args), budget_from_args(args), discovery_from_args(args),
+         args.jobs, args.max_count, profiler, args.store, args.store_label)
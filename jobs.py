@@ -0,0 +1,176 @@
+"""后台任务队列：在有界的线程池中运行分析，供 dashboard 轮询进度与部分结果
+
+每次分析对应一个 Job，状态依次为 queued -> running -> done / failed / cancelled。
+任务函数以 fn(job, *args) 的形式调用，通过 job.update() 报告进度、
+job.add_record() 提交已完成的记录；取消请求在下一次报告时以 JobCancelled
+中断任务，排队中的任务直接取消。
+
+同一个 key 的任务（如相同模块与输入哈希）只运行一次，后续提交直接复用
+进行中或已完成的任务；已结束的任务最多保留 keep 个。
+"""
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+DEFAULT_WORKERS = 2
+DEFAULT_KEEP = 32
+
+
+class JobCancelled(BaseException):
+    """任务被取消
+
+    与 BudgetExceeded 一样继承 BaseException，不会被分析代码中逐个文件的
+    except Exception 当作普通错误吞掉。
+    """
+
+
+class Job:
+    """一次后台分析的状态、进度与结果"""
+
+    def __init__(self, kind, key=None, label=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.key = key
+        self.label = label or kind
+        self.state = QUEUED
+        self.stage = None
+        self.done = 0
+        self.total = None
+        self.records = []   # 已完成的记录（部分结果）
+        self.result = None
+        self.error = None
+        self.traceback = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+
+    # ---------- 任务函数中调用 ----------
+
+    def update(self, stage, done, total=None):
+        """报告进度；收到取消请求时抛出 JobCancelled"""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        with self._lock:
+            self.stage, self.done, self.total = stage, done, total
+
+    def add_record(self, record):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        with self._lock:
+            self.records.append(record)
+
+    # ---------- 轮询方调用 ----------
+
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELLED)
+
+    @property
+    def finished(self):
+        return self.state in FINISHED_STATES
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def snapshot(self):
+        """(状态, 阶段, 已完成数, 总数, 已提交的记录数)；不复制记录，轮询开销与结果数量无关"""
+        with self._lock:
+            return self.state, self.stage, self.done, self.total, len(self.records)
+
+    def recent(self, n):
+        """最近提交的 n 条记录"""
+        with self._lock:
+            return self.records[-n:] if n > 0 else []
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def _finish(self, state, result=None, error=None):
+        with self._lock:
+            self.state = state
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+
+    def __repr__(self):
+        total = "?" if self.total is None else self.total
+        return f"Job({self.id}, {self.label}, {self.state}, {self.done}/{total})"
+
+
+class JobQueue:
+    """有界线程池上的任务队列
+
+    分析中的 CPU 密集部分（代码指标）在进程池中执行，线程池只限制同时运行的
+    分析数：多个会话同时开始大规模扫描时依次排队，而不是互相争抢 CPU。
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, keep=DEFAULT_KEEP):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self.keep = keep
+        self._jobs = {}   # 按提交顺序
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, key=None, label=None):
+        """提交任务；已有同一 key 且未失败、未取消的任务时直接返回该任务"""
+        with self._lock:
+            existing = self._jobs.get(self._by_key.get(key)) if key is not None else None
+            if existing is not None and existing.state not in (FAILED, CANCELLED):
+                return existing
+            job = Job(kind, key, label)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._by_key[key] = job.id
+            job.future = self.executor.submit(self._run, job, fn, args)
+            self._prune()
+            return job
+
+    def _run(self, job, fn, args):
+        if job.cancel_requested:
+            job._finish(CANCELLED)
+            return
+        job.state, job.started_at = RUNNING, time.time()
+        try:
+            result = fn(job, *args)
+        except JobCancelled:
+            job._finish(CANCELLED)
+        except Exception as e:
+            job.traceback = traceback.format_exc()
+            job._finish(FAILED, error=f"{type(e).__name__}: {e}")
+        else:
+            job._finish(DONE, result=result)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - self.keep)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) == job.id:
+                del self._by_key[job.key]
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,122 @@
+import os
+import json
+import hashlib
+import shutil
+
+DEFAULT_CACHE_DIR = ".metrics_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024  # 缓存目录上限 256MB
+
+
+def content_hash(data):
+    """计算文件内容（bytes）的 SHA-256 摘要"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class MetricsCache:
+    """以文件内容哈希为键的磁盘缓存
+
+    每个条目保存为一个 JSON 文件，按键的前两位分目录存放。写入采用
+    临时文件 + os.replace，因此多个进程同时读写是安全的。命中时刷新
+    文件的修改时间，prune() 按修改时间淘汰最久未使用的条目。
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+    def key(self, namespace, version, digest):
+        """由命名空间、分析器版本与内容哈希组成缓存键"""
+        raw = f"{namespace}:{version}:{digest}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        """读取缓存条目，未命中或条目损坏时返回 None"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key, value):
+        """写入缓存条目（原子替换）"""
+        if not self.enabled:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """清空缓存目录"""
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def prune(self):
+        """缓存总大小超过上限时，按最久未使用顺序淘汰条目"""
+        if not self.enabled or not os.path.isdir(self.cache_dir):
+            return 0
+
+        entries = []
+        total = 0
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".json"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        removed = 0
+        if total <= self.max_bytes:
+            return removed
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+def add_cache_arguments(parser):
+    """为命令行工具添加统一的缓存参数"""
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="缓存目录")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help="缓存目录大小上限（MB）")
+    parser.add_argument("--no-cache", action="store_true", help="禁用缓存")
+    parser.add_argument("--clear-cache", action="store_true", help="运行前清空缓存")
+
+
+def cache_from_args(args):
+    """根据命令行参数创建缓存对象"""
+    cache = MetricsCache(args.cache_dir, args.cache_max_mb * 1024 * 1024, enabled=not args.no_cache)
+    if args.clear_cache:
+        cache.clear()
+    return cache
@@ -0,0 +1,439 @@
+"""SQLite 指标库：保存每次运行的结果，支持跨运行查询
+
+每次分析写入为一个 run，各分析器的记录分别存入 file_metrics（代码指标）、
+class_metrics（CK / LK / MOOD）与 usecase_metrics（用例点）。常用指标拆成
+带类型的列并建立索引，完整记录另以 JSON 保存在 record 列中，可原样取回。
+查询时指标使用与结果 JSON 相同的点号名称（如 CK.WMC、CyclomaticComplexity.Total）。
+"""
+import json
+import sqlite3
+import argparse
+from datetime import datetime, timezone
+
+DEFAULT_DB = "metrics.db"
+BATCH_SIZE = 1000
+
+# (列名, 记录中的点号字段, 类型)；第一列为实体名称
+CODE_COLUMNS = [
+    ("path", "File", "TEXT"),
+    ("total_lines", "TotalLines", "INTEGER"),
+    ("blank_lines", "BlankLines", "INTEGER"),
+    ("comment_lines", "CommentLines", "INTEGER"),
+    ("code_lines", "CodeLines", "INTEGER"),
+    ("logical_lines", "LogicalLines", "INTEGER"),
+    ("cc_total", "CyclomaticComplexity.Total", "INTEGER"),
+    ("cc_max", "CyclomaticComplexity.Max", "INTEGER"),
+    ("cc_avg", "CyclomaticComplexity.Avg", "REAL"),
+    ("function_count", "CyclomaticComplexity.FunctionCount", "INTEGER"),
+    ("skip_reason", "SkipReason", "TEXT"),
+]
+CLASS_COLUMNS = [
+    ("qualified_name", "QUALIFIED_NAME", "TEXT"),
+    ("name", "NAME", "TEXT"),
+    ("wmc", "CK.WMC", "INTEGER"),
+    ("dit", "CK.DIT", "INTEGER"),
+    ("noc", "CK.NOC", "INTEGER"),
+    ("cbo", "CK.CBO", "INTEGER"),
+    ("rfc", "CK.RFC", "INTEGER"),
+    ("lcom", "CK.LCOM", "INTEGER"),
+    ("noa", "LK.NOA", "INTEGER"),
+    ("nom", "LK.NOM", "INTEGER"),
+    ("size", "LK.SIZE", "INTEGER"),
+    ("mhf", "MOOD.MHF", "REAL"),
+    ("ahf", "MOOD.AHF", "REAL"),
+    ("mif", "MOOD.MIF", "REAL"),
+    ("aif", "MOOD.AIF", "REAL"),
+    ("cf", "MOOD.CF", "REAL"),
+    ("fan_in", "COUPLING.FAN_IN", "INTEGER"),
+    ("fan_out", "COUPLING.FAN_OUT", "INTEGER"),
+    ("lcom1", "COHESION.LCOM1", "INTEGER"),
+    ("lcom4", "COHESION.LCOM4", "INTEGER"),
+    ("tcc", "COHESION.TCC", "REAL"),
+    ("lcc", "COHESION.LCC", "REAL"),
+]
+USECASE_COLUMNS = [
+    ("model", "Model", "TEXT"),
+    ("actor_count", "ActorCount", "INTEGER"),
+    ("usecase_count", "UseCaseCount", "INTEGER"),
+    ("association_count", "AssociationCount", "INTEGER"),
+    ("unresolved_associations", "UnresolvedAssociations", "INTEGER"),
+    ("uaw", "UAW", "REAL"),
+    ("uucw", "UUCW", "REAL"),
+    ("uucp", "UUCP", "REAL"),
+    ("tcf", "TCF", "REAL"),
+    ("ef", "EF", "REAL"),
+    ("ucp", "UCP", "REAL"),
+]
+
+# 分析类型 -> (表名, 列定义)
+TABLES = {
+    "code": ("file_metrics", CODE_COLUMNS),
+    "oo": ("class_metrics", CLASS_COLUMNS),
+    "usecase": ("usecase_metrics", USECASE_COLUMNS),
+}
+
+
+# 比较与查询时区分实体的键：类按限定名区分（不同包中可能有同名类），
+# 旧版本写入的记录没有限定名时退回类名；其他类型为第一列
+ENTITY_KEYS = {"oo": "COALESCE(qualified_name, name)"}
+
+
+def _entity(kind):
+    return ENTITY_KEYS.get(kind, TABLES[kind][1][0][0])
+
+
+def _field(record, dotted):
+    value = record
+    for part in dotted.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _column(kind, metric):
+    """把点号指标名（或列名）转换为列名；只接受已定义的列，避免拼接任意 SQL"""
+    for column, field, _ in TABLES[kind][1]:
+        if metric in (column, field):
+            return column
+    raise ValueError(f"未知的指标：{metric}（可用：{', '.join(f for _, f, _ in TABLES[kind][1])}）")
+
+
+class MetricsStore:
+    """SQLite 指标库"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self._create_schema()
+
+    def _create_schema(self):
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    label TEXT,
+                    source TEXT,
+                    commit_id TEXT,
+                    record_count INTEGER NOT NULL DEFAULT 0
+                )""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_runs_kind ON runs (kind, created_at)")
+            for kind, (table, columns) in TABLES.items():
+                entity = columns[0][0]
+                defs = ", ".join(f"{name} {sql_type}" for name, _, sql_type in columns)
+                self.conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+                        {defs},
+                        record TEXT NOT NULL
+                    )""")
+                # 旧版本建立的库中补上后来新增的列
+                existing = {row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+                for name, _, sql_type in columns:
+                    if name not in existing:
+                        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {sql_type}")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_run ON {table} (run_id)")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{entity} ON {table} ({entity}, run_id)")
+                if kind in ENTITY_KEYS:
+                    # 表达式索引只在查询中的表达式与之完全一致时才会被使用
+                    self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_entity "
+                                      f"ON {table} ({ENTITY_KEYS[kind]}, run_id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_class_metrics_name ON class_metrics (name, run_id)")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------- 写入 ----------
+
+    def writer(self, kind, label=None, source=None, commit=None, created_at=None, owns_store=False):
+        """逐条写入一次运行的记录，按批提交（用法与 RecordWriter 相同）
+
+        owns_store 为 True 时写入器结束（提交或回滚）后同时关闭指标库连接。
+        """
+        return RunWriter(self, kind, label, source, commit, created_at, owns_store)
+
+    def ingest(self, kind, records, label=None, source=None, commit=None, created_at=None):
+        """批量写入一次运行，返回 run ID"""
+        if isinstance(records, dict):
+            records = [records]
+        with self.writer(kind, label, source, commit, created_at) as writer:
+            for record in records:
+                writer.write(record)
+        return writer.run_id
+
+    def delete_run(self, run_id):
+        with self.conn:
+            self.conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+
+    # ---------- 查询 ----------
+
+    def runs(self, kind=None):
+        sql = "SELECT * FROM runs"
+        params = ()
+        if kind:
+            sql += " WHERE kind = ?"
+            params = (kind,)
+        return [dict(row) for row in self.conn.execute(sql + " ORDER BY created_at, id", params)]
+
+    def get_run(self, run_id):
+        row = self.conn.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return dict(row) if row else None
+
+    def latest_run(self, kind):
+        row = self.conn.execute("SELECT * FROM runs WHERE kind = ? ORDER BY created_at DESC, id DESC LIMIT 1",
+                                (kind,)).fetchone()
+        return dict(row) if row else None
+
+    def read_records(self, run_id):
+        """取回一次运行的原始记录，与写入时相同"""
+        kind = self._kind(run_id)
+        table = TABLES[kind][0]
+        rows = self.conn.execute(f"SELECT record FROM {table} WHERE run_id = ? ORDER BY rowid", (run_id,))
+        return [json.loads(row[0]) for row in rows]
+
+    def read_frame(self, run_id):
+        """以带类型的列读取一次运行，列名与 pd.json_normalize 的结果相同，不解析 JSON"""
+        import pandas as pd
+
+        kind = self._kind(run_id)
+        table, columns = TABLES[kind]
+        select = ", ".join(f'{name} AS "{field}"' for name, field, _ in columns)
+        df = pd.read_sql_query(f"SELECT {select} FROM {table} WHERE run_id = ? ORDER BY rowid",
+                               self.conn, params=(run_id,))
+        return df.dropna(axis=1, how="all")
+
+    def top_n(self, kind, metric, n=10, run_id=None, ascending=False):
+        """指定运行（默认最新一次）中指标最高（或最低）的 n 个实体：[(实体, 值)]"""
+        table = TABLES[kind][0]
+        column = _column(kind, metric)
+        entity = _entity(kind)
+        run_id = run_id or self._latest_id(kind)
+        order = "ASC" if ascending else "DESC"
+        rows = self.conn.execute(
+            f"SELECT {entity}, {column} FROM {table} WHERE run_id = ? AND {column} IS NOT NULL "
+            f"ORDER BY {column} {order} LIMIT ?", (run_id, n))
+        return [tuple(row) for row in rows]
+
+    def trend(self, kind, metric, entity=None):
+        """指标随运行变化的序列：[(run ID, 时间, 值)]
+
+        给出 entity 时为该文件 / 类（限定名）/ 模型的值，否则为每次运行的合计。
+        """
+        table = TABLES[kind][0]
+        column = _column(kind, metric)
+        if entity is None:
+            sql = (f"SELECT r.id, r.created_at, SUM(m.{column}) FROM runs r JOIN {table} m ON m.run_id = r.id "
+                   f"WHERE r.kind = ? GROUP BY r.id ORDER BY r.created_at, r.id")
+            params = (kind,)
+        else:
+            sql = (f"SELECT r.id, r.created_at, m.{column} FROM runs r JOIN {table} m ON m.run_id = r.id "
+                   f"WHERE r.kind = ? AND {_entity(kind)} = ? ORDER BY r.created_at, r.id")
+            params = (kind, entity)
+        return [tuple(row) for row in self.conn.execute(sql, params)]
+
+    def delta(self, kind, old_run, new_run, metric):
+        """两次运行之间的变化：[(实体, 旧值, 新值, 差值)]，按差值绝对值降序
+
+        只在一侧出现的实体（新增或删除）对应的值为 None。FULL OUTER JOIN 需要
+        SQLite 3.39 以上，这里用 LEFT JOIN 加上只在新运行中出现的实体代替。
+        """
+        table = TABLES[kind][0]
+        column = _column(kind, metric)
+        entity = _entity(kind)
+        sql = f"""
+            WITH a AS (SELECT {entity} AS e, {column} AS v FROM {table} WHERE run_id = ?),
+                 b AS (SELECT {entity} AS e, {column} AS v FROM {table} WHERE run_id = ?)
+            SELECT * FROM (
+                SELECT a.e AS e, a.v AS old, b.v AS new, b.v - a.v AS d FROM a LEFT JOIN b ON a.e = b.e
+                UNION ALL
+                SELECT b.e, NULL, b.v, NULL FROM b WHERE NOT EXISTS (SELECT 1 FROM a WHERE a.e = b.e)
+            )
+            ORDER BY (d IS NULL), ABS(d) DESC, e
+        """
+        return [tuple(row) for row in self.conn.execute(sql, (old_run, new_run))]
+
+    def _kind(self, run_id):
+        run = self.get_run(run_id)
+        if run is None:
+            raise ValueError(f"运行不存在：{run_id}")
+        return run["kind"]
+
+    def _latest_id(self, kind):
+        run = self.latest_run(kind)
+        if run is None:
+            raise ValueError(f"指标库中没有 {kind} 类型的运行")
+        return run["id"]
+
+
+class RunWriter:
+    """一次运行的写入器；关闭时提交并记录条数，出错时整次运行回滚"""
+
+    def __init__(self, store, kind, label=None, source=None, commit=None, created_at=None, owns_store=False):
+        if kind not in TABLES:
+            raise ValueError(f"未知的分析类型：{kind}")
+        self.store = store
+        self.kind = kind
+        self.source = source
+        self.owns_store = owns_store
+        self.count = 0
+        self._batch = []
+        table, columns = TABLES[kind]
+        self._fields = [field for _, field, _ in columns]
+        names = [name for name, _, _ in columns] + ["run_id", "record"]
+        self._sql = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+
+        created_at = created_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+        cursor = store.conn.execute(
+            "INSERT INTO runs (kind, created_at, label, source, commit_id) VALUES (?, ?, ?, ?, ?)",
+            (kind, created_at, label, source, commit))
+        self.run_id = cursor.lastrowid
+
+    def write(self, record):
+        values = [_field(record, field) for field in self._fields]
+        if self.kind == "usecase" and values[0] is None:
+            values[0] = self.source  # 单个模型的结果中没有模型路径
+        self._batch.append((*values, self.run_id, json.dumps(record, ensure_ascii=False)))
+        self.count += 1
+        if len(self._batch) >= BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._batch:
+            self.store.conn.executemany(self._sql, self._batch)
+            self._batch = []
+
+    def close(self):
+        try:
+            self._flush()
+            self.store.conn.execute("UPDATE runs SET record_count = ? WHERE id = ?", (self.count, self.run_id))
+            self.store.conn.commit()
+        finally:
+            if self.owns_store:
+                self.store.close()
+
+    def discard(self):
+        """放弃这次运行：回滚已写入的记录与运行行"""
+        try:
+            self.store.conn.rollback()
+        finally:
+            if self.owns_store:
+                self.store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def add_store_arguments(parser):
+    """为分析器添加写入指标库的参数"""
+    parser.add_argument("--store", default=None, help="同时写入 SQLite 指标库（如 metrics.db）")
+    parser.add_argument("--store-label", default=None, help="本次运行在指标库中的标签")
+
+
+def store_writer(args, kind, source=None):
+    """根据命令行参数打开指标库写入器，未给出 --store 时返回 None"""
+    if not args.store:
+        return None
+    store = MetricsStore(args.store)
+    try:
+        return store.writer(kind, label=args.store_label, source=source, owns_store=True)
+    except BaseException:
+        store.close()
+        raise
+
+
+def _print_rows(header, rows):
+    print("\t".join(header))
+    for row in rows:
+        print("\t".join("" if v is None else str(v) for v in row))
+
+
+def run_command(store, args):
+    if args.command == "ingest":
+        from output_writers import read_frame, format_from_path
+        data, df = read_frame(args.path, format_from_path(args.path))
+        if data is None:
+            # 列式文件：按点号列名还原嵌套记录
+            data = []
+            for row in df.to_dict(orient="records"):
+                record = {}
+                for key, value in row.items():
+                    *parents, leaf = key.split(".")
+                    target = record
+                    for part in parents:
+                        target = target.setdefault(part, {})
+                    target[leaf] = None if value != value else value  # NaN -> None
+                data.append(record)
+        run_id = store.ingest(args.kind, data, label=args.label, source=args.path)
+        print(f"已导入运行 {run_id}（{store.get_run(run_id)['record_count']} 条记录）")
+    elif args.command == "runs":
+        _print_rows(["id", "kind", "created_at", "label", "source", "commit", "records"],
+                    [(r["id"], r["kind"], r["created_at"], r["label"], r["source"], r["commit_id"],
+                      r["record_count"]) for r in store.runs(args.kind)])
+    elif args.command == "top":
+        _print_rows(["entity", args.metric], store.top_n(args.kind, args.metric, args.n, args.run, args.ascending))
+    elif args.command == "trend":
+        _print_rows(["run", "created_at", args.metric], store.trend(args.kind, args.metric, args.entity))
+    elif args.command == "delta":
+        _print_rows(["entity", "old", "new", "delta"],
+                    store.delta(args.kind, args.old_run, args.new_run, args.metric))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 指标库：导入结果文件与跨运行查询")
+    parser.add_argument("--db", default=DEFAULT_DB, help="指标库路径")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="导入结果文件（json / jsonl / parquet / arrow）")
+    p.add_argument("kind", choices=list(TABLES))
+    p.add_argument("path")
+    p.add_argument("--label", default=None)
+
+    p = sub.add_parser("runs", help="列出运行")
+    p.add_argument("--kind", choices=list(TABLES), default=None)
+
+    p = sub.add_parser("top", help="指标最高的实体")
+    p.add_argument("kind", choices=list(TABLES))
+    p.add_argument("metric")
+    p.add_argument("-n", type=int, default=10)
+    p.add_argument("--run", type=int, default=None, help="运行 ID（默认最新一次）")
+    p.add_argument("--ascending", action="store_true", help="取最低的实体")
+
+    p = sub.add_parser("trend", help="指标随运行的变化")
+    p.add_argument("kind", choices=list(TABLES))
+    p.add_argument("metric")
+    p.add_argument("--entity", default=None, help="文件路径 / 类的限定名 / 模型（默认为每次运行的合计）")
+
+    p = sub.add_parser("delta", help="两次运行之间的变化")
+    p.add_argument("kind", choices=list(TABLES))
+    p.add_argument("metric")
+    p.add_argument("old_run", type=int)
+    p.add_argument("new_run", type=int)
+
+    args = parser.parse_args()
+    with MetricsStore(args.db) as store:
+        try:
+            run_command(store, args)
+        except ValueError as e:
+            print(f"⚠️ {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import json
+import os
+
+FORMATS = ("json", "jsonl", "parquet", "arrow")
+
+# 列式格式按批写入，内存占用与批大小相关而与记录总数无关
+DEFAULT_BATCH_SIZE = 1024
+
+# 可能为空的字段的列类型。列式文件的 schema 取自第一批记录，某字段在第一批中全为空时
+# 无法推断类型，按这里的类型（未列出的按字符串）写出，之后的非空值才能写入
+NULLABLE_TYPES = {
+    "SkipReason": "string",
+    "LogicalLines": "int64",
+    "CyclomaticComplexity.Total": "int64",
+    "CyclomaticComplexity.Max": "int64",
+    "CyclomaticComplexity.Avg": "float64",
+    "CyclomaticComplexity.FunctionCount": "int64",
+}
+
+
+def flatten_record(record, prefix=""):
+    """把嵌套字典展开为与 pd.json_normalize 相同的点号列名"""
+    flat = {}
+    for key, value in record.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_record(value, name + "."))
+        else:
+            flat[name] = value
+    return flat
+
+
+def format_from_path(path, default="json"):
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    if ext in ("ipc", "feather"):
+        return "arrow"
+    return ext if ext in FORMATS else default
+
+
+class RecordWriter:
+    """逐条写出分析结果
+
+    - json：与 json.dump(list, indent=2) 输出逐字节一致，但逐条写入
+    - jsonl：每行一条记录，写入后即可被下游读取
+    - parquet / arrow：展开为点号列名后按批写入（需要 pyarrow），
+      arrow 为 Arrow IPC 文件格式，可直接内存映射读取
+    """
+
+    def __init__(self, path, fmt="json", batch_size=DEFAULT_BATCH_SIZE):
+        if fmt not in FORMATS:
+            raise ValueError(f"不支持的输出格式：{fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.count = 0
+        self._batch = []
+        self._schema = None
+        self._writer = None
+        self._sink = None
+        self._file = None
+
+        if fmt in ("json", "jsonl"):
+            self._file = open(path, "w", encoding="utf-8")
+        else:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise RuntimeError(f"输出 {fmt} 格式需要安装 pyarrow")
+
+    def write(self, record):
+        if self.fmt == "json":
+            text = json.dumps(record, indent=2, ensure_ascii=False)
+            self._file.write("[\n" if self.count == 0 else ",\n")
+            self._file.write("\n".join("  " + line for line in text.split("\n")))
+        elif self.fmt == "jsonl":
+            self._file.write(json.dumps(record, ensure_ascii=False))
+            self._file.write("\n")
+            self._file.flush()
+        else:
+            self._batch.append(flatten_record(record))
+            if len(self._batch) >= self.batch_size:
+                self._flush_batch()
+        self.count += 1
+
+    def _flush_batch(self):
+        import pyarrow as pa
+
+        if not self._batch:
+            return
+        if self._schema is None:
+            table = pa.Table.from_pylist(self._batch)
+            self._schema = pa.schema([
+                field.with_type(pa.type_for_alias(NULLABLE_TYPES.get(field.name, "string")))
+                if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ])
+            table = table.cast(self._schema)
+            self._open_columnar()
+        else:
+            table = pa.Table.from_pylist(self._batch, schema=self._schema)
+        self._writer.write_table(table)
+        self._batch = []
+
+    def _open_columnar(self):
+        import pyarrow as pa
+
+        if self.fmt == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        else:
+            self._sink = pa.OSFile(self.path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self._schema)
+
+    def close(self):
+        if self.fmt == "json":
+            self._file.write("[]" if self.count == 0 else "\n]")
+            self._file.close()
+        elif self.fmt == "jsonl":
+            self._file.close()
+        else:
+            self._flush_batch()
+            if self._writer is None:
+                # 没有任何记录时写出空表
+                import pyarrow as pa
+                self._schema = pa.schema([])
+                self._open_columnar()
+            self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_records(records, path, fmt="json"):
+    """把可迭代的记录写入文件，返回写入条数"""
+    with RecordWriter(path, fmt) as writer:
+        for record in records:
+            writer.write(record)
+    return writer.count
+
+
+def read_frame(source, fmt):
+    """读取结果文件，返回 (原始记录或 None, DataFrame)
+
+    source 可以是路径或文件对象。列式格式直接得到带类型的 DataFrame，
+    不经过 json_normalize；此时原始记录为 None，由调用方按行从表中取出。
+    """
+    import pandas as pd
+
+    if fmt == "json":
+        if hasattr(source, "read"):
+            data = json.load(source)
+        else:
+            with open(source, encoding="utf-8") as f:
+                data = json.load(f)
+        return data, pd.json_normalize(data)
+    if fmt == "jsonl":
+        if hasattr(source, "read"):
+            text = source.read()
+            lines = (text.decode("utf-8") if isinstance(text, bytes) else text).splitlines()
+        else:
+            with open(source, encoding="utf-8") as f:
+                lines = f.read().splitlines()
+        data = [json.loads(line) for line in lines if line.strip()]
+        return data, pd.json_normalize(data)
+    if fmt == "parquet":
+        return None, pd.read_parquet(source)
+    if fmt == "arrow":
+        import pyarrow as pa
+        if hasattr(source, "read"):
+            reader = pa.ipc.open_file(pa.BufferReader(source.read()))
+        else:
+            reader = pa.ipc.open_file(pa.memory_map(source, "r"))
+        return None, reader.read_pandas()
+    raise ValueError(f"不支持的输入格式：{fmt}")
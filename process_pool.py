@@ -0,0 +1,67 @@
+"""按输入顺序产出结果的进程池，工作进程意外退出时不中断整个运行
+
+工作进程被终止（OOM、段错误、超出 RLIMIT_AS 等）时 ProcessPoolExecutor 整体失效，
+所有未完成的任务都会抛出 BrokenProcessPool。这里把当时尚未完成的输入逐个放到单独的
+工作进程中重试，仍使进程退出的输入由 on_crash 转换为按输入报告的失败，其余输入换用
+新的进程池继续。同时在途的批次不超过 jobs * 2 个，需要重试的输入数也以此为上限。
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+
+def _run_chunk(fn, chunk):
+    return [fn(item) for item in chunk]
+
+
+def imap_ordered(fn, items, jobs, on_crash, chunksize=1, initializer=None, initargs=()):
+    """与 executor.map 一样按输入顺序产出 fn(item)
+
+    fn 须为可在工作进程中调用的模块级函数；on_crash(item, 错误信息) 的返回值
+    代替使工作进程退出的输入的结果。
+    """
+    new_pool = partial(ProcessPoolExecutor, initializer=initializer, initargs=initargs)
+    items = list(items)
+    chunks = deque(items[i:i + chunksize] for i in range(0, len(items), chunksize))
+    while chunks:
+        executor = new_pool(max_workers=jobs)
+        window = deque()
+        broken = False
+        try:
+            while window or (chunks and not broken):
+                while chunks and not broken and len(window) < jobs * 2:
+                    chunk = chunks.popleft()
+                    try:
+                        window.append((chunk, executor.submit(_run_chunk, fn, chunk)))
+                    except BrokenProcessPool:
+                        chunks.appendleft(chunk)
+                        broken = True
+                if not window:
+                    break
+                chunk, future = window.popleft()
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    results = _run_isolated(fn, chunk, on_crash, new_pool)
+                yield from results
+        finally:
+            # 提前停止迭代（如后台任务被取消）时不再处理尚未开始的输入
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _run_isolated(fn, chunk, on_crash, new_pool):
+    """逐个在单独的工作进程中重试，找出使进程退出的输入"""
+    executor = new_pool(max_workers=1)
+    try:
+        for item in chunk:
+            try:
+                result = executor.submit(fn, item).result()
+            except BrokenProcessPool as e:
+                result = on_crash(item, f"工作进程意外退出（{type(e).__name__}: {e}）")
+                executor.shutdown(wait=True)
+                executor = new_pool(max_workers=1)
+            yield result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,105 @@
+import os
+import json
+import time
+import heapq
+from contextlib import contextmanager
+
+DEFAULT_TOP_N = 20
+
+
+class Profiler:
+    """分析过程的计时与计数
+
+    - phase()：记录各阶段的墙钟时间与 CPU 时间
+    - count()：累加计数器（读取字节数、文件数、类数等）
+    - record_file()：记录单个文件的解析/复杂度耗时，只保留最慢的 top_n 个
+    enabled 为 False 时所有方法都是空操作。
+    """
+
+    def __init__(self, enabled=True, top_n=DEFAULT_TOP_N):
+        self.enabled = enabled
+        self.top_n = top_n
+        self.phases = {}
+        self.counters = {}
+        self._slowest = []  # 小顶堆：(总耗时, 序号, 文件记录)
+        self._seq = 0
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            entry = self.phases.setdefault(name, {"wall": 0.0, "cpu": 0.0, "calls": 0})
+            entry["wall"] += time.perf_counter() - wall
+            entry["cpu"] += time.process_time() - cpu
+            entry["calls"] += 1
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def record_file(self, filepath, stats):
+        """stats：{'bytes', 'parse', 'complexity', 'total', 'cached'}，时间单位为秒"""
+        if not self.enabled or not stats:
+            return
+        self.count("files")
+        self.count("bytes_read", stats.get("bytes", 0))
+        if stats.get("cached"):
+            self.count("cache_hits")
+        for key in ("parse", "complexity"):
+            if key in stats:
+                self.count(f"{key}_seconds", stats[key])
+
+        item = (stats.get("total", 0.0), self._seq, {"File": filepath, **stats})
+        self._seq += 1
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, item)
+        elif item[0] > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, item)
+
+    def slowest_files(self):
+        return [entry for _, _, entry in sorted(self._slowest, key=lambda x: (-x[0], x[1]))]
+
+    def report(self):
+        """统计结果（可直接序列化为 JSON）"""
+        return {
+            "phases": {name: {"wall": round(v["wall"], 4), "cpu": round(v["cpu"], 4), "calls": v["calls"]}
+                       for name, v in self.phases.items()},
+            "counters": {name: (round(v, 4) if isinstance(v, float) else v) for name, v in self.counters.items()},
+            "slowest_files": [{k: (round(v, 4) if isinstance(v, float) else v) for k, v in entry.items()}
+                              for entry in self.slowest_files()],
+        }
+
+    def format_report(self):
+        lines = ["", "性能统计："]
+        for name, v in self.phases.items():
+            lines.append(f"  {name:<24} 墙钟 {v['wall']:.3f}s  CPU {v['cpu']:.3f}s")
+        for name, v in self.counters.items():
+            lines.append(f"  {name:<24} {v:.3f}" if isinstance(v, float) else f"  {name:<24} {v}")
+        slowest = self.slowest_files()
+        if slowest:
+            lines.append(f"  最慢的 {len(slowest)} 个文件：")
+            for entry in slowest:
+                lines.append(f"    {entry.get('total', 0):.4f}s  {entry.get('bytes', 0):>10} B  {entry['File']}")
+        return "\n".join(lines)
+
+
+def stats_path(output_path):
+    """统计结果与主输出并列存放：metrics_code.json -> metrics_code.stats.json"""
+    return f"{os.path.splitext(output_path)[0]}.stats.json"
+
+
+def write_stats(profiler, output_path):
+    path = stats_path(output_path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profiler.report(), f, indent=2, ensure_ascii=False)
+    return path
+
+
+def add_profile_arguments(parser):
+    parser.add_argument("--profile", action="store_true", help="输出各阶段耗时、计数与最慢文件，并写入 .stats.json")
+    parser.add_argument("--profile-top", type=int, default=DEFAULT_TOP_N, help="统计最慢文件的数量")
@@ -0,0 +1,69 @@
+import json
+import math
+
+import streamlit as st
+
+PAGE_SIZES = [25, 50, 100, 200]
+
+# 各模块用于筛选的名称列
+NAME_COLUMNS = {
+    "用例图分析": "Model",
+    "类图分析": "NAME",
+    "代码指标分析": "File",
+}
+
+
+def filter_and_sort(df, name_col, keyword, sort_col, ascending):
+    """在服务器端完成筛选与排序，返回保持原始行号的结果"""
+    view = df
+    if keyword and name_col in view.columns:
+        view = view[view[name_col].astype(str).str.contains(keyword, case=False, regex=False)]
+    if sort_col and sort_col in view.columns:
+        view = view.sort_values(sort_col, ascending=ascending, kind="stable")
+    return view
+
+
+def show_results(data, df, module):
+    """分页展示结果表格，只把当前页发送到浏览器；原始 JSON 按行按需加载
+
+    data 为 None 时（列式结果文件），原始 JSON 由表中对应的行生成。
+    """
+    records = data if isinstance(data, list) or data is None else [data]
+    key = f"results:{module}"
+
+    name_col = NAME_COLUMNS.get(module)
+    col_filter, col_sort, col_order, col_size = st.columns([3, 3, 1, 1])
+    keyword = ""
+    if name_col in df.columns:
+        keyword = col_filter.text_input(f"按 {name_col} 筛选", key=f"{key}:filter")
+    sort_col = col_sort.selectbox("排序字段", ["（不排序）"] + list(df.columns), key=f"{key}:sort")
+    ascending = col_order.radio("顺序", ["升序", "降序"], key=f"{key}:order") == "升序"
+    page_size = col_size.selectbox("每页行数", PAGE_SIZES, key=f"{key}:size")
+
+    view = filter_and_sort(df, name_col, keyword, None if sort_col == "（不排序）" else sort_col, ascending)
+
+    total_pages = max(1, math.ceil(len(view) / page_size))
+    # 筛选后页数变少时，把已保存的页码收回有效范围
+    if st.session_state.get(f"{key}:page", 1) > total_pages:
+        st.session_state[f"{key}:page"] = total_pages
+    page = st.number_input(f"页码（共 {total_pages} 页，{len(view)} 行）", min_value=1,
+                           max_value=total_pages, step=1, key=f"{key}:page")
+    page_df = view.iloc[(page - 1) * page_size: page * page_size]
+
+    st.dataframe(page_df, use_container_width=True)
+
+    # 原始 JSON：只加载所选的一行
+    st.subheader("原始 JSON 数据")
+    if page_df.empty:
+        st.caption("当前页没有数据")
+        return
+    labels = {
+        idx: (str(page_df.at[idx, name_col]) if name_col in page_df.columns else f"第 {idx + 1} 行")
+        for idx in page_df.index
+    }
+    selected = st.selectbox("选择要查看的行", list(labels), format_func=labels.get, key=f"{key}:row")
+    if records is None:
+        # 列式结果文件没有原始记录，直接取表中的这一行
+        st.json(json.loads(page_df.loc[[selected]].to_json(orient="records"))[0])
+    else:
+        st.json(records[selected])
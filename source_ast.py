@@ -0,0 +1,66 @@
+import ast
+
+# 可选复杂度库：没有 radon 时只提供 AST，复杂度为空
+try:
+    from radon.complexity import cc_visit_ast
+    USE_RADON = True
+except ImportError:
+    USE_RADON = False
+
+
+class ParsedSource:
+    """单个源文件的一次解析结果，供行数统计、圈复杂度和 OO 分析共用
+
+    - lines：按 '\\n' 切分的文本行（注释不在 AST 中，行分类仍基于文本）
+    - tree：ast.parse 的结果，语法错误时为 None
+    - blocks：radon 直接在 tree 上计算的复杂度块（函数、类及其方法）
+    """
+
+    def __init__(self, code, tree=None):
+        self.code = code
+        self.lines = code.split('\n')
+        self.tree = tree
+        self.error = None
+        if tree is None:
+            try:
+                self.tree = ast.parse(code)
+            except MemoryError:
+                raise  # 交给调用方按内存预算处理，不当作语法错误
+            except Exception as e:
+                self.error = e
+        self._blocks = None
+        self._method_index = None
+
+    @property
+    def blocks(self):
+        if self._blocks is None:
+            self._blocks = []
+            if USE_RADON and self.tree is not None:
+                try:
+                    self._blocks = cc_visit_ast(self.tree)
+                except MemoryError:
+                    raise
+                except Exception:
+                    self._blocks = []
+        return self._blocks
+
+    def function_complexity(self, node):
+        """按 (行号, 列号) 查找类方法（含嵌套类的方法）的圈复杂度，与单独分析该方法的结果一致"""
+        if self._method_index is None:
+            self._method_index = {}
+            pending = [b for b in self.blocks if hasattr(b, 'methods')]
+            while pending:
+                cls = pending.pop()
+                for method in cls.methods:
+                    self._method_index[(method.lineno, method.col_offset)] = method.complexity
+                pending.extend(cls.inner_classes)
+        return self._method_index.get((node.lineno, node.col_offset))
+
+
+def parse_source(code):
+    return ParsedSource(code)
+
+
+def decode_source(data):
+    """按文本模式读取的规则解码：UTF-8 并统一换行符"""
+    return data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
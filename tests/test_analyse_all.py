@@ -0,0 +1,86 @@
+import json
+import os
+
+import pytest
+
+import analyse
+import analyse_code
+import analyse_oo
+import analyse_usecase
+from metrics_cache import MetricsCache
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLASS_MODEL = os.path.join(ROOT, "temp2.xml")
+USECASE_MODEL = os.path.join(ROOT, "user1.xml")
+
+SOURCES = {
+    "classifiers.py": (
+        "class DataClassifier:\n"
+        "    def readData(self, path):\n"
+        "        self.data = open(path).read()\n"
+        "        return self.transformData()\n"
+        "    def transformData(self):\n"
+        "        return [x for x in self.data if x]\n"
+        "    def classify(self):\n"
+        "        if self.data:\n"
+        "            return self.model.predict(self.data)\n"
+        "        return None\n"
+    ),
+    "algorithms/knn.py": (
+        "class Knn:\n"
+        "    def handle(self, rows, k=3):\n"
+        "        for row in rows:\n"
+        "            if row > k:\n"
+        "                self.best = row\n"
+        "        return self.best\n"
+    ),
+    "broken.py": "def f(:\n    pass\n",
+    "util.py": "# 工具函数\n\ndef add(a, b):\n    return a + b\n",
+}
+
+
+@pytest.fixture
+def src_dir(tmp_path):
+    src = tmp_path / "src"
+    for relpath, text in SOURCES.items():
+        path = src / relpath
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+    return str(src)
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _separate(src_dir, out, cache):
+    paths = {kind: str(out / f"{kind}.json") for kind in ("code", "oo", "usecase")}
+    analyse_code.main(paths["code"], cache=cache, src_dir=src_dir)
+    analyse_oo.main(CLASS_MODEL, paths["oo"], cache=cache, src_dir=src_dir)
+    analyse_usecase.main(USECASE_MODEL, paths["usecase"])
+    return {kind: _load(path) for kind, path in paths.items()}
+
+
+def _all(src_dir, out, cache, jobs=1):
+    paths = {kind: str(out / f"all_{kind}.json") for kind in ("code", "oo", "usecase")}
+    analyse.run_all(src_dir, CLASS_MODEL, USECASE_MODEL, paths["code"], paths["oo"], paths["usecase"],
+                    jobs=jobs, cache=cache)
+    return {kind: _load(path) for kind, path in paths.items()}
+
+
+@pytest.mark.parametrize("with_cache, jobs", [(False, 1), (True, 1), (True, 2)])
+def test_all_matches_separate_runs(src_dir, tmp_path, with_cache, jobs):
+    cache = MetricsCache(str(tmp_path / "cache"), enabled=with_cache)
+    expected = _separate(src_dir, tmp_path, cache)
+    assert any(r["SkipReason"] == "syntax_error" for r in expected["code"])
+    assert _all(src_dir, tmp_path, cache, jobs) == expected
+
+
+def test_all_with_only_code_cached(src_dir, tmp_path):
+    # 代码指标命中缓存、方法数据未缓存时仍需解析
+    cache = MetricsCache(str(tmp_path / "cache"))
+    analyse_code.main(str(tmp_path / "code.json"), cache=cache, src_dir=src_dir)
+    expected = _separate(src_dir, tmp_path, MetricsCache(enabled=False))
+    assert _all(src_dir, tmp_path, cache) == expected
+    assert _all(src_dir, tmp_path, cache) == expected
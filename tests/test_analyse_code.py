@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+import analyse_code
+
+
+def _crashing_worker(filepath, cache=None, budget=None):
+    """模拟被 OOM / 段错误终止的工作进程"""
+    if os.path.basename(filepath).startswith("crash"):
+        os._exit(1)
+    return analyse_code._safe_analyze(filepath, cache, budget)
+
+
+@pytest.fixture
+def src_dir(tmp_path):
+    src = tmp_path / "src"
+    for i in range(40):
+        path = src / f"pkg{i % 4}" / f"m{i}.py"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        body = "".join(f"    if x > {k}:\n        x -= {k}\n" for k in range(i % 7))
+        path.write_text(f"def f{i}(x):\n{body}    return x\n")
+    (src / "broken.py").write_text("def f(:\n")
+    return str(src)
+
+
+def _main(src_dir, out, jobs):
+    path = out / f"code_{jobs}.json"
+    analyse_code.main(str(path), jobs, src_dir=src_dir)
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_parallel_output_matches_serial(src_dir, tmp_path):
+    serial = _main(src_dir, tmp_path, 1)
+    assert len(serial) == 41
+    assert _main(src_dir, tmp_path, 3) == serial
+
+
+@pytest.mark.parametrize("jobs", [2, 4])
+def test_crashing_worker_is_one_failure(src_dir, tmp_path, jobs):
+    crash = os.path.join(src_dir, "pkg1", "crash.py")
+    with open(crash, "w") as f:
+        f.write("x = 1\n")
+    filepaths = analyse_code.collect_py_files(src_dir)
+
+    results = list(analyse_code.iter_results(filepaths, jobs, worker=_crashing_worker))
+    assert [r[0] for r in results] == filepaths
+    failures = [(path, error) for path, _, error, _ in results if error is not None]
+    assert [path for path, _ in failures] == [crash]
+    assert "BrokenProcessPool" in failures[0][1]
+
+    serial = [r[1] for r in analyse_code.iter_results(filepaths, 1) if r[0] != crash]
+    assert [r[1] for r in results if r[0] != crash] == serial
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+import analyse_oo
+from analyse_oo import ClassInfo, compute_metrics, parse_xmi
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _class(cid, parent=None, attributes=(), methods=()):
+    cls = ClassInfo(cid, cid)
+    cls.parent = parent
+    cls.attributes = list(attributes)
+    cls.methods = list(methods)
+    return cls
+
+
+def _mood(classes):
+    return {record["NAME"]: record["MOOD"] for record in compute_metrics(classes)}
+
+
+def test_mood_within_unit_range_on_sample_model():
+    for record in compute_metrics(parse_xmi(os.path.join(ROOT, "temp2.xml"))):
+        for name, value in record["MOOD"].items():
+            assert 0.0 <= value <= 1.0, (record["NAME"], name, value)
+
+
+def test_inheritance_factors_over_deep_chain():
+    """祖父类 G 定义 a、b、x；父类 P 重写 a 并新增 c、y；子类 C 只新增 d"""
+    classes = {
+        "G": _class("G", attributes=["x"], methods=["a", "b"]),
+        "P": _class("P", "G", attributes=["y"], methods=["a", "c"]),
+        "C": _class("C", "P", methods=["d"]),
+    }
+    for pid, cid in (("G", "P"), ("P", "C")):
+        classes[pid].children.append(cid)
+    mood = _mood(classes)
+
+    assert mood["G"]["MIF"] == 0.0 and mood["G"]["AIF"] == 0.0
+    assert mood["P"]["MIF"] == round(1 / 3, 2)  # 继承 b；a 被重写
+    assert mood["P"]["AIF"] == 0.5
+    assert mood["C"]["MIF"] == 0.75  # 继承 a、b、c，自身定义 d
+    assert mood["C"]["AIF"] == 1.0
+
+
+def test_hiding_factors():
+    classes = {"A": _class("A", attributes=["_x", "y"], methods=["_a", "_b", "c", "d"])}
+    mood = _mood(classes)["A"]
+    assert mood["MHF"] == 0.5 and mood["AHF"] == 0.5
+
+
+def test_inheritance_cycle_is_ignored(capsys):
+    classes = {"A": _class("A", "B", methods=["a"]), "B": _class("B", "A", methods=["b"])}
+    mood = _mood(classes)
+    assert "继承环" in capsys.readouterr().out
+    assert all(0.0 <= v <= 1.0 for m in mood.values() for v in m.values())
+
+
+@pytest.mark.parametrize("missing_parent", ["Unknown", None])
+def test_unknown_parent_is_root(missing_parent):
+    classes = {"A": _class("A", missing_parent, methods=["a"])}
+    assert analyse_oo.InheritanceGraph(classes).depth["A"] == 0
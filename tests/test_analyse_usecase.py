@@ -0,0 +1,55 @@
+import json
+import os
+import shutil
+
+import pytest
+
+import analyse_usecase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+analyze_model = analyse_usecase.analyze_model
+
+
+def _crashing_model(path):
+    """模拟解析超大模型时被终止的工作进程"""
+    if os.path.basename(path).startswith("crash"):
+        os._exit(1)
+    return analyze_model(path)
+
+
+@pytest.fixture
+def models(tmp_path):
+    for i in range(12):
+        shutil.copy(os.path.join(ROOT, "user1.xml"), tmp_path / f"m{i:02d}.xml")
+    (tmp_path / "bad.xml").write_text("<xmi:XMI")
+    return tmp_path
+
+
+def _batch(models, out, jobs):
+    path = out / f"batch_{jobs}.json"
+    analyse_usecase.main_batch([str(models)], str(path), jobs=jobs)
+    with open(path, encoding="utf-8") as f:
+        records = json.load(f)
+    with open(analyse_usecase.portfolio_path(str(path)), encoding="utf-8") as f:
+        return records, json.load(f)
+
+
+def test_parallel_batch_matches_serial(models, tmp_path):
+    out = tmp_path / "out"
+    out.mkdir()
+    records, summary = _batch(models, out, 1)
+    assert len(records) == 12 and summary["FailedCount"] == 1
+    assert _batch(models, out, 3) == (records, summary)
+
+
+def test_crashing_worker_is_one_failure(models, monkeypatch):
+    (models / "crash.xml").write_text("")
+    paths = analyse_usecase.collect_models([str(models)])
+    monkeypatch.setattr(analyse_usecase, "analyze_model", _crashing_model)
+
+    results = list(analyse_usecase.iter_batch(paths, jobs=2))
+    assert [r[0] for r in results] == paths
+    failed = {path: error for path, _, error, _ in results if error is not None}
+    assert set(failed) == {str(models / "bad.xml"), str(models / "crash.xml")}
+    assert "BrokenProcessPool" in failed[str(models / "crash.xml")]
+    assert sum(1 for _, metrics, _, _ in results if metrics is not None) == 12
@@ -0,0 +1,35 @@
+import threading
+
+import pytest
+
+import budgets
+from analyse_code import analyze_code_data
+from budgets import FileBudget
+
+
+def test_timeout_runs_in_process_on_main_thread():
+    budget = FileBudget(timeout=60)
+    assert not budget.isolated
+
+    seen = []
+    thread = threading.Thread(target=lambda: seen.append(budget.isolated))
+    thread.start()
+    thread.join()
+    assert seen == [budgets._has_alarm()]
+
+
+@pytest.mark.skipif(not budgets._has_alarm(), reason="没有 SIGALRM")
+def test_timeout_enforced_in_process():
+    source = "\n".join(f"def f{i}(x):\n    if x:\n        return {i}\n    return 0\n" for i in range(5000))
+    record = analyze_code_data(source.encode(), "big.py", budget=FileBudget(timeout=0.001))
+    assert record["SkipReason"] == "time"
+    assert record["CyclomaticComplexity"]["Total"] is None
+
+
+@pytest.mark.skipif(budgets.resource is None, reason="没有 resource 模块")
+def test_current_memory_without_proc(monkeypatch):
+    def no_proc(*args, **kwargs):
+        raise FileNotFoundError("/proc/self/statm")
+
+    monkeypatch.setattr("builtins.open", no_proc)
+    assert budgets._current_memory() > 0
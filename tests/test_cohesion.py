@@ -0,0 +1,110 @@
+import itertools
+import random
+
+import pytest
+
+from cohesion import cohesion_metrics
+
+
+def _method(fields=(), calls=()):
+    return {"calls": set(calls), "fields": set(fields), "complexity": 1}
+
+
+def _naive(methods):
+    """逐对比较方法的直接实现，作为位集实现的参照"""
+    names = list(methods)
+    attrs = {n: {f for f in methods[n]["fields"] if f not in methods and f not in methods[n]["calls"]}
+             for n in names}
+    calls = {n: {c for c in methods[n]["calls"] if c in methods and c != n} for n in names}
+    pairs = list(itertools.combinations(names, 2))
+
+    shared = sum(1 for a, b in pairs if attrs[a] & attrs[b])
+    lcom1 = len(pairs) - shared
+
+    def components(linked):
+        seen, count, sizes = set(), 0, []
+        for start in names:
+            if start in seen:
+                continue
+            count += 1
+            stack, size = [start], 0
+            seen.add(start)
+            while stack:
+                cur = stack.pop()
+                size += 1
+                for other in names:
+                    if other not in seen and linked(cur, other):
+                        seen.add(other)
+                        stack.append(other)
+            sizes.append(size)
+        return count, sizes
+
+    lcom4, _ = components(lambda a, b: bool(attrs[a] & attrs[b]) or b in calls[a] or a in calls[b])
+
+    reach = {}
+    for n in names:
+        todo, visited, fields = [n], {n}, set()
+        while todo:
+            cur = todo.pop()
+            fields |= attrs[cur]
+            for callee in calls[cur] - visited:
+                visited.add(callee)
+                todo.append(callee)
+        reach[n] = fields
+    direct = sum(1 for a, b in pairs if reach[a] & reach[b])
+    _, sizes = components(lambda a, b: bool(reach[a] & reach[b]))
+    indirect = sum(s * (s - 1) // 2 for s in sizes)
+
+    return {
+        "LCOM": max(lcom1 - shared, 0),
+        "LCOM1": lcom1,
+        "LCOM4": lcom4,
+        "TCC": round(direct / len(pairs), 2) if pairs else 0.0,
+        "LCC": round(indirect / len(pairs), 2) if pairs else 0.0,
+    }
+
+
+CLASSES = {
+    "empty": {},
+    "single_method": {"run": _method(fields=["x", "y"])},
+    "no_attributes": {"a": _method(), "b": _method(calls=["a"]), "c": _method()},
+    "shared_and_disjoint": {
+        "get_x": _method(fields=["x"]),
+        "set_x": _method(fields=["x"]),
+        "get_y": _method(fields=["y"]),
+        "reset": _method(fields=["x", "y"]),
+        "log": _method(fields=["log_level"]),
+    },
+    "through_calls": {
+        "public": _method(fields=["helper"], calls=["helper"]),
+        "helper": _method(fields=["data"], calls=["deeper"]),
+        "deeper": _method(fields=["cache"]),
+        "other": _method(fields=["cache"]),
+        "alone": _method(fields=["z"]),
+    },
+    "recursive": {"walk": _method(fields=["node"], calls=["walk", "visit"]), "visit": _method(calls=["walk"])},
+}
+
+
+@pytest.mark.parametrize("name", list(CLASSES))
+def test_matches_naive_pairwise(name):
+    assert cohesion_metrics(CLASSES[name]) == _naive(CLASSES[name])
+
+
+def test_single_method_and_no_attributes():
+    assert cohesion_metrics(CLASSES["single_method"]) == {"LCOM": 0, "LCOM1": 0, "LCOM4": 1, "TCC": 0.0, "LCC": 0.0}
+    metrics = cohesion_metrics(CLASSES["no_attributes"])
+    assert metrics["LCOM1"] == 3 and metrics["LCOM4"] == 2 and metrics["TCC"] == 0.0
+
+
+def test_matches_naive_on_random_classes():
+    rng = random.Random(0)
+    for _ in range(200):
+        names = [f"m{i}" for i in range(rng.randint(1, 12))]
+        fields = [f"f{i}" for i in range(rng.randint(0, 6))]
+        methods = {
+            n: _method(fields=rng.sample(fields, rng.randint(0, len(fields))),
+                       calls=rng.sample(names, rng.randint(0, min(3, len(names)))))
+            for n in names
+        }
+        assert cohesion_metrics(methods) == _naive(methods)
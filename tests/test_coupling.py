@@ -0,0 +1,49 @@
+import pytest
+
+import coupling
+from analyse_oo import ClassInfo
+from coupling import CouplingMatrix
+
+
+def _model():
+    """A 关联 B、代码中引用 C；B 引用 A；C 只引用自身和类图外的类；D 孤立"""
+    classes = {cid: ClassInfo(cid, cid) for cid in "ABCD"}
+    classes["A"].associations = {"B"}
+    classes["A"].code_methods = {
+        "run": {"calls": {"helper"}, "deps": {"C", "B"}, "remote": {("C", "load"), ("C", "save")}},
+        "helper": {"calls": set(), "deps": {"A"}},
+    }
+    classes["B"].code_methods = {"get": {"calls": set(), "deps": {"A"}, "remote": {("A", "run")}}}
+    classes["C"].code_methods = {"load": {"calls": set(), "deps": {"C", "Missing"}, "remote": {("C", "save")}}}
+    return classes
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_counts(monkeypatch, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(coupling, "USE_NUMPY", use_numpy)
+    matrix = CouplingMatrix(_model())
+
+    assert matrix.relations == 3
+    assert matrix.system_cf == round(3 / 12, 4)
+    assert matrix.metrics("A") == {"CBO": 2, "RFC": 5, "FAN_IN": 1, "FAN_OUT": 2, "CF": 0.17}
+    assert matrix.metrics("B") == {"CBO": 1, "RFC": 2, "FAN_IN": 1, "FAN_OUT": 1, "CF": 0.08}
+    assert matrix.metrics("C") == {"CBO": 1, "RFC": 1, "FAN_IN": 1, "FAN_OUT": 0, "CF": 0.0}
+    assert matrix.metrics("D") == {"CBO": 0, "RFC": 0, "FAN_IN": 0, "FAN_OUT": 0, "CF": 0.0}
+
+
+def test_numpy_and_python_agree(monkeypatch):
+    pytest.importorskip("numpy")
+    classes = _model()
+    fast = CouplingMatrix(classes)
+    monkeypatch.setattr(coupling, "USE_NUMPY", False)
+    slow = CouplingMatrix(classes)
+    assert [fast.metrics(cid) for cid in classes] == [slow.metrics(cid) for cid in classes]
+    assert slow.changed(fast) == set()
+
+
+def test_empty_and_single_class():
+    assert CouplingMatrix({}).system_cf == 0.0
+    matrix = CouplingMatrix({"A": ClassInfo("A", "A")})
+    assert matrix.metrics("A")["CF"] == 0.0 and matrix.relations == 0
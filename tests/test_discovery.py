@@ -0,0 +1,29 @@
+import os
+
+from discovery import SourceDiscovery
+
+
+def _touch(root, relpath):
+    path = os.path.join(root, *relpath.split("/"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("x = 1\n")
+
+
+def _found(root, discovery=None):
+    discovery = discovery or SourceDiscovery()
+    return sorted(os.path.relpath(p, root).replace(os.sep, "/") for p in discovery.files(str(root)))
+
+
+def test_build_and_dist_only_skipped_at_root(tmp_path):
+    for relpath in ("build/lib/gen.py", "dist/pkg.py", "pkg/build/steps.py", "pkg/dist/wheel.py", "pkg/core.py"):
+        _touch(tmp_path, relpath)
+    assert _found(tmp_path) == ["pkg/build/steps.py", "pkg/core.py", "pkg/dist/wheel.py"]
+
+
+def test_manifest_build_only_skipped_at_root(tmp_path):
+    for relpath in ("build/gen.py", "pkg/build/steps.py"):
+        _touch(tmp_path, relpath)
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("build/gen.py\npkg/build/steps.py\n")
+    assert _found(tmp_path, SourceDiscovery(manifest=str(manifest))) == ["pkg/build/steps.py"]
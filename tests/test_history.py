@@ -0,0 +1,77 @@
+import os
+import shutil
+import subprocess
+from collections import OrderedDict
+
+import pytest
+
+import history
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="没有 git")
+
+
+def _git(repo, *args):
+    subprocess.run(["git", "-C", str(repo), *args], check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, "init", "-q")
+    _git(tmp_path, "config", "user.email", "dev@example.com")
+    _git(tmp_path, "config", "user.name", "dev")
+    versions = [
+        {"a.py": "def f(x):\n    return x\n", "b.py": "y = 1\n"},
+        {"a.py": "def f(x):\n    if x:\n        return 1\n    return 0\n", "b.py": "y = 1\n"},
+        {"a.py": "def f(x):\n    return x\n", "b.py": "y = 2\n"},  # a.py 改回第一版
+        {"a.py": "def f(x):\n    return x\n"},
+    ]
+    for i, files in enumerate(versions):
+        for old in tmp_path.glob("*.py"):
+            old.unlink()
+        for name, text in files.items():
+            (tmp_path / name).write_text(text)
+        _git(tmp_path, "add", "-A")
+        _git(tmp_path, "commit", "-q", "-m", f"v{i}")
+    return tmp_path
+
+
+def _run(path):
+    return [(s.files, s.changed, s.removed)
+            for s in history.iter_snapshots(history.GitRepo(str(path)), rev_range="HEAD")]
+
+
+def test_bounded_blob_cache_gives_same_history(repo, monkeypatch):
+    expected = _run(repo)
+    monkeypatch.setattr(history, "BLOB_CACHE_SIZE", 0)
+    assert _run(repo) == expected
+    assert [len(files) for files, _, _ in expected] == [2, 2, 2, 1]
+
+
+def test_evict_keeps_live_blobs():
+    blobs = OrderedDict((sha, None) for sha in "abcdef")
+    history._evict_blobs(blobs, live={"a", "f"}, keep=1)
+    assert set(blobs) == {"a", "e", "f"}
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """统计解析次数（代码指标与方法提取各自的入口）"""
+    import analyse_code
+    import analyse_oo
+    calls = []
+    for module in (analyse_code, analyse_oo):
+        original = module.parse_source
+        monkeypatch.setattr(module, "parse_source", lambda code, original=original: calls.append(1) or original(code))
+    return calls
+
+
+@pytest.mark.parametrize("max_bytes, expected", [(None, 4), (1, 0)])
+def test_each_blob_parsed_once_within_budget(repo, parses, max_bytes, expected):
+    from budgets import FileBudget
+    snapshots = list(history.iter_snapshots(history.GitRepo(str(repo)), model=os.path.join(ROOT, "temp2.xml"),
+                                            budget=FileBudget(max_bytes=max_bytes)))
+    assert len(parses) == expected  # 4 个不同的 blob
+    if max_bytes:
+        assert {r["SkipReason"] for s in snapshots for r in s.files} == {"size"}
@@ -0,0 +1,10 @@
+from jobs import Job
+
+
+def test_snapshot_counts_records_without_copying():
+    job = Job("code")
+    for i in range(100):
+        job.add_record({"File": f"m{i}.py"})
+    assert job.snapshot()[-1] == 100
+    assert [r["File"] for r in job.recent(3)] == ["m97.py", "m98.py", "m99.py"]
+    assert job.recent(0) == [] and len(job.recent(500)) == 100
@@ -0,0 +1,95 @@
+import argparse
+import sqlite3
+
+import pytest
+
+from metrics_store import MetricsStore, store_writer
+
+
+def _cls(qualified_name, wmc):
+    return {"NAME": qualified_name.rsplit(".", 1)[-1], "QUALIFIED_NAME": qualified_name, "CK": {"WMC": wmc}}
+
+
+@pytest.fixture
+def store(tmp_path):
+    with MetricsStore(str(tmp_path / "metrics.db")) as store:
+        yield store
+
+
+def test_delta_includes_added_and_removed(store):
+    old = store.ingest("code", [{"File": "a.py", "TotalLines": 10}, {"File": "gone.py", "TotalLines": 5}])
+    new = store.ingest("code", [{"File": "a.py", "TotalLines": 14}, {"File": "new.py", "TotalLines": 3}])
+    assert store.delta("code", old, new, "TotalLines") == [
+        ("a.py", 10, 14, 4),
+        ("gone.py", 5, None, None),
+        ("new.py", None, 3, None),
+    ]
+
+
+def test_same_named_classes_are_kept_apart(store):
+    old = store.ingest("oo", [_cls("ui.Model", 3), _cls("db.Model", 10)])
+    new = store.ingest("oo", [_cls("ui.Model", 4), _cls("db.Model", 7)])
+    assert store.delta("oo", old, new, "CK.WMC") == [("db.Model", 10, 7, -3), ("ui.Model", 3, 4, 1)]
+    assert [v for _, _, v in store.trend("oo", "CK.WMC", "db.Model")] == [10, 7]
+
+
+def test_records_without_qualified_name_fall_back_to_name(store):
+    old = store.ingest("oo", [{"NAME": "Knn", "CK": {"WMC": 2}}])
+    new = store.ingest("oo", [_cls("Knn", 5)])
+    assert store.delta("oo", old, new, "CK.WMC") == [("Knn", 2, 5, 3)]
+
+
+def test_store_writer_closes_connection(tmp_path):
+    args = argparse.Namespace(store=str(tmp_path / "metrics.db"), store_label=None)
+    writer = store_writer(args, "code", source="src")
+    with writer:
+        writer.write({"File": "a.py", "TotalLines": 1})
+    with pytest.raises(sqlite3.ProgrammingError):
+        writer.store.conn.execute("SELECT 1")
+
+    writer = store_writer(args, "code", source="src")
+    with pytest.raises(RuntimeError):
+        with writer:
+            raise RuntimeError("分析失败")
+    with pytest.raises(sqlite3.ProgrammingError):
+        writer.store.conn.execute("SELECT 1")
+
+    with MetricsStore(args.store) as store:
+        assert [run["record_count"] for run in store.runs("code")] == [1]
+
+
+def _plan(store, sql, params):
+    return " | ".join(tuple(row)[-1] for row in store.conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+
+
+def test_class_queries_use_indexes(store):
+    for wmc in range(2):
+        store.ingest("oo", [_cls(f"pkg.C{i}", i + wmc) for i in range(50)])
+    entity = "COALESCE(qualified_name, name)"
+    trend = _plan(store, f"SELECT wmc FROM class_metrics WHERE {entity} = ?", ("pkg.C1",))
+    assert "idx_class_metrics_entity" in trend
+    by_name = _plan(store, "SELECT wmc FROM class_metrics WHERE name = ?", ("C1",))
+    assert "idx_class_metrics_name" in by_name
+    delta = _plan(store, f"SELECT {entity}, wmc FROM class_metrics WHERE run_id = ?", (1,))
+    assert "SCAN class_metrics" not in delta
+
+
+def test_failed_runs_leave_no_open_writer(tmp_path):
+    import analyse_code
+    import analyse_oo
+    args = argparse.Namespace(store=str(tmp_path / "metrics.db"), store_label=None)
+
+    writer = store_writer(args, "code", source="missing")
+    analyse_code.main(str(tmp_path / "code.json"), store=writer, src_dir=str(tmp_path / "missing"))
+    with pytest.raises(sqlite3.ProgrammingError):
+        writer.store.conn.execute("SELECT 1")
+
+    writer = store_writer(args, "oo", source="missing.xml")
+    with pytest.raises(OSError):
+        analyse_oo.main(str(tmp_path / "missing.xml"), str(tmp_path / "oo.json"), store=writer,
+                        src_dir=str(tmp_path))
+    with pytest.raises(sqlite3.ProgrammingError):
+        writer.store.conn.execute("SELECT 1")
+
+    with MetricsStore(args.store) as store:
+        assert store.runs("code") == [] and store.runs("oo") == []
@@ -0,0 +1,69 @@
+import pytest
+
+from analyse_code import line_only_record
+from output_writers import FORMATS, RecordWriter, read_frame, write_records
+
+
+def _code_record(i, reason=None):
+    if reason is not None:
+        return line_only_record(f"src/m{i}.py", ["x = 1"], reason)
+    return {
+        "File": f"src/m{i}.py",
+        "TotalLines": 10,
+        "BlankLines": 1,
+        "CommentLines": 2,
+        "CodeLines": 7,
+        "LogicalLines": 3,
+        "CyclomaticComplexity": {"Total": 4, "Max": 2, "Avg": 1.33, "FunctionCount": 3},
+        "SkipReason": None,
+    }
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_nulls_in_first_batch(tmp_path, fmt):
+    """第一批中全为空的列，之后的批次仍能写入非空值"""
+    pytest.importorskip("pyarrow")
+    path = tmp_path / f"out.{fmt}"
+    records = [_code_record(i) for i in range(1024)] + [_code_record(1024, "syntax_error")]
+    with RecordWriter(str(path), fmt) as writer:
+        for record in records:
+            writer.write(record)
+
+    _, df = read_frame(str(path), fmt)
+    assert len(df) == 1025
+    assert df["SkipReason"].iloc[-1] == "syntax_error"
+    assert df["SkipReason"].iloc[:-1].isna().all()
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_all_null_complexity_first(tmp_path, fmt):
+    """第一批全部降级（复杂度为空）时，之后的整数与浮点值保持原类型"""
+    pytest.importorskip("pyarrow")
+    path = tmp_path / f"out.{fmt}"
+    with RecordWriter(str(path), fmt, batch_size=2) as writer:
+        for record in [_code_record(0, "size"), _code_record(1, "time"), _code_record(2)]:
+            writer.write(record)
+
+    _, df = read_frame(str(path), fmt)
+    assert df["CyclomaticComplexity.Total"].iloc[2] == 4
+    assert df["CyclomaticComplexity.Avg"].iloc[2] == pytest.approx(1.33)
+    assert list(df["SkipReason"].iloc[:2]) == ["size", "time"]
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_round_trip(tmp_path, fmt):
+    if fmt in ("parquet", "arrow"):
+        pytest.importorskip("pyarrow")
+    pd = pytest.importorskip("pandas")
+    path = tmp_path / f"out.{fmt}"
+    records = [_code_record(0), _code_record(1, "syntax_error"), _code_record(2)]
+    assert write_records(records, str(path), fmt) == 3
+
+    data, df = read_frame(str(path), fmt)
+    if data is not None:
+        assert data == records
+    expected = pd.json_normalize(records)
+    assert sorted(df.columns) == sorted(expected.columns)
+    df = df[expected.columns]
+    assert df.astype(object).where(df.notna(), None).values.tolist() == \
+        expected.astype(object).where(expected.notna(), None).values.tolist()
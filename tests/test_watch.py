@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+import analyse_code
+import analyse_oo
+from budgets import FileBudget
+from watch import Watcher
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """统计解析次数（代码指标与方法提取各自的入口）"""
+    calls = []
+    for module in (analyse_code, analyse_oo):
+        original = module.parse_source
+        monkeypatch.setattr(module, "parse_source", lambda code, original=original: calls.append(1) or original(code))
+    return calls
+
+
+@pytest.fixture
+def src_dir(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "knn.py").write_text("class Knn:\n    def handle(self, rows):\n        self.best = max(rows)\n")
+    (src / "broken.py").write_text("def f(:\n")
+    return str(src)
+
+
+def test_changed_file_parsed_once(src_dir, parses):
+    watcher = Watcher(src_dir, model=os.path.join(ROOT, "temp2.xml"))
+    watcher.poll()
+    assert len(parses) == 2
+    knn = os.path.join(src_dir, "knn.py")
+    assert list(watcher.methods[knn]) == ["Knn"]
+    assert watcher.methods[os.path.join(src_dir, "broken.py")] == {}
+    assert watcher.failures == {}
+
+
+def test_oversize_file_not_parsed(src_dir, parses):
+    watcher = Watcher(src_dir, model=os.path.join(ROOT, "temp2.xml"), budget=FileBudget(max_bytes=1))
+    watcher.poll()
+    assert parses == []
+    assert {r["SkipReason"] for r in watcher.code.values()} == {"size"}
+    assert all(methods == {} for methods in watcher.methods.values())
@@ -0,0 +1,54 @@
+import threading
+
+from watch import WatcherRegistry
+
+
+class FakeWatcher:
+    def __init__(self):
+        self.stopped = threading.Event()
+
+    def run(self):
+        self.stopped.wait()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def test_stop_only_affects_own_key():
+    registry = WatcherRegistry(max_entries=4)
+    a = registry.get(("s1", "code"), ("src", ""), FakeWatcher)
+    b = registry.get(("s2", "code"), ("src", ""), FakeWatcher)
+    registry.stop(("s1", "code"))
+    assert a.stopped.is_set() and not b.stopped.is_set()
+    assert len(registry) == 1
+
+
+def test_stop_missing_key_creates_nothing():
+    registry = WatcherRegistry()
+    registry.stop(("s1", "code"))
+    assert len(registry) == 0
+
+
+def test_reuse_and_restart_on_param_change():
+    registry = WatcherRegistry()
+    first = registry.get("k", ("src", ""), FakeWatcher)
+    assert registry.get("k", ("src", ""), FakeWatcher) is first
+    second = registry.get("k", ("other", ""), FakeWatcher)
+    assert second is not first and first.stopped.is_set()
+
+
+def test_eviction_stops_least_recently_read():
+    registry = WatcherRegistry(max_entries=2)
+    a = registry.get("a", (), FakeWatcher)
+    b = registry.get("b", (), FakeWatcher)
+    registry.get("a", (), FakeWatcher)  # a 最近被读取
+    c = registry.get("c", (), FakeWatcher)
+    assert b.stopped.is_set()
+    assert not a.stopped.is_set() and not c.stopped.is_set()
+
+
+def test_idle_watchers_are_stopped():
+    registry = WatcherRegistry(idle_timeout=0)
+    a = registry.get("a", (), FakeWatcher)
+    assert registry.stop_idle() == 1
+    assert a.stopped.is_set() and len(registry) == 0
@@ -1,87 +1,270 @@
+import hashlib
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-def show_visualization(df, module):
+# 超过该数量的类/文件时进入大数据模式：逐实体图表只画选出的子集，整体分布用分箱直方图
+LARGE_DATA_THRESHOLD = 200
+DEFAULT_TOP_N = 30
+HIST_BINS = 30
+MAX_SCATTER_POINTS = 20000
+
+# 大数据模式下用于挑选实体的默认指标
+PRIMARY_METRICS = {
+    "类图分析": "CK.WMC",
+    "代码指标分析": "CyclomaticComplexity.Total",
+}
+
+# 大数据模式下绘制分布直方图的指标
+HISTOGRAM_METRICS = {
+    "类图分析": ["CK.WMC", "CK.DIT", "CK.CBO", "CK.RFC", "CK.LCOM", "LK.SIZE"],
+    "代码指标分析": ["CodeLines", "CyclomaticComplexity.Total", "CyclomaticComplexity.Max",
+                "CyclomaticComplexity.FunctionCount"],
+}
+
+
+def frame_digest(df):
+    """按内容计算结果表的哈希，用作图表缓存键"""
+    h = hashlib.sha256()
+    h.update(",".join(map(str, df.columns)).encode("utf-8"))
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    except TypeError:
+        # 含不可哈希的单元格（如列表）时退回文本序列化
+        h.update(df.to_json().encode("utf-8"))
+    return h.hexdigest()
+
+
+def select_entities(df, metric, method, n):
+    """挑选 Top-N 或离群值（超过 Q3 + 1.5 × IQR）的行"""
+    if metric not in df.columns:
+        return df.head(n)
+    values = pd.to_numeric(df[metric], errors="coerce")
+    if method == "离群值":
+        q1, q3 = values.quantile(0.25), values.quantile(0.75)
+        mask = values > q3 + 1.5 * (q3 - q1)
+        return df[mask].assign(_v=values[mask]).nlargest(n, "_v").drop(columns="_v")
+    return df.assign(_v=values).nlargest(n, "_v").drop(columns="_v")
+
+
+def binned_histogram(series, title, label, bins=HIST_BINS):
+    """在服务器端分箱后再绘图，发送给浏览器的数据量与行数无关"""
+    import plotly.graph_objects as go
+
+    values = pd.to_numeric(series, errors="coerce").dropna().to_numpy(dtype=float)
+    if values.size == 0:
+        return None
+    counts, edges = np.histogram(values, bins=bins)
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                           hovertext=[f"{lo:.2f} – {hi:.2f}" for lo, hi in zip(edges[:-1], edges[1:])]))
+    fig.update_layout(title=title, xaxis_title=label, yaxis_title="数量", bargap=0.02)
+    return fig
+
+
+def _class_figures(df, webgl):
     import plotly.express as px
     import plotly.graph_objects as go
 
-    st.subheader("数据可视化")
+    figures = []
+    render_mode = "webgl" if webgl else "auto"
+
+    # ==== 柱状图：每个类的 WMC ====
+    wmc_col = "CK.WMC" if "CK.WMC" in df.columns else None
+    if wmc_col:
+        fig_bar = px.bar(df, x="NAME", y=wmc_col, title="每个类的 WMC（方法数）",
+                         labels={"NAME": "类名", wmc_col: "WMC"}, height=400)
+        figures.append((None, fig_bar))
+
+    # ==== 雷达图：将所有类画在同一个图中 ====
+    ck_cols = ["CK.WMC", "CK.DIT", "CK.NOC", "CK.CBO", "CK.RFC", "CK.LCOM"]
+    available_cols = [col for col in ck_cols if col in df.columns]
+
+    if available_cols:
+        fig_radar = go.Figure()
+        polar_trace = go.Scatterpolargl if webgl else go.Scatterpolar
+        theta_labels = available_cols + [available_cols[0]]
+        names = df["NAME"].tolist() if "NAME" in df.columns else [f"Class {idx}" for idx in df.index]
+
+        for class_name, radar_values in zip(names, df[available_cols].values.tolist()):
+            radar_values.append(radar_values[0])  # 闭合曲线
+            fig_radar.add_trace(polar_trace(
+                r=radar_values,
+                theta=theta_labels,
+                fill='none',
+                name=class_name
+            ))
+
+        fig_radar.update_layout(
+            polar=dict(radialaxis=dict(visible=True)),
+            title="各类的 CK 指标对比雷达图",
+            showlegend=True
+        )
+        figures.append(("### 所有类的 CK 指标雷达图", fig_radar))
+
+    # ==== 分组柱状图：LK 指标 ====
+    lk_cols = ["LK.NOA", "LK.NOM", "LK.SIZE"]
+    if all(col in df.columns for col in lk_cols):
+        fig_lk = px.bar(df, x="NAME", y=lk_cols,
+                        title="每个类的 LK 指标（属性数/方法数/大小）",
+                        labels={"value": "数量", "variable": "指标", "NAME": "类名"},
+                        barmode="group")
+        figures.append(("### 各类的 LK 指标分布（属性/方法/类大小）", fig_lk))
+
+    # ==== 折线图：MOOD 指标趋势 ====
+    mood_cols = ["MOOD.MHF", "MOOD.AHF", "MOOD.MIF", "MOOD.AIF", "MOOD.CF"]
+    if any(col in df.columns for col in mood_cols):
+        fig_mood = px.line(df, x="NAME", y=[col for col in mood_cols if col in df.columns],
+                           markers=True,
+                           render_mode=render_mode,
+                           title="每个类的 MOOD 指标",
+                           labels={"value": "值", "variable": "指标", "NAME": "类名"})
+        figures.append(("### 各类的 MOOD 指标趋势", fig_mood))
+
+    # ==== 热力图：类 vs CK 指标 ====
+    if all(col in df.columns for col in ck_cols):
+        heat_data = df.set_index("NAME")[ck_cols]
+        fig_heat = px.imshow(heat_data,
+                             text_auto=True,
+                             aspect="auto",
+                             color_continuous_scale="YlGnBu",
+                             title="类 vs CK 指标 热力图")
+        figures.append(("### CK 指标热力图（类 vs 指标）", fig_heat))
+
+    return figures
+
+
+def _code_figures(df, webgl):
+    import plotly.express as px
+
+    figures = []
+
+    # --- 图1：每个文件的圈复杂度（总） ---
+    if "File" in df.columns and "CyclomaticComplexity.Total" in df.columns:
+        fig = px.bar(df, x="File", y="CyclomaticComplexity.Total",
+                     title="每个文件的圈复杂度（总）",
+                     labels={"File": "文件", "CyclomaticComplexity.Total": "复杂度总和"})
+        figures.append((None, fig))
+
+    # --- 图2：每个文件的函数数量 ---
+    if "CyclomaticComplexity.FunctionCount" in df.columns:
+        fig = px.bar(df, x="File", y="CyclomaticComplexity.FunctionCount",
+                     title="每个文件的函数数量", labels={"CyclomaticComplexity.FunctionCount": "函数数"})
+        figures.append((None, fig))
+
+    # --- 图3：最大/平均复杂度并列图 ---
+    if {"CyclomaticComplexity.Max", "CyclomaticComplexity.Avg"}.issubset(df.columns):
+        fig = px.bar(df, x="File",
+                     y=["CyclomaticComplexity.Max", "CyclomaticComplexity.Avg"],
+                     title="每个文件的最大/平均圈复杂度",
+                     labels={"value": "复杂度", "File": "文件", "variable": "类型"},
+                     barmode="group")
+        figures.append((None, fig))
+
+    # --- 图4：行数组成结构堆叠图 ---
+    line_cols = ["BlankLines", "CommentLines", "CodeLines"]
+    if all(col in df.columns for col in line_cols):
+        fig = px.bar(df, x="File", y=line_cols,
+                     title="每个文件的代码结构（空行/注释/代码）",
+                     labels={"value": "行数", "File": "文件", "variable": "类型"},
+                     barmode="stack")
+        figures.append((None, fig))
+
+    return figures
+
+
+def _overview_figures(df, module):
+    """大数据模式下的整体视图：分箱直方图 + WebGL 散点图（超量时抽样）"""
+    import plotly.express as px
+
+    figures = []
+    for metric in HISTOGRAM_METRICS.get(module, []):
+        if metric in df.columns:
+            fig = binned_histogram(df[metric], f"{metric} 分布", metric)
+            if fig is not None:
+                figures.append((None, fig))
 
     if module == "类图分析":
-        # ==== 柱状图：每个类的 WMC ====
-        wmc_col = "CK.WMC" if "CK.WMC" in df.columns else None
-        if wmc_col:
-            fig_bar = px.bar(df, x="NAME", y=wmc_col, title="每个类的 WMC（方法数）",
-                             labels={"NAME": "类名", wmc_col: "WMC"}, height=400)
-            st.plotly_chart(fig_bar, use_container_width=True)
-
-        # ==== 雷达图：将所有类画在同一个图中 ====
-        ck_cols = ["CK.WMC", "CK.DIT", "CK.NOC", "CK.CBO", "CK.RFC", "CK.LCOM"]
-        available_cols = [col for col in ck_cols if col in df.columns]
-
-        if available_cols:
-            st.markdown("### 所有类的 CK 指标雷达图")
-
-            fig_radar = go.Figure()
-
-            for idx, row in df.iterrows():
-                class_name = row["NAME"] if "NAME" in row else f"Class {idx}"
-                radar_values = row[available_cols].values.tolist()
-                radar_values.append(radar_values[0])  # 闭合曲线
-                theta_labels = available_cols + [available_cols[0]]
-
-                fig_radar.add_trace(go.Scatterpolar(
-                    r=radar_values,
-                    theta=theta_labels,
-                    fill='none',
-                    name=class_name
-                ))
-
-            fig_radar.update_layout(
-                polar=dict(radialaxis=dict(visible=True)),
-                title="各类的 CK 指标对比雷达图",
-                showlegend=True
-            )
+        x, y, hover = "CK.WMC", "CK.CBO", "NAME"
+    else:
+        x, y, hover = "CodeLines", "CyclomaticComplexity.Total", "File"
+    if {x, y}.issubset(df.columns):
+        points = df if len(df) <= MAX_SCATTER_POINTS else df.sample(MAX_SCATTER_POINTS, random_state=0)
+        title = f"{x} vs {y}" + (f"（随机抽样 {MAX_SCATTER_POINTS} 个）" if len(df) > MAX_SCATTER_POINTS else "")
+        fig = px.scatter(points, x=x, y=y, hover_name=hover if hover in df.columns else None,
+                         render_mode="webgl", title=title)
+        figures.append((None, fig))
+
+    return figures
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def build_figures(digest, module, selection, _df):
+    """按 (结果哈希, 模块, 挑选方式) 缓存图表对象；_df 不参与缓存键"""
+    if selection is None:
+        if module == "类图分析":
+            return _class_figures(_df, webgl=False)
+        if module == "代码指标分析":
+            return _code_figures(_df, webgl=False)
+        return []
+
+    metric, method, n = selection
+    subset = select_entities(_df, metric, method, n)
+    figures = [("### 整体分布", None)] + _overview_figures(_df, module)
+    figures.append((f"### {method}（按 {metric}，共 {len(subset)} 个）", None))
+    if module == "类图分析":
+        figures += _class_figures(subset, webgl=True)
+    elif module == "代码指标分析":
+        figures += _code_figures(subset, webgl=True)
+    return figures
+
 
-            st.plotly_chart(fig_radar, use_container_width=True)
+def _large_data_selection(df, module):
+    """大数据模式的挑选控件，返回 (指标, 方式, 数量)"""
+    st.info(f"共 {len(df)} 条记录，已切换为大数据模式：逐项图表只显示挑选出的子集。")
+    numeric_cols = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])]
+    default = PRIMARY_METRICS.get(module)
+    col_metric, col_method, col_n = st.columns(3)
+    metric = col_metric.selectbox("挑选依据", numeric_cols,
+                                  index=numeric_cols.index(default) if default in numeric_cols else 0,
+                                  key=f"viz:{module}:metric")
+    method = col_method.radio("挑选方式", ["Top-N", "离群值"], key=f"viz:{module}:method")
+    n = col_n.slider("最多显示", 5, 100, DEFAULT_TOP_N, key=f"viz:{module}:n")
+    return metric, method, n
 
-        # ==== 分组柱状图：LK 指标 ====
-        lk_cols = ["LK.NOA", "LK.NOM", "LK.SIZE"]
-        if all(col in df.columns for col in lk_cols):
-            st.markdown("### 各类的 LK 指标分布（属性/方法/类大小）")
-            fig_lk = px.bar(df, x="NAME", y=lk_cols,
-                            title="每个类的 LK 指标（属性数/方法数/大小）",
-                            labels={"value": "数量", "variable": "指标", "NAME": "类名"},
-                            barmode="group")
-            st.plotly_chart(fig_lk, use_container_width=True)
 
-        # ==== 折线图：MOOD 指标趋势 ====
-        mood_cols = ["MOOD.MHF", "MOOD.AHF", "MOOD.MIF", "MOOD.AIF", "MOOD.CF"]
-        if any(col in df.columns for col in mood_cols):
-            st.markdown("### 各类的 MOOD 指标趋势")
+def _show_portfolio(df):
+    """批量分析的多个用例图：按模型对比用例点"""
+    import plotly.express as px
+
+    st.markdown("### 用例图组合分析")
+    cols = st.columns(3)
+    cols[0].metric("模型数", len(df))
+    cols[1].metric("UCP 合计", round(float(df["UCP"].sum()), 2))
+    cols[2].metric("UCP 中位数", round(float(df["UCP"].median()), 2))
 
-            fig_mood = px.line(df, x="NAME", y=mood_cols,
-                               markers=True,
-                               title="每个类的 MOOD 指标",
-                               labels={"value": "值", "variable": "指标", "NAME": "类名"})
-            st.plotly_chart(fig_mood, use_container_width=True)
+    top = df.nlargest(DEFAULT_TOP_N, "UCP")
+    fig = px.bar(top, x="Model", y="UCP", title=f"UCP 最高的 {len(top)} 个用例图",
+                 labels={"Model": "用例图", "UCP": "用例点"})
+    st.plotly_chart(fig, use_container_width=True)
 
-        # ==== 热力图：类 vs CK 指标 ====
-        ck_cols_full = ["CK.WMC", "CK.DIT", "CK.NOC", "CK.CBO", "CK.RFC", "CK.LCOM"]
-        if all(col in df.columns for col in ck_cols_full):
-            st.markdown("### CK 指标热力图（类 vs 指标）")
+    fig = px.scatter(df, x="UseCaseCount", y="UCP", size="ActorCount", hover_name="Model",
+                     title="用例数与用例点", labels={"UseCaseCount": "用例数", "UCP": "用例点"},
+                     render_mode="webgl" if len(df) > LARGE_DATA_THRESHOLD else "auto")
+    st.plotly_chart(fig, use_container_width=True)
 
-            heat_data = df.set_index("NAME")[ck_cols_full]
-            fig_heat = px.imshow(heat_data,
-                                 text_auto=True,
-                                 aspect="auto",
-                                 color_continuous_scale="YlGnBu",
-                                 title="类 vs CK 指标 热力图")
-            st.plotly_chart(fig_heat, use_container_width=True)
 
+def show_visualization(df, module):
+    import plotly.express as px
+    import plotly.graph_objects as go
 
+    st.subheader("数据可视化")
 
-    elif module == "用例图分析":
+    if module == "用例图分析" and len(df) > 1 and "Model" in df.columns:
+        _show_portfolio(df)
+        return
+
+    if module == "用例图分析":
 
         st.markdown("### 用例图关键指标分析")
 
@@ -124,37 +307,17 @@ def show_visualization(df, module):
                 showlegend=False
             )
             st.plotly_chart(fig3, use_container_width=True)
+        return
 
-    elif module == "代码指标分析":
+    if module == "代码指标分析":
         st.markdown("### 代码文件指标可视化")
 
-        # --- 图1：每个文件的圈复杂度（总） ---
-        if "File" in df.columns and "CyclomaticComplexity.Total" in df.columns:
-            fig = px.bar(df, x="File", y="CyclomaticComplexity.Total",
-                         title="每个文件的圈复杂度（总）",
-                         labels={"File": "文件", "CyclomaticComplexity.Total": "复杂度总和"})
-            st.plotly_chart(fig, use_container_width=True)
-
-        # --- 图2：每个文件的函数数量 ---
-        if "CyclomaticComplexity.FunctionCount" in df.columns:
-            fig = px.bar(df, x="File", y="CyclomaticComplexity.FunctionCount",
-                         title="每个文件的函数数量", labels={"CyclomaticComplexity.FunctionCount": "函数数"})
-            st.plotly_chart(fig, use_container_width=True)
-
-        # --- 图3：最大/平均复杂度并列图 ---
-        if {"CyclomaticComplexity.Max", "CyclomaticComplexity.Avg"}.issubset(df.columns):
-            fig = px.bar(df, x="File",
-                         y=["CyclomaticComplexity.Max", "CyclomaticComplexity.Avg"],
-                         title="每个文件的最大/平均圈复杂度",
-                         labels={"value": "复杂度", "File": "文件", "variable": "类型"},
-                         barmode="group")
-            st.plotly_chart(fig, use_container_width=True)
+    selection = None
+    if len(df) > LARGE_DATA_THRESHOLD:
+        selection = _large_data_selection(df, module)
 
-        # --- 图4：行数组成结构堆叠图 ---
-        line_cols = ["BlankLines", "CommentLines", "CodeLines"]
-        if all(col in df.columns for col in line_cols):
-            fig = px.bar(df, x="File", y=line_cols,
-                         title="每个文件的代码结构（空行/注释/代码）",
-                         labels={"value": "行数", "File": "文件", "variable": "类型"},
-                         barmode="stack")
+    for heading, fig in build_figures(frame_digest(df), module, selection, df):
+        if heading:
+            st.markdown(heading)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
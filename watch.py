@@ -0,0 +1,378 @@
+"""监视模式：源代码或类图变化时增量更新指标
+
+Watcher 记录每个文件的修改时间与大小，发生变化时只重新分析变化的文件，
+并只重新计算受影响的类（变化前后该文件所匹配到的类，以及耦合指标随之变化
+的类）的 code_methods 与指标；类图变化时重新解析类图，但各文件的方法数据
+无需重新提取。
+
+安装了 watchdog 时使用文件系统通知唤醒，否则按固定间隔轮询。命令行运行时
+每次更新后原子地重写输出文件；dashboard 在后台线程中运行 Watcher 并定时
+读取 snapshot()。
+"""
+import os
+import time
+import argparse
+import threading
+from collections import OrderedDict
+import xml.etree.ElementTree as ET
+
+import analyse_code
+import analyse_oo
+from coupling import CouplingMatrix
+from metrics_cache import add_cache_arguments, cache_from_args
+from output_writers import write_records, format_from_path
+from budgets import NO_BUDGET, add_budget_arguments, budget_from_args
+from discovery import SourceDiscovery, add_discovery_arguments, discovery_from_args
+
+# 可选文件系统通知
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    USE_WATCHDOG = True
+except ImportError:
+    USE_WATCHDOG = False
+
+DEFAULT_INTERVAL = 1.0
+# 收到通知后稍等片刻，让编辑器写完文件
+DEBOUNCE_SECONDS = 0.2
+# dashboard 中超过该时间未被读取的监视器（会话已关闭或离开监视模式）会被停止
+DEFAULT_IDLE_TIMEOUT = 60
+# 使用通知时仍定期检查一次，防止遗漏事件（如网络文件系统）
+NOTIFY_FALLBACK_SECONDS = 30
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class Update:
+    """一次增量更新的内容"""
+
+    def __init__(self, version, changed, removed, model_changed, classes_updated):
+        self.version = version
+        self.changed = changed
+        self.removed = removed
+        self.model_changed = model_changed
+        self.classes_updated = classes_updated
+
+    def __repr__(self):
+        return (f"Update(v{self.version}, changed={len(self.changed)}, removed={len(self.removed)}, "
+                f"model_changed={self.model_changed}, classes={self.classes_updated})")
+
+
+class Watcher:
+    """保存各文件的分析结果，poll() 检查变化并增量更新
+
+    时间预算只在主线程中生效；内存预算需要独立的工作进程，监视模式下不生效。
+    """
+
+    def __init__(self, src_dir="src", model=None, cache=None, budget=None, discovery=None):
+        self.src_dir = src_dir
+        self.model = model
+        self.cache = cache
+        self.budget = budget or NO_BUDGET
+        self.discovery = discovery or SourceDiscovery()
+        self.lock = threading.Lock()
+        self.version = 0
+        self.updated_at = None
+
+        self.order = []        # 按发现顺序排列的文件路径
+        self.signatures = {}   # 路径 -> (修改时间, 大小)
+        self.code = {}         # 路径 -> 代码指标记录
+        self.methods = {}      # 路径 -> {类限定名: 方法数据}
+        self.matches = {}      # 路径 -> {类 ID: 方法数据}
+        self.failures = {}     # 路径 -> 错误信息
+
+        self.model_signature = None
+        self.classes = None
+        self.index = None
+        self.inheritance = None
+        self.coupling = None
+        self.class_records = {}  # 类 ID -> 指标记录
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def _scan(self):
+        order, signatures = [], {}
+        for path in self.discovery.files(self.src_dir):
+            sig = _signature(path)
+            if sig is not None:
+                order.append(path)
+                signatures[path] = sig
+        return order, signatures
+
+    def poll(self):
+        """检查一次变化并增量更新，没有变化时返回 None"""
+        order, signatures = self._scan()
+        changed = [path for path in order if self.signatures.get(path) != signatures[path]]
+        removed = [path for path in self.signatures if path not in signatures]
+        model_signature = _signature(self.model) if self.model else None
+        model_changed = bool(self.model) and model_signature != self.model_signature
+        if not (changed or removed or model_changed):
+            return None
+
+        with self.lock:
+            for path in removed:
+                for table in (self.code, self.methods, self.failures):
+                    table.pop(path, None)
+            for path in changed:
+                self._analyze_file(path)
+            self.order = order
+            self.signatures = signatures
+
+            affected = set()
+            if model_changed:
+                self.model_signature = model_signature
+                if self._load_model():
+                    affected = set(self.classes)
+            if self.classes is not None and not affected:
+                affected = self._rematch(changed + removed)
+            affected = self._recompute(affected)
+
+            self.version += 1
+            self.updated_at = time.time()
+            return Update(self.version, changed, removed, model_changed, len(affected))
+
+    def _analyze_file(self, path):
+        self.failures.pop(path, None)
+        # 方法数据与代码指标共用一次解析，并受同一份预算约束
+        extraction = analyse_oo.MethodExtraction(self.cache) if self.model else None
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            record = analyse_code.analyze_code_data(data, path, self.cache, None, self.budget, extraction)
+        except Exception as e:
+            self.code.pop(path, None)
+            self.methods.pop(path, None)
+            self.failures[path] = f"{type(e).__name__}: {e}"
+            return
+        self.code[path] = record
+        if extraction is not None:
+            # 语法错误或超出预算时不提供方法数据
+            self.methods[path] = (extraction.methods if record["SkipReason"] is None else None) or {}
+
+    def _load_model(self):
+        """重新解析类图；解析失败（如正在编辑）时保留上一次的类图"""
+        try:
+            classes = analyse_oo.parse_xmi(self.model)
+        except (OSError, ET.ParseError) as e:
+            print(f"⚠️ 类图解析失败，继续使用上一次的结果：{e}")
+            return False
+        self.classes = classes
+        self.index = analyse_oo.ClassIndex(classes)
+        self.inheritance = analyse_oo.InheritanceGraph(classes)
+        for cycle in self.inheritance.cycles:
+            names = ' -> '.join(classes[cid].name for cid in cycle)
+            print(f"⚠️ 检测到继承环，已忽略环上的继承关系：{names}")
+        self.coupling = None
+        self.class_records = {}
+        self.matches = {path: self._match(path) for path in self.order if path in self.methods}
+        return True
+
+    def _match(self, path):
+        module = analyse_oo.module_name(path, self.src_dir)
+        matched, memo = {}, {}
+        for qualname, methods in self.methods[path].items():
+            target = self.index.lookup(qualname, module)
+            if target:
+                resolved = analyse_oo.resolve_method_refs(methods, self.index, module, memo)
+                matched.setdefault(target.id, {}).update(resolved)
+        return matched
+
+    def _rematch(self, paths):
+        """重新匹配变化的文件，返回变化前后涉及的类 ID"""
+        affected = set()
+        for path in paths:
+            affected.update(self.matches.pop(path, {}))
+            if path in self.methods:
+                self.matches[path] = self._match(path)
+                affected.update(self.matches[path])
+        return affected
+
+    def _recompute(self, affected):
+        """重新计算受影响的类，返回实际更新了指标的类 ID"""
+        if self.classes is None or not affected:
+            return set()
+        for cid in affected:
+            self.classes[cid].code_methods = {}
+        # 与全量分析相同，按文件发现顺序合并方法数据
+        for path in self.order:
+            for cid, methods in self.matches.get(path, {}).items():
+                if cid in affected:
+                    self.classes[cid].code_methods.update(methods)
+        # 耦合是系统级的：一个类的依赖变化会改变被依赖类的扇入与 CBO
+        previous, self.coupling = self.coupling, CouplingMatrix(self.classes)
+        affected = affected | self.coupling.changed(previous)
+        for cid in affected:
+            self.class_records[cid] = analyse_oo.class_metrics(self.classes[cid], self.inheritance, self.coupling)
+        return affected
+
+    def snapshot(self):
+        """当前结果：(版本号, 代码指标列表, 类指标列表, [(文件路径, 错误信息)])"""
+        with self.lock:
+            code_records = [self.code[path] for path in self.order if path in self.code]
+            class_records = [self.class_records[cid] for cid in self.classes] if self.classes else []
+            failures = sorted(self.failures.items())
+            return self.version, code_records, class_records, failures
+
+    def _start_observer(self):
+        if not USE_WATCHDOG:
+            return None
+        wake = self._wake
+
+        class WakeHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        observer = Observer()
+        observer.schedule(WakeHandler(), self.src_dir, recursive=True)
+        if self.model:
+            observer.schedule(WakeHandler(), os.path.dirname(os.path.abspath(self.model)), recursive=False)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    def run(self, interval=DEFAULT_INTERVAL, on_update=None, use_notifications=True):
+        """持续监视，直到调用 stop()"""
+        observer = self._start_observer() if use_notifications else None
+        try:
+            while not self._stop.is_set():
+                update = self.poll()
+                if update is not None and on_update is not None:
+                    on_update(update)
+                if observer is None:
+                    self._wake.wait(interval)
+                elif self._wake.wait(NOTIFY_FALLBACK_SECONDS):
+                    time.sleep(DEBOUNCE_SECONDS)
+                self._wake.clear()
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+class WatcherRegistry:
+    """按键（如 会话 + 模块）保存在后台线程中运行的监视器，供 dashboard 使用
+
+    每个键独占一个 Watcher，stop() 只停止并删除该键的监视器。超出 max_entries
+    时最久未读取的监视器，以及超过 idle_timeout 未被读取的监视器（由清理线程
+    定期检查）都会被停止并删除，其后台线程随之退出。
+    """
+
+    def __init__(self, max_entries=4, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        self.max_entries = max_entries
+        self.idle_timeout = idle_timeout
+        self._entries = OrderedDict()  # 键 -> (监视器, 参数, 最近读取时间)，按读取顺序
+        self._lock = threading.Lock()
+        self._janitor = None
+
+    def get(self, key, params, create):
+        """取得键对应的监视器；不存在或参数变化时调用 create() 新建并在后台线程中运行"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == params:
+                self._entries[key] = (entry[0], params, time.monotonic())
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        watcher = create()  # 首次全量分析可能较慢，不持有锁
+        threading.Thread(target=watcher.run, daemon=True).start()
+        stopped = []
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                stopped.append(old[0])
+            self._entries[key] = (watcher, params, time.monotonic())
+            while len(self._entries) > self.max_entries:
+                stopped.append(self._entries.popitem(last=False)[1][0])
+            if self._janitor is None:
+                self._janitor = threading.Thread(target=self._clean_idle, daemon=True)
+                self._janitor.start()
+        for old_watcher in stopped:
+            old_watcher.stop()
+        return watcher
+
+    def stop(self, key):
+        """停止并删除键对应的监视器，不存在时什么也不做"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry[0].stop()
+
+    def stop_idle(self):
+        """停止超过 idle_timeout 未被读取的监视器，返回停止的数量"""
+        deadline = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [key for key, (_, _, seen) in self._entries.items() if seen < deadline]
+            stopped = [self._entries.pop(key)[0] for key in idle]
+        for watcher in stopped:
+            watcher.stop()
+        return len(stopped)
+
+    def _clean_idle(self):
+        while True:
+            time.sleep(max(1.0, self.idle_timeout / 2))
+            self.stop_idle()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _replace_output(records, path):
+    """先写临时文件再替换，读取方不会看到写了一半的结果"""
+    tmp_path = f"{path}.tmp"
+    write_records(records, tmp_path, format_from_path(path))
+    os.replace(tmp_path, path)
+
+
+def main(src_dir="src", model=None, output_path="metrics_code.json", oo_output_path="metrics_oo.json",
+         interval=DEFAULT_INTERVAL, use_notifications=True, cache=None, budget=None, discovery=None):
+    if not os.path.isdir(src_dir):
+        print(f"⚠️ {src_dir} 文件夹不存在！")
+        return
+
+    watcher = Watcher(src_dir, model, cache, budget, discovery)
+
+    def on_update(update):
+        _, code_records, class_records, failures = watcher.snapshot()
+        _replace_output(code_records, output_path)
+        if model:
+            _replace_output(class_records, oo_output_path)
+        for path, error in failures:
+            if path in update.changed:
+                print(f"⚠️ 分析失败：{path} - {error}")
+        print(f"[{time.strftime('%H:%M:%S')}] 第 {update.version} 次更新：变化 {len(update.changed)} 个文件，"
+              f"删除 {len(update.removed)} 个，重新计算 {update.classes_updated} 个类")
+
+    mode = "文件系统通知" if use_notifications and USE_WATCHDOG else f"每 {interval} 秒轮询"
+    print(f"开始监视 {src_dir}" + (f" 与 {model}" if model else "") + f"（{mode}），按 Ctrl+C 停止")
+    try:
+        watcher.run(interval, on_update, use_notifications)
+    except KeyboardInterrupt:
+        print("已停止监视")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="监视源代码与类图，增量更新指标")
+    parser.add_argument("--src", default="src", help="源代码目录")
+    parser.add_argument("--model", default=None, help="类图 XMI 路径，给出时同时更新 CK / LK 指标")
+    parser.add_argument("--output", default="metrics_code.json", help="代码指标输出路径（按扩展名选择格式）")
+    parser.add_argument("--oo-output", default="metrics_oo.json", help="CK / LK 指标输出路径")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="轮询间隔（秒）")
+    parser.add_argument("--polling", action="store_true", help="不使用文件系统通知，始终轮询")
+    add_cache_arguments(parser)
+    add_budget_arguments(parser)
+    add_discovery_arguments(parser)
+    args = parser.parse_args()
+
+    main(args.src, args.model, args.output, args.oo_output, args.interval, not args.polling,
+         cache_from_args(args), budget_from_args(args), discovery_from_args(args))